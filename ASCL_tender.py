@@ -1,122 +1,66 @@
 #Website-https://ascltd.assam.gov.in/portlets/tender
 #title-Assam Seeds Corporation Limited
-import ssl
 from datetime import datetime
 from urllib.parse import urljoin
 
-import requests
-from bs4 import BeautifulSoup
-from pymongo import MongoClient
-from requests.adapters import HTTPAdapter
-from urllib3.poolmanager import PoolManager
-from urllib3.util.retry import Retry
-import os
 from dotenv import load_dotenv
 
+from columns import Column, Table
+from html_parser import parse
+from http_client import NotModified, commit, fetch_if_modified
+from mongo_store import upsert_tenders
+from unified import Mapping
+
 load_dotenv()
 # ---------------- MongoDB Config ----------------
-MONGO_DB_URI = os.getenv("MONGO_DB_URI")
-MONGO_DB = os.getenv("MONGO_DB")
 MONGO_DB_COLLECTION = "ascl_tenders"
+KEY_FIELDS = ("pdf_link", "title")  # stable per-tender key for upserts
+DOCUMENT_FIELDS = ("pdf_link",)  # document links fetched by downloader.py
 
 # ---------------- Target URLs ----------------
 URL = "https://ascltd.assam.gov.in/portlets/tender"
+CONTAINERS = ("table",)  # only these parts of the page are parsed
 
-# ---------------- Legacy SSL Adapter ----------------
-class LegacySSLAdapter(HTTPAdapter):
-    def init_poolmanager(self, connections, maxsize, block=False):
-        ctx = ssl.create_default_context()
-        ctx.options |= 0x4  # OP_LEGACY_SERVER_CONNECT
-        self.poolmanager = PoolManager(
-            num_pools=connections,
-            maxsize=maxsize,
-            block=block,
-            ssl_context=ctx
-        )
-
-# ---------------- Session with Retry ----------------
-def get_session():
-    session = requests.Session()
-
-    retries = Retry(
-        total=5,
-        backoff_factor=2,
-        status_forcelist=[500, 502, 503, 504],
-        allowed_methods=["GET"]
-    )
-
-    adapter = LegacySSLAdapter()
-    adapter.max_retries = retries
-
-    session.mount("http://", adapter)
-    session.mount("https://", adapter)
-
-    session.headers.update({
-        "User-Agent": "Mozilla/5.0",
-        "Connection": "close",
-    })
-    return session
+# ---------------- Columns ----------------
+TABLE = Table([
+    Column("title", 0),
+    Column("size", 1),
+    Column("pdf_link", 2, kind="href"),
+])
 
 # ---------------- Scraper ----------------
 def scrape_tenders():
-    response = requests.get(URL, timeout=30)
-    response.raise_for_status()
-
-    soup = BeautifulSoup(response.text, "html.parser")
+    response = fetch_if_modified(URL, timeout=30)
+    yield from extract_tenders(parse(response.text, CONTAINERS))
 
-    table = soup.find("tbody")
+def extract_tenders(doc):
+    table = doc.select_one("tbody")
     if not table:
         print("Table not found")
-        return []
-
-    tenders = []
-
-    rows = table.find_all("tr")
-
-    for row in rows:
-        cols = row.find_all(["td"])
-
-        if len(cols) < 3:
-            continue
-
-        title = cols[0].get_text(strip=True)
-        size = cols[1].get_text(strip=True)
-        detail = cols[2].find("a")
-        pdf_link = detail["href"] if detail else ""
-
-        tender_json = {
-            "title": title,
-            "size": size,
-            "pdf_link": pdf_link
-        }
+        return
 
-        tenders.append(tender_json)
+    yield from TABLE.extract(table.select("tr"))
 
-    return tenders
+# ---------------- Unified Schema ----------------
+# Canonical fields for the shared tenders collection (unified.py)
+UNIFIED = Mapping("ASCL_tender", title="title", documents=DOCUMENT_FIELDS, base=URL)
 
 # ---------------- MongoDB Store ----------------
 def store_in_mongo(data):
-    if not data:
-        print("No data found to insert")
-        return
-
-    client = MongoClient(MONGO_DB_URI)
-    db = client[MONGO_DB]
-    collection = db[MONGO_DB_COLLECTION]
-
-    collection.delete_many({})  # Optional: clear old data
-    collection.insert_many(data)
-
-    print(f"Inserted {len(data)} records into MongoDB")
+    # data can be a generator: records are written while the scraper is still parsing
+    return upsert_tenders(MONGO_DB_COLLECTION, data, KEY_FIELDS, unified=UNIFIED)
 
 # ---------------- MAIN ----------------
 def main():
     print("Scraping ASCL tenders...")
 
-    tenders = scrape_tenders()
-    print(f"Fetched {len(tenders)} tenders")
+    try:
+        store_in_mongo(scrape_tenders())
+    except NotModified:
+        print("No changes since last run, skipping")
+        return
 
-    store_in_mongo(tenders)
+    commit(URL)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,127 +1,75 @@
-import ssl
 from datetime import datetime
 from urllib.parse import urljoin
 
-import requests
-from bs4 import BeautifulSoup
-from pymongo import MongoClient
-from requests.adapters import HTTPAdapter
-from urllib3.poolmanager import PoolManager
-from urllib3.util.retry import Retry
-import os
 from dotenv import load_dotenv
 
+from columns import Column, Table
+from html_parser import parse
+from http_client import NotModified, commit, fetch_if_modified
+from mongo_store import upsert_tenders
+from unified import Mapping
+
 load_dotenv()
 # ---------------- MongoDB Config ----------------
-MONGO_DB_URI = os.getenv("MONGO_DB_URI")
-MONGO_DB = os.getenv("MONGO_DB")
 MONGO_DB_COLLECTION = "Ajnala_Sugar_tenders"
+KEY_FIELDS = ("documents", "tender_name")  # stable per-tender key for upserts
+DOCUMENT_FIELDS = ("documents",)  # document links fetched by downloader.py
+DATE_FIELDS = ("tender_publish_date", "tender_due_date")  # parsed into <field>_dt by dates.py
+DEADLINE_FIELD = "tender_due_date"  # copied to deadline_dt
 
 # ---------------- Target URLs ----------------
 URL = "https://ajnalasugar.in/report/view/uploadTender"
-
-# ---------------- Legacy SSL Adapter ----------------
-class LegacySSLAdapter(HTTPAdapter):
-    def init_poolmanager(self, connections, maxsize, block=False):
-        ctx = ssl.create_default_context()
-        ctx.options |= 0x4  # OP_LEGACY_SERVER_CONNECT
-        self.poolmanager = PoolManager(
-            num_pools=connections,
-            maxsize=maxsize,
-            block=block,
-            ssl_context=ctx
-        )
-
-# ---------------- Session with Retry ----------------
-def get_session():
-    session = requests.Session()
-
-    retries = Retry(
-        total=5,
-        backoff_factor=2,
-        status_forcelist=[500, 502, 503, 504],
-        allowed_methods=["GET"]
-    )
-
-    adapter = LegacySSLAdapter()
-    adapter.max_retries = retries
-
-    session.mount("http://", adapter)
-    session.mount("https://", adapter)
-
-    session.headers.update({
-        "User-Agent": "Mozilla/5.0",
-        "Connection": "close",
-    })
-    return session
+CONTAINERS = ("table#dataTables-example",)  # only these parts of the page are parsed
+
+# ---------------- Columns ----------------
+# Header label wins over position, so a re-ordered table keeps its fields
+TABLE = Table([
+    Column("sr_no", 0, header=("Sr No", "S No")),
+    Column("tender_name", 1, header="Tender Name"),
+    Column("tender_description", 2, header="Tender Description"),
+    Column("tender_publish_date", 3, header="Publish Date"),
+    Column("tender_due_date", 4, header="Due Date"),
+    Column("documents", 5, kind="href", header="Download"),
+], cells=("td", "th"))
 
 # ---------------- Scraper ----------------
 def scrape_tenders():
-    response = requests.get(URL, timeout=30)
-    response.raise_for_status()
-
-    soup = BeautifulSoup(response.text, "html.parser")
+    response = fetch_if_modified(URL, timeout=30)
+    yield from extract_tenders(parse(response.text, CONTAINERS))
 
-    table = soup.find("table", id="dataTables-example")
+def extract_tenders(doc):
+    table = doc.select_one("table#dataTables-example")
     if not table:
         print("Table not found")
-        return []
-
-    tenders = []
-
-    rows = table.find_all("tr")
-
-    for row in rows[1:]:  # skip header row
-        cols = row.find_all(["td", "th"])
-
-        if len(cols) < 6:
-            continue
-
-        sr_no = cols[0].get_text(strip=True)
-        tender_name = cols[1].get_text(strip=True)
-        tender_description = cols[2].get_text(strip=True)
-        publish_date = cols[3].get_text(strip=True)
-        due_date = cols[4].get_text(strip=True)
-
-        download_tag = cols[5].find("a")
-        documents = download_tag["href"] if download_tag else ""
+        return
 
-        tender_json = {
-            "sr_no": sr_no,
-            "tender_name": tender_name,
-            "tender_description": tender_description,
-            "tender_publish_date": publish_date,
-            "tender_due_date": due_date,
-            "documents": documents
-        }
+    rows = table.select("tr")
+    if not rows:
+        return
 
-        tenders.append(tender_json)
+    yield from TABLE.extract(rows[1:], header=rows[0])  # first row is the header
 
-    return tenders
+# ---------------- Unified Schema ----------------
+# Canonical fields for the shared tenders collection (unified.py)
+UNIFIED = Mapping("Ajnala_sugar", title="tender_name", description="tender_description",
+                  published="tender_publish_date", documents=DOCUMENT_FIELDS, base=URL)
 
 # ---------------- MongoDB Store ----------------
 def store_in_mongo(data):
-    if not data:
-        print("No data found to insert")
-        return
-
-    client = MongoClient(MONGO_DB_URI)
-    db = client[MONGO_DB]
-    collection = db[MONGO_DB_COLLECTION]
-
-    collection.delete_many({})  # Optional: clear old data
-    collection.insert_many(data)
-
-    print(f"Inserted {len(data)} records into MongoDB")
+    # data can be a generator: records are written while the scraper is still parsing
+    return upsert_tenders(MONGO_DB_COLLECTION, data, KEY_FIELDS, DATE_FIELDS, DEADLINE_FIELD, UNIFIED)
 
 # ---------------- MAIN ----------------
 def main():
     print("Scraping A_Sugar tenders...")
 
-    tenders = scrape_tenders()
-    print(f"Fetched {len(tenders)} tenders")
+    try:
+        store_in_mongo(scrape_tenders())
+    except NotModified:
+        print("No changes since last run, skipping")
+        return
 
-    store_in_mongo(tenders)
+    commit(URL)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,105 +1,64 @@
-import ssl
 from datetime import datetime
-from urllib.parse import urljoin
 
-import requests
-from bs4 import BeautifulSoup
-from pymongo import MongoClient
-from requests.adapters import HTTPAdapter
-from urllib3.poolmanager import PoolManager
-import os
 from dotenv import load_dotenv
 
+from columns import Column, Table
+from html_parser import parse
+from http_client import NotModified, commit, fetch_if_modified
+from mongo_store import upsert_tenders
+from unified import Mapping
+
 load_dotenv()
 # ---------------- MongoDB Config ----------------
-MONGO_DB_URI = os.getenv("MONGO_DB_URI")
-MONGO_DB = os.getenv("MONGO_DB")
 MONGO_DB_COLLECTION = "assam_petrochemical_tenders"
+KEY_FIELDS = ("link_url", "title")  # stable per-tender key for upserts
 
 # ---------------- Target URLs ----------------
 URL = "https://assampetrochemicals.co.in/tenders.php"
+CONTAINERS = ("table.TextMain",)  # only these parts of the page are parsed
 
-# ---------------- Legacy SSL Adapter ----------------
-class LegacySSLAdapter(HTTPAdapter):
-    def init_poolmanager(self, connections, maxsize, block=False):
-        ctx = ssl.create_default_context()
-        ctx.options |= 0x4  # OP_LEGACY_SERVER_CONNECT
-        self.poolmanager = PoolManager(
-            num_pools=connections,
-            maxsize=maxsize,
-            block=block,
-            ssl_context=ctx
-        )
-
-def get_session():
-    session = requests.Session()
-    session.mount("https://", LegacySSLAdapter())
-    session.headers.update({
-        "User-Agent": "Mozilla/5.0",
-        "Connection": "close",
-    })
-    return session
+# ---------------- Columns ----------------
+# Title and link share the first cell; rows with fewer than 2 cells are layout rows
+TABLE = Table([
+    Column("title", 0, sep="\n", strip=False),  # preserve multi-line text like "Corrigendum ..."
+    Column("link_url", 0, kind="href", base=URL, default=None),
+], min_cells=2)
 
 # ---------------- Scraper ----------------
 def APL():
-    session = get_session()
-    response = session.get(URL, timeout=(10, 20))
-    response.raise_for_status()
-
-    soup = BeautifulSoup(response.text, "html.parser")
-
-    tenders = []
+    response = fetch_if_modified(URL, timeout=(10, 20))
+    yield from extract_tenders(parse(response.text, CONTAINERS))
 
-    table = soup.find("table",class_="TextMain")
+def extract_tenders(doc):
+    table = doc.select_one("table.TextMain")
     if not table:
         print(" Tender table not found")
-        return tenders
-
-    rows = table.find_all("tr")
-
-    for row in rows:
-        cols = row.find_all("td")
-        if len(cols) < 2:
-            continue
-
-        link_tag = cols[0].find("a", href=True)
-
-        # Preserve multi-line text like "Corrigendum ..."
-        title = cols[0].get_text(separator="\n").strip()
-
-        link_url = urljoin(URL, link_tag["href"]) if link_tag else None
+        return
 
-        tenders.append({
-            "title": title,
-            "link_url": link_url,
-            "scraped_at": datetime.utcnow()
-        })
+    for record in TABLE.extract(table.select("tr")):
+        record["scraped_at"] = datetime.utcnow()
+        yield record
 
-    return tenders
+# ---------------- Unified Schema ----------------
+# Canonical fields for the shared tenders collection (unified.py)
+UNIFIED = Mapping("Assam_petro_che_ltd", title="title", documents=("link_url",), base=URL)
 
 # ---------------- MongoDB Store ----------------
 def store_in_mongo(data):
-    if not data:
-        print(" No data found to insert")
-        return
-
-    client = MongoClient(MONGO_DB_URI)
-    db = client[MONGO_DB]
-    collection = db[MONGO_DB_COLLECTION]
-
-    collection.delete_many({})  # optional: clear previous data
-    collection.insert_many(data)
-
-    print(f"Inserted {len(data)} records into MongoDB")
+    # data can be a generator: records are written while the scraper is still parsing
+    return upsert_tenders(MONGO_DB_COLLECTION, data, KEY_FIELDS, unified=UNIFIED)
 
 # ---------------- MAIN ----------------
 def main():
     print("Scraping APL tenders...")
 
-    tenders = APL()
-    print(f"Fetched {len(tenders)} tenders")
+    try:
+        store_in_mongo(APL())
+    except NotModified:
+        print("No changes since last run, skipping")
+        return
 
-    store_in_mongo(tenders)
+    commit(URL)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,64 +1,40 @@
 #website => https://ayurveda.hp.gov.in/Tenders.aspx
-import ssl
 from datetime import datetime
 from urllib.parse import urljoin
 
-import requests
-from bs4 import BeautifulSoup
-from pymongo import MongoClient
-from requests.adapters import HTTPAdapter
-from urllib3.poolmanager import PoolManager
-import os
 from dotenv import load_dotenv
 
+from html_parser import parse
+from http_client import NotModified, commit, fetch_if_modified
+import metrics
+from mongo_store import upsert_tenders
+from unified import Mapping
+
 load_dotenv()
 # ---------------- MongoDB Config ----------------
-MONGO_DB_URI = os.getenv("MONGO_DB_URI")
-MONGO_DB = os.getenv("MONGO_DB")
 MONGO_DB_COLLECTION = "ayurveda_tenders"
+KEY_FIELDS = ("tender_url", "tender_title")  # stable per-tender key for upserts
 
 # ---------------- Target URLs ----------------
 URL = "https://ayurveda.hp.gov.in/Tenders.aspx"
-
-# ---------------- Legacy SSL Adapter ----------------
-class LegacySSLAdapter(HTTPAdapter):
-    def init_poolmanager(self, connections, maxsize, block=False):
-        ctx = ssl.create_default_context()
-        ctx.options |= 0x4  # OP_LEGACY_SERVER_CONNECT
-        self.poolmanager = PoolManager(
-            num_pools=connections,
-            maxsize=maxsize,
-            block=block,
-            ssl_context=ctx
-        )
-
-def get_session():
-    session = requests.Session()
-    session.mount("https://", LegacySSLAdapter())
-    session.headers.update({
-        "User-Agent": "Mozilla/5.0",
-        "Connection": "close",
-    })
-    return session
+CONTAINERS = ("div.bs-docs-example",)  # only these parts of the page are parsed
 
 # ---------------- Scraper ----------------
 def Ayurved():
-    session = get_session()
-    response = session.get(URL, timeout=(10, 20))
-    response.raise_for_status()
+    response = fetch_if_modified(URL, timeout=(10, 20))
+    yield from extract_tenders(parse(response.text, CONTAINERS))
 
-    soup = BeautifulSoup(response.text, "html.parser")
-
-    tenders = []           
+def extract_tenders(doc):
     seen = set()
+    captured = 0
 
     # 🔥 STRICT selector based on your DOM
-    links = soup.select("div.bs-docs-example table.table tbody tr td a[href]")
+    links = doc.select("div.bs-docs-example table.table tbody tr td a[href]")
 
     print("Total <a> tags found:", len(links))
 
     for a in links:
-        title = a.get_text(strip=True)
+        title = a.text()
         href = a.get("href")
 
         if not title or not href:
@@ -71,40 +47,37 @@ def Ayurved():
             continue
 
         seen.add(key)
+        captured += 1
 
-        tenders.append({
+        yield {
             "tender_title": title,
             "tender_url": tender_url,
             "scraped_at": datetime.utcnow()
-        })
+        }
 
-    print("Valid tenders captured:", len(tenders))
-    return tenders
+    print("Valid tenders captured:", captured)
+    metrics.count_rows(captured, len(links) - captured)
 
+# ---------------- Unified Schema ----------------
+# Canonical fields for the shared tenders collection (unified.py)
+UNIFIED = Mapping("Ayurveda", title="tender_title", documents=("tender_url",), base=URL)
 
 # ---------------- MongoDB Store ----------------
 def store_in_mongo(data):
-    if not data:
-        print(" No data found to insert")
-        return
-
-    client = MongoClient(MONGO_DB_URI)
-    db = client[MONGO_DB]
-    collection = db[MONGO_DB_COLLECTION]
-
-    collection.delete_many({})  # optional: clear previous data
-    collection.insert_many(data)
-
-    print(f"Inserted {len(data)} records into MongoDB")
+    # data can be a generator: records are written while the scraper is still parsing
+    return upsert_tenders(MONGO_DB_COLLECTION, data, KEY_FIELDS, unified=UNIFIED)
 
 # ---------------- MAIN ----------------
 def main():
     print("Scraping APL tenders...")
 
-    tenders = Ayurved()
-    print(f"Fetched {len(tenders)} tenders")
+    try:
+        store_in_mongo(Ayurved())
+    except NotModified:
+        print("No changes since last run, skipping")
+        return
 
-    store_in_mongo(tenders)
+    commit(URL)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,66 +1,43 @@
-import ssl
 from datetime import datetime
 from urllib.parse import urljoin
 
-import requests
-from bs4 import BeautifulSoup
-from pymongo import MongoClient
-from requests.adapters import HTTPAdapter
-from urllib3.poolmanager import PoolManager
-from urllib3.util.retry import Retry
-import os
 from dotenv import load_dotenv
 
+from columns import Column, Table
+from html_parser import parse
+from http_client import NotModified, cached_text, commit, fetch, pages_changed
+from mongo_store import upsert_tenders
+from unified import Mapping
+
 load_dotenv()
 
 # ---------------- MongoDB Config ----------------
-MONGO_DB_URI = os.getenv("MONGO_DB_URI")
-MONGO_DB = os.getenv("MONGO_DB")
 MONGO_DB_COLLECTION = "bathinda_dev_auth_tender"
+KEY_FIELDS = ("documents", "description")  # stable per-tender key for upserts
+DOCUMENT_FIELDS = ("documents",)  # document links fetched by downloader.py
+DATE_FIELDS = ("last_date_of_submission",)  # parsed into <field>_dt by dates.py
+DEADLINE_FIELD = "last_date_of_submission"  # copied to deadline_dt
 
 # ---------------- Target URLs ----------------
 URL = "https://bdabathinda.in/en/tenders"
-
-# ---------------- Legacy SSL Adapter ----------------
-class LegacySSLAdapter(HTTPAdapter):
-    def init_poolmanager(self, connections, maxsize, block=False):
-        ctx = ssl.create_default_context()
-        ctx.options |= 0x4  # OP_LEGACY_SERVER_CONNECT
-        self.poolmanager = PoolManager(
-            num_pools=connections,
-            maxsize=maxsize,
-            block=block,
-            ssl_context=ctx
-        )
-
-# ---------------- Session with Retry ----------------
-def get_session():
-    session = requests.Session()
-
-    retries = Retry(
-        total=5,
-        backoff_factor=2,
-        status_forcelist=[500, 502, 503, 504],
-        allowed_methods=["GET"]
-    )
-
-    adapter = LegacySSLAdapter()
-    adapter.max_retries = retries
-
-    session.mount("http://", adapter)
-    session.mount("https://", adapter)
-
-    session.headers.update({
-        "User-Agent": "Mozilla/5.0",
-        "Accept-Language": "en-US,en;q=0.9",
-        "Referer": URL,
-    })
-    return session
+HEADERS = {"Referer": URL}
+CONTAINERS = ("table.views-table", "li.pager__item--next")  # only these parts of the page are parsed
+
+# ---------------- Columns ----------------
+# Header label wins over position, so a re-ordered table keeps its fields
+TABLE = Table([
+    Column("sr_no", 0, header=("Sr No", "S No")),
+    Column("description", 1, sep=" ", header="Description"),
+    Column("documents", 2, kind="href", base=URL, default=None),
+    Column("last_date_of_submission", 3, header="Last Date of Submission"),
+])
 
 # ---------------- Scraper with Pagination ----------------
 def BDA():
-    session = get_session()
-    all_tenders = []
+    changed = False
+    deferred = []  # unchanged pages, only extracted if a later page turns out to have changed
+    total = 0
+    count = 0
     visited_urls = set()
 
     next_url = URL 
@@ -68,15 +45,11 @@ def BDA():
     while next_url:
         print(f"Fetching: {next_url}")
 
-        try:
-            res = session.get(next_url, timeout=(10, 30))
-            res.raise_for_status()
-        except Exception as e:
-            print(f"Request failed: {e}")
-            break
+        # Not caught: stored pages minus a missing one would look like removed tenders
+        res = fetch(next_url, timeout=(10, 30), headers=HEADERS)
 
-        soup = BeautifulSoup(res.text, "html.parser")
-        table = soup.select_one("table.views-table")
+        doc = parse(res.text, CONTAINERS)
+        table = doc.select_one("table.views-table")
 
         if not table:
             print("No table found. Stopping.")
@@ -84,29 +57,26 @@ def BDA():
 
         rows = table.select("tbody tr")
         print("Rows found on this page:", len(rows))
-
-        for row in rows:
-            cols = row.find_all("td")
-            if len(cols) < 4:
-                continue
-
-            tender = {
-                "sr_no": cols[0].get_text(strip=True),
-                "description": cols[1].get_text(" ", strip=True),
-                "documents": urljoin(URL, cols[2].find("a")["href"]) if cols[2].find("a") else None,
-                "last_date_of_submission": cols[3].get_text(strip=True),
-                "scraped_at": datetime.utcnow()
-            }
-
-            all_tenders.append(tender)
+        total += len(rows)
+        count += 1
+
+        if res.not_modified and not changed:
+            deferred.append(next_url)
+        else:
+            if not changed:
+                changed = True
+                for url in deferred:
+                    yield from extract_tenders(parse(cached_text(url, headers=HEADERS), CONTAINERS))
+                deferred = []
+            yield from extract_rows(rows, table.select_one("thead tr"))
 
         # Find Next page
-        next_link = soup.select_one("li.pager__item--next a")
+        next_link = doc.select_one("li.pager__item--next a")
         if not next_link:
             print("No next page. Pagination finished.")
             break
 
-        next_url = urljoin(URL, next_link["href"])
+        next_url = urljoin(URL, next_link.get("href"))
 
         if next_url in visited_urls:
             print("Pagination loop detected. Stopping.")
@@ -114,29 +84,42 @@ def BDA():
 
         visited_urls.add(next_url)
 
-    print(f"Total tenders scraped: {len(all_tenders)}")
-    return all_tenders
-# ---------------- MongoDB Store ----------------
-def store_in_mongo(data):
-    if not data:
-        print("No data found to insert")
-        return
+    # Every page answered 304 / from cache: nothing new to store, unless a page is gone since
+    if not pages_changed(URL, count) and deferred and not changed:
+        raise NotModified(URL)
+    for url in deferred:  # only left when nothing changed
+        yield from extract_tenders(parse(cached_text(url, headers=HEADERS), CONTAINERS))
+
+    print(f"Total rows scraped: {total}")
 
-    client = MongoClient(MONGO_DB_URI)
-    db = client[MONGO_DB]
-    collection = db[MONGO_DB_COLLECTION]
+def extract_tenders(doc):
+    table = doc.select_one("table.views-table")
+    return extract_rows(table.select("tbody tr"), table.select_one("thead tr")) if table else []
 
-    collection.delete_many({})
-    collection.insert_many(data)
+def extract_rows(rows, header=None):
+    for record in TABLE.extract(rows, header):
+        record["scraped_at"] = datetime.utcnow()
+        yield record
 
-    print(f"Inserted {len(data)} records into MongoDB")
+# ---------------- Unified Schema ----------------
+# Canonical fields for the shared tenders collection (unified.py)
+UNIFIED = Mapping("Bhatinda_DA", title="description", documents=DOCUMENT_FIELDS, base=URL)
+
+# ---------------- MongoDB Store ----------------
+def store_in_mongo(data):
+    # data can be a generator: records are written while the scraper is still parsing
+    return upsert_tenders(MONGO_DB_COLLECTION, data, KEY_FIELDS, DATE_FIELDS, DEADLINE_FIELD, UNIFIED)
 
 # ---------------- MAIN ----------------
 def main():
     print("Scraping Bathinda Development Authority tenders with pagination...")
-    tenders = BDA()
-    print(f"Fetched {len(tenders)} tenders")
-    store_in_mongo(tenders)
+    try:
+        store_in_mongo(BDA())
+    except NotModified:
+        print("No changes since last run, skipping")
+        return
+
+    commit(URL)
 
 if __name__ == "__main__":
     main()
@@ -1,81 +1,40 @@
-import ssl
 from datetime import datetime
 from urllib.parse import urljoin
 
-import requests
-from bs4 import BeautifulSoup
-from pymongo import MongoClient
-from requests.adapters import HTTPAdapter
-from urllib3.poolmanager import PoolManager
-from urllib3.util.retry import Retry
-import os
 from dotenv import load_dotenv
 
+from html_parser import parse
+from http_client import NotModified, commit, fetch_if_modified
+import metrics
+from mongo_store import upsert_tenders
+from unified import Mapping
+
 load_dotenv()
 # ---------------- MongoDB Config ----------------
-MONGO_DB_URI = os.getenv("MONGO_DB_URI")
-MONGO_DB = os.getenv("MONGO_DB")
 MONGO_DB_COLLECTION = "central_uni_rajasthan_tenders"
+KEY_FIELDS = ("documents.pdf_url", "title")  # stable per-tender key for upserts
+DOCUMENT_FIELDS = ("documents.pdf_url",)  # document links fetched by downloader.py
 
 # ---------------- Target URLs ----------------
 URL = "http://14.139.244.219/tenders"
 BASE_URL = "http://14.139.244.219/"
-
-# ---------------- Legacy SSL Adapter ----------------
-class LegacySSLAdapter(HTTPAdapter):
-    def init_poolmanager(self, connections, maxsize, block=False):
-        ctx = ssl.create_default_context()
-        ctx.options |= 0x4  # OP_LEGACY_SERVER_CONNECT
-        self.poolmanager = PoolManager(
-            num_pools=connections,
-            maxsize=maxsize,
-            block=block,
-            ssl_context=ctx
-        )
-
-# ---------------- Session with Retry ----------------
-def get_session():
-    session = requests.Session()
-
-    retries = Retry(
-        total=5,
-        backoff_factor=2,
-        status_forcelist=[500, 502, 503, 504],
-        allowed_methods=["GET"]
-    )
-
-    adapter = LegacySSLAdapter()
-    adapter.max_retries = retries
-
-    session.mount("http://", adapter)
-    session.mount("https://", adapter)
-
-    session.headers.update({
-        "User-Agent": "Mozilla/5.0",
-        "Connection": "close",
-    })
-    return session
+CONTAINERS = ("div.innerpage",)  # only these parts of the page are parsed
 
 # ---------------- Scraper ----------------
 def cur():
-    session = get_session()
-    try:
-        response = session.get(URL, timeout=(30, 60))
-        response.raise_for_status()
-    except requests.exceptions.RequestException as e:
-        print(" Failed to fetch tenders:", e)
-        return []
+    # Not caught: run_all reports a portal that is down as FAILED, not as "ok, 0 records"
+    response = fetch_if_modified(URL, timeout=(30, 60))
+    yield from extract_tenders(parse(response.text, CONTAINERS))
 
-    soup = BeautifulSoup(response.text, "html.parser")
-    container = soup.find("div", class_="innerpage")
-
-    tenders = []
+def extract_tenders(doc):
+    container = doc.select_one("div.innerpage")
 
     if not container:
         print("innerpage not found")
-        return tenders
+        return
 
-    rows = container.find_all("div", class_="views-row")
+    rows = container.select("div.views-row")
+    captured = 0
 
     for row in rows:
         title = None
@@ -83,51 +42,49 @@ def cur():
         pdf_url = None
 
         #  Tender title (h2)
-        h2 = row.find("h2")
+        h2 = row.select_one("h2")
         if h2:
-            title = h2.get_text(strip=True)
+            title = h2.text()
 
         # PDF link & document title
-        link = row.find("a", href=True)
+        link = row.select_one("a[href]")
         if link:
-            doc_title = link.get_text(strip=True)
-            pdf_url = urljoin(BASE_URL, link["href"])
+            doc_title = link.text()
+            pdf_url = urljoin(BASE_URL, link.get("href"))
 
         if title or doc_title or pdf_url:
-            tenders.append({
+            captured += 1
+            yield {
                 "title": title,
                 "documents": {
                     "doc_title": doc_title,
                     "pdf_url": pdf_url
                 },
                 "scraped_at": datetime.utcnow()
-            })
+            }
+
+    metrics.count_rows(captured, len(rows) - captured)
 
-    return tenders
+# ---------------- Unified Schema ----------------
+# Canonical fields for the shared tenders collection (unified.py)
+UNIFIED = Mapping("CUR", title="title", documents=DOCUMENT_FIELDS, base=BASE_URL)
 
 # ---------------- MongoDB Store ----------------
 def store_in_mongo(data):
-    if not data:
-        print("No data found to insert")
-        return
-
-    client = MongoClient(MONGO_DB_URI)
-    db = client[MONGO_DB]
-    collection = db[MONGO_DB_COLLECTION]
-
-    collection.delete_many({})  # Optional: clear old data
-    collection.insert_many(data)
-
-    print(f"Inserted {len(data)} records into MongoDB")
+    # data can be a generator: records are written while the scraper is still parsing
+    return upsert_tenders(MONGO_DB_COLLECTION, data, KEY_FIELDS, unified=UNIFIED)
 
 # ---------------- MAIN ----------------
 def main():
     print("Scraping CUR tenders...")
 
-    tenders = cur()
-    print(f"Fetched {len(tenders)} tenders")
+    try:
+        store_in_mongo(cur())
+    except NotModified:
+        print("No changes since last run, skipping")
+        return
 
-    store_in_mongo(tenders)
+    commit(URL)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
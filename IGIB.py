@@ -1,108 +1,72 @@
-import ssl
 from datetime import datetime
-from urllib.parse import urljoin
 
-import requests
-from bs4 import BeautifulSoup
-from pymongo import MongoClient
-from requests.adapters import HTTPAdapter
-from urllib3.poolmanager import PoolManager
-import os
 from dotenv import load_dotenv
 
+from columns import Column, Table
+from html_parser import parse
+from http_client import NotModified, commit, fetch_if_modified
+from mongo_store import upsert_tenders
+from unified import Mapping
+
 load_dotenv()
 # ---------------- MongoDB Config ----------------
-MONGO_DB_URI = os.getenv("MONGO_DB_URI")
-MONGO_DB = os.getenv("MONGO_DB")
 MONGO_DB_COLLECTION = "IGIB_tender_links"
+KEY_FIELDS = ("document",)  # stable per-tender key for upserts
+DOCUMENT_FIELDS = ("document",)  # document links fetched by downloader.py
+DATE_FIELDS = ("date",)  # parsed into <field>_dt by dates.py
 
 # ---------------- Target URLs ----------------
 URL = "https://admin.igib.res.in/tender.html"
 BASE_URL = "https://admin.igib.res.in/"
+CONTAINERS = ("table",)  # only these parts of the page are parsed
 
-# ---------------- Legacy SSL Adapter ----------------
-class LegacySSLAdapter(HTTPAdapter):
-    def init_poolmanager(self, connections, maxsize, block=False):
-        ctx = ssl.create_default_context()
-        ctx.options |= 0x4  # OP_LEGACY_SERVER_CONNECT
-        self.poolmanager = PoolManager(
-            num_pools=connections,
-            maxsize=maxsize,
-            block=block,
-            ssl_context=ctx
-        )
-
-def get_session():
-    session = requests.Session()
-    session.mount("https://", LegacySSLAdapter())
-    session.headers.update({
-        "User-Agent": "Mozilla/5.0",
-        "Connection": "close",
-    })
-    return session
+# ---------------- Columns ----------------
+# Header label wins over position, so a re-ordered table keeps its fields
+TABLE = Table([
+    Column("work", 0, sep="\n", strip=False, header="Work"),  # preserve multi-line text like "Corrigendum ..."
+    Column("date", 1, header="Date"),
+    Column("document", 0, kind="href", base=URL, default=None),
+])
 
 # ---------------- Scraper ----------------
 def igib():
-    session = get_session()
-    response = session.get(URL, timeout=(10, 20))
-    response.raise_for_status()
-
-    soup = BeautifulSoup(response.text, "html.parser")
-
-    tenders = []
+    response = fetch_if_modified(URL, timeout=(10, 20))
+    yield from extract_tenders(parse(response.text, CONTAINERS))
 
-    table = soup.find("table")
+def extract_tenders(doc):
+    table = doc.select_one("table")
     if not table:
         print(" Tender table not found")
-        return tenders
-
-    rows = table.find_all("tr")[1:]  # skip header row
-
-    for row in rows:
-        cols = row.find_all("td")
-        if len(cols) < 2:
-            continue
-
-        link_tag = cols[0].find("a", href=True)
-
-        # Preserve multi-line text like "Corrigendum ..."
-        work = cols[0].get_text(separator="\n").strip()
+        return
 
-        document = urljoin(URL, link_tag["href"]) if link_tag else None
-        date = cols[1].get_text(strip=True)
+    rows = table.select("tr")
+    if not rows:
+        return
 
-        tenders.append({
-            "work": work,
-            "date": date,
-            "document": document,
-            "scraped_at": datetime.utcnow()
-        })
+    for record in TABLE.extract(rows[1:], header=rows[0]):  # first row is the header
+        record["scraped_at"] = datetime.utcnow()
+        yield record
 
-    return tenders
+# ---------------- Unified Schema ----------------
+# Canonical fields for the shared tenders collection (unified.py)
+UNIFIED = Mapping("IGIB", title="work", published="date", documents=DOCUMENT_FIELDS, base=BASE_URL)
 
 # ---------------- MongoDB Store ----------------
 def store_in_mongo(data):
-    if not data:
-        print(" No data found to insert")
-        return
-
-    client = MongoClient(MONGO_DB_URI)
-    db = client[MONGO_DB]
-    collection = db[MONGO_DB_COLLECTION]
-
-    collection.delete_many({})  # optional: clear previous data
-    collection.insert_many(data)
-
-    print(f"Inserted {len(data)} records into MongoDB")
+    # data can be a generator: records are written while the scraper is still parsing
+    return upsert_tenders(MONGO_DB_COLLECTION, data, KEY_FIELDS, DATE_FIELDS, unified=UNIFIED)
 
 # ---------------- MAIN ----------------
 def main():
     print("Scraping IGIB tenders...")
 
-    tenders = igib()
-    print(f"Fetched {len(tenders)} tenders")
+    try:
+        store_in_mongo(igib())
+    except NotModified:
+        print("No changes since last run, skipping")
+        return
 
-    store_in_mongo(tenders)
+    commit(URL)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
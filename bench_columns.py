@@ -0,0 +1,101 @@
+#Per-row extraction benchmark: hand-written ALHW column code vs the compiled column spec
+#usage-python bench_columns.py [pages/ALHW_tender.html] [--rows 500] [--repeat 20]
+#Without a page a synthetic 33-column ALHW table is generated
+import argparse
+import sys
+import time
+
+import html_parser
+from run_all import load_module
+
+# ---------------- Input ----------------
+def synthetic_page(rows):
+    header = "".join(f"<th>H{i}</th>" for i in range(33))
+    body = []
+    for r in range(rows):
+        cells = []
+        for i in range(33):
+            if i in (28, 30, 32):
+                cells.append(f'<td><a href="/docs/{r}/{i}.pdf">view</a></td>')
+            else:
+                cells.append(f"<td> value {r}-{i} </td>")
+        body.append("<tr>" + "".join(cells) + "</tr>")
+    return f'<div class="col-md-12"><table><tr>{header}</tr>{"".join(body)}</table></div>'
+
+# ---------------- Extractors ----------------
+NAMES = (
+    "inviting_officer", "sector", "state", "currency", "per_qual", "pincode", "id", "prebid_date",
+    "ref_no", "tender_title", "description", "location", "inviting_off_address", "fee", "value", "emd",
+    "public_date", "doc_start_date", "doc_end_date", "bidsub_start_date", "bidsub_end_date",
+    "bid_open_date", "form_contract", "prod_cat", "prod_sub_cat", "tender_type", "tender_category",
+)
+
+def legacy_rows(rows):
+    # The per-cell code ALHW_tender.py used before the column spec
+    for row in rows:
+        cols = row.select("td")
+        if len(cols) < 33:
+            continue
+        record = {name: cols[i].text() for i, name in enumerate(NAMES, 1)}
+        link = cols[28].select_one("a[href]")
+        record["link_tag"] = link.get("href") if link else ""
+        record["remark"] = cols[29].text()
+        link = cols[30].select_one("a[href]")
+        record["column31"] = link.get("href") if link else ""
+        record["column_32"] = cols[31].text()
+        link = cols[32].select_one("a[href]")
+        record["column33"] = link.get("href") if link else ""
+        yield record
+
+def timed(extract, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        records = list(extract())
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return records, best
+
+# ---------------- Benchmark ----------------
+def bench(html, repeat):
+    alhw = load_module("ALHW_tender.py")
+
+    print(f"{'backend':<14}{'rows':>6}{'legacy us/row':>15}{'spec us/row':>13}{'speedup':>9}  same")
+    print("-" * 64)
+
+    for backend in html_parser.BACKENDS:
+        try:
+            doc = html_parser.parse(html, alhw.CONTAINERS, backend)
+        except ImportError:
+            print(f"{backend:<14}not installed")
+            continue
+
+        rows = doc.select_one("div.col-md-12").select("tr")
+        old, old_time = timed(lambda: legacy_rows(rows[1:]), repeat)
+        new, new_time = timed(lambda: alhw.TABLE.extract(rows[1:], header=rows[0]), repeat)
+
+        n = max(1, len(new))
+        print(
+            f"{backend:<14}{len(new):>6}{old_time * 1e6 / n:>15.1f}{new_time * 1e6 / n:>13.1f}"
+            f"{old_time / new_time if new_time else 0:>8.1f}x  {'yes' if old == new else 'NO'}"
+        )
+
+# ---------------- MAIN ----------------
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark row extraction on the ALHW table")
+    parser.add_argument("page", nargs="?", help="saved ALHW page (default: synthetic table)")
+    parser.add_argument("--rows", type=int, default=500, help="rows in the synthetic table")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.page:
+        with open(args.page, encoding="utf-8") as f:
+            html = f.read()
+    else:
+        html = synthetic_page(args.rows)
+
+    bench(html, max(1, args.repeat))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
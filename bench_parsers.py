@@ -0,0 +1,159 @@
+#Parser backend benchmark on saved tender pages
+#usage-python bench_parsers.py --save pages/      (download every source's page once)
+#      python bench_parsers.py pages/ [--repeat 20]
+#      python bench_parsers.py pages/ --partial [--out partial.json]   (full page vs CONTAINERS only)
+#Pages are named <module>.html or <module>.<anything>.html, e.g. HAFED.page3.html
+import argparse
+import contextlib
+import glob
+import io
+import os
+import json
+import sys
+import time
+import tracemalloc
+
+import html_parser
+from run_all import discover_sources
+
+# ---------------- Helpers ----------------
+def available_backends():
+    backends = []
+    for name in html_parser.BACKENDS:
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                html_parser.parse("<html><body><p>x</p></body></html>", backend=name)
+            backends.append(name)
+        except ImportError:
+            print(f"skipping {name}: not installed")
+    return backends
+
+def comparable(records):
+    return [{k: v for k, v in r.items() if k != "scraped_at"} for r in records]
+
+def run_once(module, html, backend, containers=None):
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        records = list(module.extract_tenders(html_parser.parse(html, containers, backend)))
+        elapsed = time.perf_counter() - start
+    return records, elapsed
+
+def peak_memory(module, html, backend, containers=None):
+    # Python-heap peak only: C-level lxml / selectolax trees are not traced
+    tracemalloc.start()
+    try:
+        run_once(module, html, backend, containers)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def load_pages(pages_dir):
+    modules = {name: module for name, module, _ in discover_sources()}
+    for path in sorted(glob.glob(os.path.join(pages_dir, "*.html"))):
+        page = os.path.basename(path)
+        module = modules.get(page.split(".")[0])
+        if module is None or not hasattr(module, "extract_tenders"):
+            print(f"{page:<32}no matching scraper module")
+            continue
+        with open(path, encoding="utf-8") as f:
+            yield page, module, f.read()
+
+# ---------------- Save ----------------
+def save_pages(out_dir):
+    from http_client import fetch
+
+    os.makedirs(out_dir, exist_ok=True)
+    for name, module, _ in discover_sources():
+        try:
+            response = fetch(module.URL, cache=False)
+        except Exception as e:
+            print(f"{name}: {e}")
+            continue
+        path = os.path.join(out_dir, f"{name}.html")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(response.text)
+        print(f"saved {path} ({len(response.content)} bytes)")
+
+# ---------------- Benchmark ----------------
+def bench(pages_dir, repeat):
+    backends = available_backends()
+    baseline = backends[0]
+
+    print(f"{'page':<32}{'backend':<14}{'rows':>6}{'ms/page':>10}{'rows/sec':>12}  same")
+    print("-" * 82)
+
+    for page, module, html in load_pages(pages_dir):
+        expected = None
+        for backend in backends:
+            timings = []
+            for _ in range(repeat):
+                records, elapsed = run_once(module, html, backend)
+                timings.append(elapsed)
+
+            best = min(timings)
+            rows = len(records)
+            if backend == baseline:
+                expected = comparable(records)
+            same = "yes" if comparable(records) == expected else "NO"
+            rate = rows / best if best else 0.0
+            print(f"{page:<32}{backend:<14}{rows:>6}{best * 1000:>10.2f}{rate:>12.0f}  {same}")
+
+def bench_partial(pages_dir, repeat, out=None):
+    backend = html_parser.get_backend()
+    results = []
+
+    print(f"backend {backend}")
+    print(f"{'page':<32}{'full ms':>9}{'part ms':>9}{'full KiB':>10}{'part KiB':>10}{'rows':>6}  same")
+    print("-" * 84)
+
+    for page, module, html in load_pages(pages_dir):
+        containers = getattr(module, "CONTAINERS", None)
+        row = {"page": page, "backend": backend, "containers": list(containers or ()), "bytes": len(html)}
+
+        for label, target in (("full", None), ("partial", containers)):
+            timings = []
+            for _ in range(repeat):
+                records, elapsed = run_once(module, html, backend, target)
+                timings.append(elapsed)
+            row[f"{label}_ms"] = round(min(timings) * 1000, 3)
+            row[f"{label}_peak_kib"] = round(peak_memory(module, html, backend, target) / 1024, 1)
+            row[f"{label}_records"] = comparable(records)
+
+        row["rows"] = len(row["partial_records"])
+        row["same"] = row.pop("full_records") == row.pop("partial_records")
+        results.append(row)
+
+        print(
+            f"{page:<32}{row['full_ms']:>9.2f}{row['partial_ms']:>9.2f}"
+            f"{row['full_peak_kib']:>10.1f}{row['partial_peak_kib']:>10.1f}{row['rows']:>6}  "
+            f"{'yes' if row['same'] else 'NO'}"
+        )
+
+    if out:
+        with open(out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"results written to {out}")
+    return results
+
+# ---------------- MAIN ----------------
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark HTML parser backends on saved pages")
+    parser.add_argument("pages_dir")
+    parser.add_argument("--save", action="store_true", help="download each source's page into pages_dir")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--partial", action="store_true", help="compare full-page vs container-only parsing")
+    parser.add_argument("--out", help="write --partial results as JSON")
+    args = parser.parse_args()
+
+    if args.save:
+        save_pages(args.pages_dir)
+        return 0
+
+    if args.partial:
+        bench_partial(args.pages_dir, max(1, args.repeat), args.out)
+    else:
+        bench(args.pages_dir, max(1, args.repeat))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
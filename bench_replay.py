@@ -0,0 +1,294 @@
+#Offline replay benchmark: record every source's pages once, then replay them from a local server
+#usage-python bench_replay.py record [--only HAFED BDA] [--fixtures fixtures/]   (needs the live hosts)
+#      python bench_replay.py serve [--port 8800] [--latency 80] [--bandwidth 256]
+#      python bench_replay.py run [--latency 80] [--bandwidth 256] [--store] [--out replay.json]
+#Requests are redirected at the transport (http_client REPLAY_SERVER), so module URLs stay untouched
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import change_feed
+import host_health
+import html_parser
+import http_cache
+import http_client
+import mongo_store
+from run_all import discover_sources, run_source
+
+DEFAULT_FIXTURES = "fixtures"
+BENCH_DB = "tenders_bench"
+CHUNK = 16 * 1024
+
+# ---------------- Fixtures ----------------
+def index_path(fixtures_dir):
+    return os.path.join(fixtures_dir, "index.json")
+
+def load_index(fixtures_dir):
+    try:
+        with open(index_path(fixtures_dir), encoding="utf-8") as f:
+            return json.load(f)
+    except OSError:
+        return {}
+
+def save_index(fixtures_dir, index):
+    os.makedirs(fixtures_dir, exist_ok=True)
+    with open(index_path(fixtures_dir), "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=2, sort_keys=True)
+
+def load_body(fixtures_dir, entry):
+    with open(os.path.join(fixtures_dir, entry["file"]), "rb") as f:
+        return f.read()
+
+def select_sources(names):
+    sources = discover_sources()
+    if names:
+        wanted = {name.lower() for name in names}
+        sources = [s for s in sources if s[0].lower() in wanted]
+    return sources
+
+def use_scratch_cache():
+    # Benchmarks and recordings must not read or promote the real .http_cache,
+    # nor teach host_health the replay server's latencies, nor put replayed
+    # "created" / "updated" events in front of the real change feed consumers
+    scratch = tempfile.mkdtemp(prefix="replay_cache_")
+    http_cache.CACHE_DIR = scratch
+    host_health.STATE_FILE = os.path.join(scratch, "host_health.json")
+    host_health.reset()
+    if change_feed.ENABLED:
+        # Still written (run --store times the feed too), but to scratch segments and no Mongo mirror
+        change_feed._feed = change_feed.ChangeFeed(os.path.join(scratch, "changes"), collection=None)
+    http_client.set_force(True)
+
+# ---------------- Record ----------------
+def record(fixtures_dir, names=None):
+    index = load_index(fixtures_dir)
+    current = {"source": None}
+    lock = threading.Lock()
+    os.makedirs(os.path.join(fixtures_dir, "pages"), exist_ok=True)
+
+    def recorder(url, response):
+        name = f"pages/{http_cache.cache_key(url)}.html"
+        with open(os.path.join(fixtures_dir, name), "wb") as f:
+            f.write(response.content)
+        with lock:
+            index[url] = {
+                "source": current["source"],
+                "file": name,
+                "content_type": response.headers.get("Content-Type", "text/html"),
+                "encoding": response.encoding or response.apparent_encoding,
+                "bytes": len(response.content),
+            }
+
+    use_scratch_cache()
+    http_client.set_recorder(recorder)
+    try:
+        for name, module, func in select_sources(names):
+            current["source"] = name
+            result = run_source(name, module, func, store=False)
+            pages = sum(1 for e in index.values() if e["source"] == name)
+            print(f"[{name}] {pages} pages, {result['count']} tenders recorded")
+    finally:
+        http_client.set_recorder(None)
+        save_index(fixtures_dir, index)
+    print(f"index written to {index_path(fixtures_dir)} ({len(index)} pages)")
+
+# ---------------- Replay Server ----------------
+class ReplayHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the live hosts
+
+    def do_GET(self):
+        server = self.server
+        url = self.headers.get(http_client.REPLAY_HEADER)
+        entry = server.index.get(url)
+        with server.lock:
+            server.counts["hits" if entry else "misses"] += 1
+
+        if server.latency:
+            time.sleep(server.latency)
+
+        if entry is None:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        body = server.bodies[url]
+        self.send_response(200)
+        self.send_header("Content-Type", entry["content_type"])
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+
+        # Bandwidth is simulated per connection, one chunk at a time
+        for start in range(0, len(body), CHUNK):
+            chunk = body[start:start + CHUNK]
+            self.wfile.write(chunk)
+            if server.bandwidth:
+                time.sleep(len(chunk) / server.bandwidth)
+
+    def log_message(self, *args):
+        pass
+
+class ReplayServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, fixtures_dir, port=0, latency_ms=0, bandwidth_kib=0):
+        super().__init__(("127.0.0.1", port), ReplayHandler)
+        self.index = load_index(fixtures_dir)
+        self.bodies = {url: load_body(fixtures_dir, entry) for url, entry in self.index.items()}
+        self.latency = latency_ms / 1000
+        self.bandwidth = bandwidth_kib * 1024
+        self.counts = {"hits": 0, "misses": 0}
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+def start_server(fixtures_dir, port=0, latency_ms=0, bandwidth_kib=0):
+    server = ReplayServer(fixtures_dir, port, latency_ms, bandwidth_kib)
+    threading.Thread(target=server.serve_forever, name="replay-server", daemon=True).start()
+    return server
+
+# ---------------- Benchmark ----------------
+def quiet(func, *args, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func(*args, **kwargs)
+
+def best_of(repeat, func):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+def rate(count, seconds):
+    return count / seconds if seconds else 0.0
+
+def bench_source(fixtures_dir, index, name, module, func, repeat, store):
+    urls = sorted(u for u, e in index.items() if e["source"] == name)
+    row = {"source": name, "pages": len(urls), "bytes": sum(index[u]["bytes"] for u in urls)}
+
+    # Fetch: every recorded page through the shared transport
+    def fetch_all():
+        for url in urls:
+            http_client.fetch(url, cache=False)
+    _, seconds = best_of(repeat, fetch_all)
+    row["fetch_s"] = seconds
+    row["fetch_pages_per_s"] = rate(len(urls), seconds)
+    row["fetch_mib_per_s"] = rate(row["bytes"] / 2 ** 20, seconds)
+
+    # Parse: recorded bodies straight from disk, no network involved
+    containers = getattr(module, "CONTAINERS", None)
+    texts = [load_body(fixtures_dir, index[u]).decode(index[u]["encoding"] or "utf-8", "replace") for u in urls]
+
+    def parse_all():
+        records = []
+        for text in texts:
+            records.extend(module.extract_tenders(html_parser.parse(text, containers)))
+        return records
+    records, seconds = best_of(repeat, lambda: quiet(parse_all))
+    row["rows"] = len(records)
+    row["parse_s"] = seconds
+    row["parse_rows_per_s"] = rate(len(records), seconds)
+
+    # Store: into the bench database, first as all-new and then as all-unchanged
+    if store and records:
+        collection = module.MONGO_DB_COLLECTION
+        mongo_store.get_collection(collection).delete_many({})
+        for label in ("new", "unchanged"):
+            start = time.perf_counter()
+            quiet(mongo_store.upsert_tenders, collection, records, module.KEY_FIELDS)
+            seconds = time.perf_counter() - start
+            row[f"store_{label}_rows_per_s"] = rate(len(records), seconds)
+
+    # End to end: the scraper exactly as run_all runs it, against the replay server
+    result = quiet(run_source, name, module, func, store)
+    row["e2e_s"] = result["seconds"]
+    row["e2e_rows"] = result["count"]
+    row["error"] = result["error"]
+    return row
+
+def bench(fixtures_dir, names, latency_ms, bandwidth_kib, repeat, store, out=None):
+    index = load_index(fixtures_dir)
+    if not index:
+        print(f"No fixtures in {fixtures_dir}, run 'bench_replay.py record' first")
+        return []
+
+    server = start_server(fixtures_dir, 0, latency_ms, bandwidth_kib)
+    http_client.set_replay_server(server.url)
+    use_scratch_cache()
+    if store:
+        mongo_store.MONGO_DB = BENCH_DB
+
+    print(f"replay {server.url} | latency {latency_ms}ms | bandwidth {bandwidth_kib or 'unlimited'} KiB/s"
+          f" | parser {html_parser.get_backend()}" + (f" | store {BENCH_DB}" if store else ""))
+    print(f"{'source':<22}{'pages':>6}{'KiB':>8}{'fetch p/s':>11}{'parse rows/s':>14}"
+          f"{'store rows/s':>14}{'e2e s':>8}{'rows':>7}")
+    print("-" * 90)
+
+    results = []
+    try:
+        for name, module, func in select_sources(names):
+            if not any(e["source"] == name for e in index.values()):
+                print(f"{name:<22}no fixtures recorded")
+                continue
+            row = bench_source(fixtures_dir, index, name, module, func, repeat, store)
+            results.append(row)
+            stored = f"{row['store_new_rows_per_s']:>14.0f}" if "store_new_rows_per_s" in row else f"{'-':>14}"
+            print(
+                f"{name:<22}{row['pages']:>6}{row['bytes'] / 1024:>8.0f}{row['fetch_pages_per_s']:>11.1f}"
+                f"{row['parse_rows_per_s']:>14.0f}{stored}{row['e2e_s']:>8.2f}{row['e2e_rows']:>7}"
+                + (f"  {row['error']}" if row["error"] else "")
+            )
+    finally:
+        http_client.set_replay_server(None)
+        server.shutdown()
+
+    print(f"server: {server.counts['hits']} hits, {server.counts['misses']} misses")
+    if out:
+        with open(out, "w", encoding="utf-8") as f:
+            json.dump({"latency_ms": latency_ms, "bandwidth_kib": bandwidth_kib,
+                       "parser": html_parser.get_backend(), "results": results}, f, indent=2)
+        print(f"results written to {out}")
+    return results
+
+# ---------------- MAIN ----------------
+def main():
+    parser = argparse.ArgumentParser(description="Record tender pages and benchmark scrapers offline")
+    parser.add_argument("command", choices=("record", "serve", "run"))
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURES)
+    parser.add_argument("--only", nargs="*", help="module names, e.g. HAFED Bhatinda_DA")
+    parser.add_argument("--port", type=int, default=8800, help="port for 'serve'")
+    parser.add_argument("--latency", type=float, default=0, help="ms added to every response")
+    parser.add_argument("--bandwidth", type=float, default=0, help="KiB/s per response, 0 = unlimited")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--parser", choices=html_parser.BACKENDS, help="HTML parser backend")
+    parser.add_argument("--store", action="store_true", help=f"also time MongoDB writes (database {BENCH_DB})")
+    parser.add_argument("--out", help="write 'run' results as JSON")
+    args = parser.parse_args()
+
+    if args.parser:
+        html_parser.set_backend(args.parser)
+
+    if args.command == "record":
+        record(args.fixtures, args.only)
+    elif args.command == "serve":
+        server = ReplayServer(args.fixtures, args.port, args.latency, args.bandwidth)
+        print(f"Replaying {len(server.index)} pages on {server.url}")
+        print(f"Point scrapers at it with REPLAY_SERVER={server.url}")
+        server.serve_forever()
+    else:
+        bench(args.fixtures, args.only, args.latency, args.bandwidth, max(1, args.repeat), args.store, args.out)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,296 @@
+#Change feed: created / updated (field-level diff) / removed events for every stored tender
+#mongo_store.upsert_tenders hands each run's events to a FeedBatch; they are written as sealed,
+#append-only gzip JSONL segments named <first seq>-<last seq>.jsonl.gz, optionally also into a Mongo collection
+#Consumers keep their own offset (last seq processed), so notification / indexing jobs read only the deltas
+#usage-python change_feed.py tail [--consumer notify] [--from-seq 0] [--follow] [--limit 100]
+#      python change_feed.py consumers                 (offset and lag per consumer)
+#      python change_feed.py prune [--keep-days 30]    (segments every consumer has read)
+import argparse
+import glob
+import gzip
+import json
+import os
+import re
+import sys
+import threading
+import time
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+load_dotenv()
+# ---------------- Feed Config ----------------
+FEED_DIR = os.getenv("CHANGE_FEED_DIR", "changes")
+ENABLED = os.getenv("CHANGE_FEED", "1").lower() not in ("0", "false", "no", "off")
+MONGO_COLLECTION = os.getenv("CHANGE_FEED_COLLECTION")  # e.g. "tender_changes"; unset = files only
+SEGMENT_EVENTS = int(os.getenv("CHANGE_FEED_SEGMENT_EVENTS", "10000"))  # a long run is split into segments
+LOCK_STALE = 60.0  # seconds after which a left-over lock file is taken over
+
+CREATED, UPDATED, REMOVED = "created", "updated", "removed"
+
+# Bookkeeping written by mongo_store / dates / pdf_extract: not part of a tender's diff
+IGNORED_FIELDS = ("removed", "removed_at", "updated_at", "first_seen", "documents_text")
+
+_SEGMENT = re.compile(r"(\d{12})-(\d{12})\.jsonl\.gz$")
+
+# ---------------- Diff ----------------
+def diff(old, new, ignore=()):
+    # {field: [old, new]} over the scraped fields; derived (*_dt, _fp, _hash ...) and volatile ones skipped
+    changes = {}
+    for field in set(old) | set(new):
+        if field.startswith("_") or field.endswith("_dt") or field in IGNORED_FIELDS or field in ignore:
+            continue
+        before, after = old.get(field), new.get(field)
+        if before != after:
+            changes[field] = [before, after]
+    return changes
+
+def _json(event):
+    return json.dumps(event, default=lambda v: v.isoformat() if isinstance(v, datetime) else str(v),
+                      ensure_ascii=False, sort_keys=True)
+
+# ---------------- Writing ----------------
+class FileLock:
+    # O_EXCL lock file: works across processes and on Windows; a lock older than LOCK_STALE is taken over
+    def __init__(self, path):
+        self.path = path
+
+    def __enter__(self):
+        while True:
+            try:
+                os.close(os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return self
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(self.path) > LOCK_STALE:
+                        os.remove(self.path)
+                        continue
+                except OSError:
+                    continue
+                time.sleep(0.02)
+
+    def __exit__(self, *exc):
+        os.remove(self.path)
+
+class ChangeFeed:
+    def __init__(self, directory=FEED_DIR, collection=MONGO_COLLECTION):
+        self.directory = directory
+        self.collection = collection
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def batch(self, source):
+        return FeedBatch(self, source)
+
+    def _next_seq(self):
+        # .last_seq survives prune deleting every segment; the names cover a lost .last_seq
+        last = max((s[1] for s in segments(self.directory)), default=0)
+        try:
+            with open(os.path.join(self.directory, ".last_seq"), encoding="utf-8") as f:
+                last = max(last, int(f.read().strip() or 0))
+        except (OSError, ValueError):
+            pass
+        return last + 1
+
+    def write(self, events):
+        # Numbers and writes one segment; the lock keeps segments appearing in sequence order,
+        # so a consumer that has seen seq N never finds a segment below N later
+        if not events:
+            return
+        with self.lock, FileLock(os.path.join(self.directory, ".lock")):
+            first = self._next_seq()
+            for i, event in enumerate(events):
+                event["seq"] = first + i
+            last = first + len(events) - 1
+            path = os.path.join(self.directory, f"{first:012d}-{last:012d}.jsonl.gz")
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with gzip.open(tmp, "wt", encoding="utf-8") as f:
+                for event in events:
+                    f.write(_json(event) + "\n")
+            os.replace(tmp, path)
+            with open(os.path.join(self.directory, ".last_seq"), "w", encoding="utf-8") as f:
+                f.write(str(last))
+
+        if self.collection:
+            from pymongo import ReplaceOne
+
+            from mongo_store import get_writer
+
+            # _id = seq: replayable; _fp because every store collection has a unique index on it
+            writer = get_writer()
+            for event in events:
+                doc = dict(event, _id=event["seq"], _fp=f"change:{event['seq']}")
+                writer.put(self.collection, ReplaceOne({"_id": event["seq"]}, doc, upsert=True))
+            writer.flush(self.collection)
+
+class FeedBatch:
+    # Events of one store_in_mongo run. upsert_tenders flushes it after its own Mongo writes landed
+    # (every SEGMENT_EVENTS events, and at the end), so a consumer never sees an event before the data
+    def __init__(self, feed, source):
+        self.feed = feed
+        self.source = source
+        self.events = []
+        self.counts = {CREATED: 0, UPDATED: 0, REMOVED: 0}
+
+    def add(self, kind, fp, now, **fields):
+        self.events.append(dict(fields, type=kind, source=self.source, fp=fp, ts=now))
+        self.counts[kind] += 1
+
+    def full(self):
+        return len(self.events) >= SEGMENT_EVENTS
+
+    def created(self, fp, record, now):
+        self.add(CREATED, fp, now, record={k: v for k, v in record.items() if not k.startswith("_")})
+
+    def updated(self, fp, old, new, now, ignore=()):
+        changes = diff(old or {}, new, ignore)
+        if old and old.get("removed"):
+            changes["removed"] = [True, False]  # listed again
+        self.add(UPDATED, fp, now, diff=changes)
+
+    def removed(self, fps, now):
+        for fp in fps:
+            self.add(REMOVED, fp, now)
+
+    def flush(self):
+        events, self.events = self.events, []
+        self.feed.write(events)
+
+_feed = None
+_feed_lock = threading.Lock()
+
+def get_feed():
+    # None when CHANGE_FEED=0
+    global _feed
+    if not ENABLED:
+        return None
+    if _feed is None:
+        with _feed_lock:
+            if _feed is None:
+                _feed = ChangeFeed()
+    return _feed
+
+# ---------------- Reading ----------------
+def segments(directory=FEED_DIR):
+    found = []
+    for path in glob.glob(os.path.join(directory, "*.jsonl.gz")):
+        m = _SEGMENT.search(path)
+        if m:
+            found.append((int(m.group(1)), int(m.group(2)), path))
+    return sorted(found)
+
+def read(after=0, directory=FEED_DIR):
+    # Events with seq > after, in order; whole segments below the offset are not opened
+    for first, last, path in segments(directory):
+        if last <= after:
+            continue
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                event = json.loads(line)
+                if event["seq"] > after:
+                    yield event
+
+class Consumer:
+    # Offset = last seq fully processed, saved atomically; at-least-once: commit after handling
+    def __init__(self, name, directory=FEED_DIR):
+        self.name = name
+        self.directory = directory
+        self.path = os.path.join(directory, "offsets", f"{name}.json")
+        self.offset = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)["offset"]
+        except (OSError, ValueError, KeyError):
+            return 0
+
+    def poll(self, limit=None):
+        events = []
+        for event in read(self.offset, self.directory):
+            events.append(event)
+            if limit and len(events) >= limit:
+                break
+        return events
+
+    def commit(self, seq):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"offset": seq, "committed_at": time.time()}, f)
+        os.replace(tmp, self.path)
+        self.offset = seq
+
+def consumers(directory=FEED_DIR):
+    names = glob.glob(os.path.join(directory, "offsets", "*.json"))
+    return [Consumer(os.path.basename(p)[:-5], directory) for p in sorted(names)]
+
+def prune(keep_days=None, directory=FEED_DIR):
+    # Deletes segments every consumer is past (and, with keep_days, only those older than that)
+    offsets = [c.offset for c in consumers(directory)]
+    if not offsets:
+        return 0
+    floor = min(offsets)
+    cutoff = time.time() - keep_days * 86400 if keep_days else None
+    removed = 0
+    for first, last, path in segments(directory):
+        if last <= floor and (cutoff is None or os.path.getmtime(path) < cutoff):
+            os.remove(path)
+            removed += 1
+    return removed
+
+# ---------------- MAIN ----------------
+def _print(event):
+    if event["type"] == UPDATED:
+        detail = ", ".join(f"{field}: {old!r} -> {new!r}" for field, (old, new) in sorted(event["diff"].items()))
+    elif event["type"] == CREATED:
+        detail = ", ".join(f"{k}={v!r}" for k, v in list(event["record"].items())[:3])
+    else:
+        detail = ""
+    print(f"{event['seq']:>8} {event['ts'][:19]} {event['source']:<28}{event['type']:<9}{event['fp'][:12]}  {detail[:120]}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Read the tender change feed")
+    parser.add_argument("command", choices=("tail", "consumers", "prune"))
+    parser.add_argument("--consumer", help="read from / commit to this consumer's offset")
+    parser.add_argument("--from-seq", type=int, default=0, help="start after this seq (without --consumer)")
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--follow", action="store_true", help="keep waiting for new segments")
+    parser.add_argument("--keep-days", type=float, help="'prune' keeps segments younger than this")
+    args = parser.parse_args()
+
+    if args.command == "consumers":
+        last = max((s[1] for s in segments()), default=0)
+        print(f"last seq {last}")
+        for consumer in consumers():
+            print(f"{consumer.name:<24} offset {consumer.offset:>10}  lag {last - consumer.offset:>8}")
+        return 0
+    if args.command == "prune":
+        print(f"{prune(args.keep_days)} segments removed")
+        return 0
+
+    consumer = Consumer(args.consumer) if args.consumer else None
+    offset = consumer.offset if consumer else args.from_seq
+    try:
+        while True:
+            events = []
+            for event in read(offset):
+                events.append(event)
+                if len(events) >= args.limit:
+                    break
+            for event in events:
+                _print(event)
+            if events:
+                offset = events[-1]["seq"]
+                if consumer:
+                    consumer.commit(offset)
+            if not args.follow:
+                break
+            if len(events) < args.limit:
+                time.sleep(2)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+#Declarative column specs for table-based scrapers
+#A Table lists its Columns once; for every parser backend and header row it is compiled into a
+#plan of (field, cell position, getter) working on the raw parser elements, so rows become
+#records without per-cell selector lookups or node wrappers
+#Columns are found by their explicit header labels first and by position only when no label matches;
+#a column with no position whose labels are missing from the table raises ColumnNotFound
+import re
+import time
+from functools import partial
+from urllib.parse import urljoin
+
+import metrics
+
+HEADER_RE = re.compile(r"[^a-z0-9]+")
+
+def normalize_header(label):
+    return HEADER_RE.sub(" ", label.lower()).strip()
+
+class ColumnNotFound(ValueError):
+    # A required column could not be placed in the table: failing beats storing an empty field
+    pass
+
+# ---------------- Column ----------------
+class Column:
+    __slots__ = ("name", "index", "headers", "required", "kind", "sep", "strip", "base", "default", "get")
+
+    # header: labels matched against the table's header row; only these, never the field name,
+    # so renaming a field (e.g. for the unified mapping) cannot change which cell it reads
+    # required: False lets a header-only column (no index) be left out when its header is missing
+    # kind: "text" (cell text, joined with sep) or "href" (first link, joined with base)
+    # get: any callable taking the cell node, for columns that are neither
+    def __init__(self, name, index=None, header=(), kind="text", sep="", strip=True,
+                 base=None, default="", get=None, required=True):
+        labels = (header,) if isinstance(header, str) else tuple(header)
+        if index is None and not labels:
+            raise ValueError(f"column {name!r} needs an index or a header")
+        self.name = name
+        self.index = index
+        self.headers = {normalize_header(label) for label in labels}
+        self.required = required
+        self.kind = kind
+        self.sep = sep
+        self.strip = strip
+        self.base = base
+        self.default = default
+        self.get = get
+
+    def getter(self, node_cls):
+        if self.get is not None:
+            get = self.get
+            return lambda el: get(node_cls(el))
+
+        if self.kind == "href":
+            raw_link, base, default = node_cls.raw_link, self.base, self.default
+
+            def href(el):
+                value = raw_link(el)
+                if value is None:
+                    return default
+                return urljoin(base, value) if base else value
+            return href
+
+        return partial(node_cls.raw_text, sep=self.sep, strip=self.strip)
+
+# ---------------- Table ----------------
+class Table:
+    # cells: tags counted as cells; min_cells: skip shorter rows even if no column needs them
+    def __init__(self, columns, cells=("td",), min_cells=0):
+        self.columns = tuple(columns)
+        self.cells = cells
+        self.min_cells = min_cells
+        self._plans = {}
+        self._missing = set()  # columns already reported as read by position
+
+    def compile(self, node_cls, labels=()):
+        # labels: header texts of the table; plans are reused per backend and header layout
+        labels = tuple(normalize_header(label) for label in labels)
+        plan = self._plans.get((node_cls, labels))
+        if plan is not None:
+            return plan
+
+        positions = {}
+        for i, label in enumerate(labels):
+            positions.setdefault(label, []).append(i)
+
+        fields = []
+        for column in self.columns:
+            found = [i for label in column.headers for i in positions.get(label, ())]
+            if found:
+                # Same label twice (e.g. two "Date" columns): take the one nearest the spec
+                index = min(found, key=lambda i: abs(i - (column.index or 0)))
+                if column.index is not None and index != column.index:
+                    print(f"column {column.name!r} moved from {column.index} to {index}")
+            else:
+                index = column.index
+                if index is None and column.required:
+                    raise ColumnNotFound(f"column {column.name!r}: no header {sorted(column.headers)} in {list(labels)}")
+                if index is not None and column.headers and labels and column.name not in self._missing:
+                    self._missing.add(column.name)
+                    print(f"column {column.name!r}: no header {sorted(column.headers)}, read at position {index}")
+            if index is not None:
+                fields.append((column.name, index, column.getter(node_cls)))
+
+        min_cells = max([self.min_cells] + [index + 1 for _, index, _ in fields])
+        plan = (tuple(fields), min_cells)
+        self._plans[(node_cls, labels)] = plan
+        return plan
+
+    def extract(self, rows, header=None):
+        # header: the table's header row node, or None to map by position only
+        labels = [cell.text() for cell in header.children(("th", "td"))] if header is not None else ()
+        tags = self.cells
+        plan = None
+        parsed = skipped = 0
+        elapsed = 0.0
+
+        try:
+            for row in rows:
+                start = time.perf_counter()
+                if plan is None:
+                    fields, min_cells = plan = self.compile(type(row), labels)
+                    raw_children = type(row).raw_children
+
+                cells = raw_children(row.el, tags)
+                if len(cells) < min_cells:
+                    skipped += 1
+                    elapsed += time.perf_counter() - start
+                    continue
+                record = {name: get(cells[index]) for name, index, get in fields}
+                parsed += 1
+                # Only our own time: the consumer (e.g. the Mongo writer) runs between yields
+                elapsed += time.perf_counter() - start
+                yield record
+        finally:
+            metrics.stage("extract", elapsed)
+            metrics.count_rows(parsed, skipped)
@@ -0,0 +1,315 @@
+#Date normalization for the tender scrapers: raw portal strings -> datetime fields
+#Each source/column has its own format ("12-02-2026", "2026-02-12", "12 Feb 2026 03:00 PM" ...)
+#The format is detected once per (source, field), kept in a state file, and the parsed value of
+#each distinct string is memoized, so a backfill mostly costs a dict lookup per value
+#Stored next to the raw string as <field>_dt (portal wall-clock time, no timezone conversion)
+#usage-python dates.py [--only HAFED CMRF]      (backfill <field>_dt / deadline_dt on stored tenders)
+#      python dates.py --show | --reset | --bench [--n 1000000]
+import argparse
+import atexit
+import json
+import os
+import re
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+
+from dotenv import load_dotenv
+
+load_dotenv()
+# ---------------- Dates Config ----------------
+STATE_FILE = os.getenv("DATE_FORMATS_FILE", ".date_formats.json")
+SUFFIX = "_dt"
+DEADLINE = "deadline_dt"  # one field across sources for "closing before/after" queries
+PORTAL_TZ = timezone(timedelta(hours=5, minutes=30), "IST")  # Asia/Kolkata has no DST: no tzdata needed
+
+MONTHS = {
+    "jan": 1, "feb": 2, "mar": 3, "apr": 4, "may": 5, "jun": 6,
+    "jul": 7, "aug": 8, "sep": 9, "sept": 9, "oct": 10, "nov": 11, "dec": 12,
+}
+for _number, _name in enumerate(("january", "february", "march", "april", "may", "june", "july",
+                                 "august", "september", "october", "november", "december"), 1):
+    MONTHS[_name] = _number
+
+def portal_now():
+    # "Now" on the portals' wall clock, naive like the stored *_dt values, on a host in any timezone
+    return datetime.now(PORTAL_TZ).replace(tzinfo=None)
+
+# ---------------- Formats ----------------
+# name -> (regex, order of day/month/year groups); listed in order of preference, so an
+# ambiguous "01/02/2026" reads day-first like every portal here until a value says otherwise
+FORMATS = {
+    "dmy": (r"\b(\d{1,2})([-/.])(\d{1,2})\2(\d{4})\b", ("d", None, "m", "y")),
+    "ymd": (r"\b(\d{4})([-/.])(\d{1,2})\2(\d{1,2})\b", ("y", None, "m", "d")),
+    "d_mon_y": (r"\b(\d{1,2})(?:st|nd|rd|th)?[\s\-/.,]*([A-Za-z]{3,9})\.?[\s\-/.,]*(\d{4})\b", ("d", "b", "y")),
+    "mon_d_y": (r"\b([A-Za-z]{3,9})\.?\s+(\d{1,2})(?:st|nd|rd|th)?,?\s+(\d{4})\b", ("b", "d", "y")),
+    "mdy": (r"\b(\d{1,2})([-/.])(\d{1,2})\2(\d{4})\b", ("m", None, "d", "y")),
+    "dmy2": (r"\b(\d{1,2})([-/.])(\d{1,2})\2(\d{2})\b", ("d", None, "m", "yy")),
+}
+_COMPILED = {name: (re.compile(pattern), order) for name, (pattern, order) in FORMATS.items()}
+
+# Optional time right after the date: "15:00", "03:00 PM", "at 3.00 p.m.", ", 11:30:00 AM"
+_TIME = re.compile(r"[\s,]*(?:at\s*)?(\d{1,2})[:.](\d{2})(?:[:.](\d{2}))?\s*(?:([AaPp])\.?\s*[Mm]\.?)?")
+
+@lru_cache(maxsize=65536)
+def parse_as(name, value):
+    # One format on one string; memoized because listings repeat the same dates on every row
+    regex, order = _COMPILED[name]
+    m = regex.search(value)
+    if not m:
+        return None
+
+    parts = {}
+    for key, group in zip(order, m.groups()):
+        if key == "b":
+            month = MONTHS.get(group.lower())
+            if month is None:
+                return None
+            parts["m"] = month
+        elif key == "yy":
+            parts["y"] = 2000 + int(group)
+        elif key:
+            parts[key] = int(group)
+
+    hour = minute = second = 0
+    t = _TIME.match(value, m.end())
+    if t:
+        hour, minute, second = int(t.group(1)), int(t.group(2)), int(t.group(3) or 0)
+        meridiem = (t.group(4) or "").lower()
+        if meridiem == "p" and hour < 12:
+            hour += 12
+        elif meridiem == "a" and hour == 12:
+            hour = 0
+    try:
+        return datetime(parts["y"], parts["m"], parts["d"], hour, minute, second)
+    except ValueError:  # 31-02-2026, 25:00 ...
+        try:
+            return datetime(parts["y"], parts["m"], parts["d"])
+        except ValueError:
+            return None
+
+@lru_cache(maxsize=65536)
+def matching_formats(value):
+    return tuple(name for name in FORMATS if parse_as(name, value) is not None)
+
+# ---------------- Per-field detection ----------------
+class DateField:
+    # Candidates = formats consistent with every value seen so far, best first.
+    # Values that fit the current best cost one memoized call; others narrow the list.
+    def __init__(self, source, field, candidates=None):
+        self.source = source
+        self.field = field
+        self.candidates = list(candidates or FORMATS)
+        self.lock = threading.Lock()
+
+    @property
+    def format(self):
+        return self.candidates[0]
+
+    def parse(self, value):
+        if not isinstance(value, str) or not value.strip():
+            return None
+        parsed = parse_as(self.candidates[0], value)
+        if parsed is not None:
+            return parsed
+
+        matching = matching_formats(value)
+        if not matching:
+            return None  # "NA", "Cancelled", ...
+        with self.lock:
+            narrowed = [name for name in self.candidates if name in matching]
+            if not narrowed:
+                # Nothing seen so far explains this value: the portal changed its format
+                print(f"{self.source}.{self.field}: date format changed from {self.candidates[0]} to {matching[0]} ({value!r})")
+                narrowed = list(matching)
+            self.candidates = narrowed
+            _dirty.set()
+        return parse_as(self.candidates[0], value)
+
+# ---------------- Registry ----------------
+_fields = None
+_lock = threading.Lock()
+_dirty = threading.Event()
+
+def _load():
+    global _fields
+    if _fields is None:
+        try:
+            with open(STATE_FILE, encoding="utf-8") as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            saved = {}
+        _fields = {}
+        for key, candidates in saved.items():
+            source, _, field = key.partition("|")
+            candidates = [name for name in candidates if name in FORMATS]
+            if candidates:
+                _fields[(source, field)] = DateField(source, field, candidates)
+    return _fields
+
+def field_parser(source, field):
+    key = (source, field)
+    parser = _fields.get(key) if _fields is not None else None
+    if parser is None:
+        with _lock:
+            fields = _load()
+            parser = fields.get(key)
+            if parser is None:
+                parser = fields[key] = DateField(source, field)
+                _dirty.set()
+    return parser
+
+def reset(source=None):
+    with _lock:
+        fields = _load()
+        for key in [k for k in fields if source is None or k[0] == source]:
+            del fields[key]
+        _dirty.set()
+
+def save():
+    with _lock:
+        if _fields is None or not _dirty.is_set():
+            return
+        data = json.dumps({f"{s}|{f}": p.candidates for (s, f), p in sorted(_fields.items())}, indent=1)
+        _dirty.clear()
+    tmp = f"{STATE_FILE}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(data)
+    os.replace(tmp, STATE_FILE)
+
+atexit.register(save)
+
+# ---------------- Normalize ----------------
+def normalize(record, source, date_fields, deadline_field=None):
+    # Adds <field>_dt (None when the string is not a date) and deadline_dt in place
+    for field in date_fields:
+        record[field + SUFFIX] = field_parser(source, field).parse(record.get(field))
+    if deadline_field:
+        record[DEADLINE] = record.get(deadline_field + SUFFIX)
+    return record
+
+def derived_fields(module):
+    fields = [f + SUFFIX for f in getattr(module, "DATE_FIELDS", ())]
+    if getattr(module, "DEADLINE_FIELD", None):
+        fields.append(DEADLINE)
+    return fields
+
+# ---------------- Backfill ----------------
+def backfill(module):
+    # Rewrites only the documents whose derived fields differ (new parser, or written before dates.py)
+    from pymongo import UpdateOne
+
+    from mongo_store import get_collection, get_writer
+
+    source = module.MONGO_DB_COLLECTION
+    date_fields = getattr(module, "DATE_FIELDS", ())
+    deadline_field = getattr(module, "DEADLINE_FIELD", None)
+    derived = derived_fields(module)
+    writer = get_writer()
+
+    stats = {"documents": 0, "updated": 0, "unparsed": 0}
+    projection = {f: 1 for f in list(date_fields) + derived}
+    for doc in get_collection(source).find({}, projection):
+        stats["documents"] += 1
+        before = {f: doc.get(f) for f in derived}
+        normalize(doc, source, date_fields, deadline_field)
+        stats["unparsed"] += sum(1 for f in date_fields if doc.get(f) and doc[f + SUFFIX] is None)
+        after = {f: doc[f] for f in derived}
+        if after != before:
+            writer.put(source, UpdateOne({"_id": doc["_id"]}, {"$set": after}))
+            stats["updated"] += 1
+    writer.flush(source)
+    return stats
+
+def backfill_sources(sources):
+    for name, module, _ in sources:
+        if not getattr(module, "DATE_FIELDS", None):
+            continue
+        start = time.perf_counter()
+        stats = backfill(module)
+        formats = ", ".join(f"{f}={field_parser(module.MONGO_DB_COLLECTION, f).format}" for f in module.DATE_FIELDS)
+        print(
+            f"{name}: {stats['documents']} tenders, {stats['updated']} updated, {stats['unparsed']} values "
+            f"not dates in {time.perf_counter() - start:.2f}s ({formats})"
+        )
+
+# ---------------- Benchmark ----------------
+NAIVE_FORMATS = ("%d-%m-%Y", "%d/%m/%Y", "%d/%m/%Y %I:%M %p", "%Y-%m-%d", "%d %b %Y", "%d-%m-%Y %H:%M")
+
+def _naive(value):
+    # What a scraper does without detection: try every strptime format on every value
+    for fmt in NAIVE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            pass
+    return None
+
+def bench(n):
+    # n values per shape drawn from two years of dates, the shape of a real backfill
+    import random
+
+    random.seed(1)
+    first = datetime(2024, 1, 1).toordinal()
+    shapes = {
+        "dd-mm-yyyy": "%d-%m-%Y",
+        "dd/mm/yyyy hh:mm pm": "%d/%m/%Y %I:%M %p",
+        "dd Mon yyyy": "%d %b %Y",
+    }
+    print(f"{'shape':<22}{'values':>9}{'strptime/s':>13}{'dates.py/s':>13}{'speedup':>9}  format")
+    for shape, fmt in shapes.items():
+        values = [
+            datetime.fromordinal(first + random.randrange(730)).replace(hour=random.choice((11, 15, 17))).strftime(fmt)
+            for _ in range(n)
+        ]
+
+        start = time.perf_counter()
+        for value in values:
+            _naive(value)
+        naive = time.perf_counter() - start
+
+        parse_as.cache_clear()
+        matching_formats.cache_clear()
+        field = DateField("bench", shape)
+        start = time.perf_counter()
+        for value in values:
+            field.parse(value)
+        seconds = time.perf_counter() - start
+        print(f"{shape:<22}{n:>9}{n / naive:>13,.0f}{n / seconds:>13,.0f}{naive / seconds:>8.1f}x  {field.format}")
+
+# ---------------- MAIN ----------------
+def main():
+    parser = argparse.ArgumentParser(description="Backfill typed date fields on stored tenders")
+    parser.add_argument("--only", nargs="*", help="module names, e.g. HAFED CMRF")
+    parser.add_argument("--show", action="store_true", help="print the detected format per source and field")
+    parser.add_argument("--reset", action="store_true", help="forget detected formats (re-detected on next run)")
+    parser.add_argument("--bench", action="store_true", help="normalize synthetic rows and print values/s")
+    parser.add_argument("--n", type=int, default=300000, help="values per shape used by --bench")
+    args = parser.parse_args()
+
+    if args.bench:
+        bench(args.n)
+        return 0
+    if args.reset:
+        reset()
+        save()
+        print("date formats reset")
+        return 0
+    if args.show:
+        for (source, field), p in sorted(_load().items()):
+            print(f"{source:<28}{field:<28}{p.format:<10}candidates: {', '.join(p.candidates)}")
+        return 0
+
+    from run_all import discover_sources
+
+    sources = discover_sources()
+    if args.only:
+        wanted = {name.lower() for name in args.only}
+        sources = [s for s in sources if s[0].lower() in wanted]
+    backfill_sources(sources)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
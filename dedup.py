@@ -0,0 +1,323 @@
+#Near-duplicate detection on the unified tender collection (MinHash + LSH)
+#The same notice is cross-posted by sibling portals (aurangabad / arwal NIC sites) and corrigenda come
+#back with slightly different titles; duplicates share a cluster_id, all but one are duplicate=True
+#Signatures are banded into _lsh keys with a multikey index, so a new record is compared only
+#with the few documents sharing a band - not with the whole collection
+#usage-python dedup.py [--rebuild] [--show 10]      (cluster tenders written since the last run)
+#      python dedup.py --bench [--n 100000]          (LSH vs. all-pairs on synthetic titles)
+import argparse
+import hashlib
+import random
+import re
+import sys
+import time
+from datetime import datetime
+from functools import lru_cache
+
+from dotenv import load_dotenv
+from pymongo import UpdateMany, UpdateOne
+
+from mongo_store import UNIFIED_COLLECTION, get_collection, get_writer
+
+load_dotenv()
+# ---------------- Dedup Config ----------------
+NUM_PERM = 64
+BANDS = 16                # 16 bands x 4 rows: pairs above ~0.5 Jaccard almost always share a band
+ROWS = NUM_PERM // BANDS
+THRESHOLD = 0.6           # estimated Jaccard needed to call two tenders the same
+MAX_CANDIDATES = 200      # per record; a band shared by hundreds of docs is boilerplate, not a match
+SHINGLE_WORDS = 2
+
+# Words every tender title has: left out so "Tender for supply of X" matches on X
+STOPWORDS = {
+    "a", "an", "and", "at", "by", "for", "from", "in", "of", "on", "or", "the", "to", "with",
+    "tender", "tenders", "notice", "nit", "e", "invitation", "inviting", "regarding", "reg",
+}
+
+# h(x) = (a*x + b) mod p with a 31-bit prime: products stay in machine-size ints, 2x faster than 61-bit
+_PRIME = (1 << 31) - 1
+_rng = random.Random(20240101)  # fixed: signatures stored in Mongo must stay comparable across runs
+PERMS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+_WORD = re.compile(r"[a-z0-9]+")
+
+# ---------------- MinHash ----------------
+def shingles(text):
+    words = [w for w in _WORD.findall((text or "").lower()) if w not in STOPWORDS]
+    if len(words) < SHINGLE_WORDS:
+        return set(words)
+    return {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+
+@lru_cache(maxsize=65536)
+def _permuted(shingle):
+    # The shingle under every permutation; cached because the same word pairs recur across tenders
+    x = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=4).digest(), "little") % _PRIME
+    return [(a * x + b) % _PRIME for a, b in PERMS]
+
+def minhash(shingle_set):
+    if not shingle_set:
+        return None
+    return list(map(min, zip(*map(_permuted, shingle_set))))
+
+def bands(signature):
+    keys = []
+    for band in range(BANDS):
+        rows = signature[band * ROWS:(band + 1) * ROWS]
+        digest = hashlib.blake2b(repr(rows).encode(), digest_size=8).hexdigest()
+        keys.append(f"{band}:{digest}")
+    return keys
+
+def similarity(sig_a, sig_b):
+    return sum(1 for a, b in zip(sig_a, sig_b) if a == b) / NUM_PERM
+
+def tender_text(doc):
+    return " ".join(filter(None, (doc.get("title"), doc.get("description"), doc.get("reference"))))
+
+# ---------------- Clusters ----------------
+class Clusters:
+    # Union-find over cluster ids; the root of a group is the id the group ends up with.
+    # rank(id) orders the candidates for root: the lowest rank (oldest first_seen) wins.
+    def __init__(self, rank):
+        self.parent = {}
+        self.rank = rank
+
+    def find(self, node):
+        self.parent.setdefault(node, node)
+        while self.parent[node] != node:
+            self.parent[node] = self.parent[self.parent[node]]
+            node = self.parent[node]
+        return node
+
+    def union(self, a, b):
+        ra, rb = self.find(a), self.find(b)
+        if ra == rb:
+            return
+        if self.rank(rb) < self.rank(ra):
+            ra, rb = rb, ra
+        self.parent[rb] = ra
+
+# ---------------- Dedup ----------------
+def ensure_indexes(collection):
+    collection.create_index("_lsh", name="lsh_bands")  # multikey: one entry per band
+    collection.create_index("cluster_id", name="cluster")
+    # Roots removed but not yet re-rooted: re-rooting marks them duplicate, so the index holds only
+    # the roots removed since the last pass and the sweep never scans the collection
+    collection.create_index("cluster_id", name="removed_roots",
+                            partialFilterExpression={"removed": True, "duplicate": False})
+
+def reroot(collection, writer, old_root):
+    # The oldest live member takes over a cluster its root has left; False when none is left
+    live = list(collection.find({"cluster_id": old_root, "removed": {"$ne": True}}, {"_fp": 1})
+                .sort("first_seen", 1).limit(1))
+    new_root = live[0]["_fp"] if live else None
+    writer.put(UNIFIED_COLLECTION, UpdateMany(
+        {"cluster_id": old_root, "_fp": {"$ne": new_root}}, {"$set": {"cluster_id": new_root, "duplicate": True}}
+    ))
+    if new_root:
+        writer.put(UNIFIED_COLLECTION, UpdateOne(
+            {"_fp": new_root}, {"$set": {"cluster_id": new_root, "duplicate": False}}
+        ))
+    return bool(live)
+
+def dedup(collection=None, threshold=THRESHOLD):
+    # Clusters every document without _lsh: new ones, and changed ones (unified.Mapping unsets it)
+    collection = collection or get_collection(UNIFIED_COLLECTION)
+    ensure_indexes(collection)
+    start = time.perf_counter()
+    stats = {"records": 0, "empty": 0, "candidates": 0, "duplicates": 0, "merged": 0, "rerooted": 0}
+
+    # New records, oldest first so the first copy seen stays the non-duplicate one
+    writer = get_writer()
+    pending = []
+    first_seen = {}         # fp -> first_seen: the oldest record of a cluster is its root
+    roots = set()           # changed records that were the root of a stored cluster
+    left = []               # roots whose rewrite took them out of their cluster
+    fields = {"_fp": 1, "title": 1, "description": 1, "reference": 1, "first_seen": 1, "cluster_id": 1}
+    for doc in collection.find({"_lsh": None, "removed": {"$ne": True}}, fields).sort("first_seen", 1):
+        if doc.get("cluster_id") == doc["_fp"]:
+            roots.add(doc["_fp"])
+        signature = minhash(shingles(tender_text(doc)))
+        if signature is None:
+            # Empty _lsh: marked as done, not rescanned on every run (a rewrite unsets it again)
+            stats["empty"] += 1
+            if doc["_fp"] in roots:
+                left.append(doc["_fp"])
+            writer.put(UNIFIED_COLLECTION, UpdateOne(
+                {"_fp": doc["_fp"]}, {"$set": {"_lsh": [], "cluster_id": None, "duplicate": False}}
+            ))
+            continue
+        first_seen[doc["_fp"]] = doc.get("first_seen")
+        pending.append((doc["_fp"], signature, bands(signature)))
+    stats["records"] = len(pending)
+
+    def stored_cluster(cluster_id):
+        # A stored cluster ranks by its root's first_seen; the root is the oldest copy
+        if cluster_id not in first_seen:
+            root = collection.find_one({"_fp": cluster_id}, {"first_seen": 1})
+            first_seen[cluster_id] = root.get("first_seen") if root else None
+        return cluster_id
+
+    clusters = Clusters(lambda node: (first_seen.get(node) or datetime.max, node))
+    stored = set()          # cluster ids already in Mongo
+    local = {}              # band -> fps processed in this run (not in Mongo yet)
+    signatures = {fp: sig for fp, sig, _ in pending}
+
+    for fp, signature, keys in pending:
+        clusters.find(fp)
+        # Stored candidates: one indexed lookup per record (pending ones have no _lsh yet)
+        # Removed tenders are no candidates: as a cluster root they would hide the live copy
+        cursor = collection.find(
+            {"_lsh": {"$in": keys}, "removed": {"$ne": True}}, {"_fp": 1, "_minhash": 1, "cluster_id": 1}
+        ).limit(MAX_CANDIDATES)
+        for other in cursor:
+            stats["candidates"] += 1
+            if other.get("_minhash") and similarity(signature, other["_minhash"]) >= threshold:
+                cluster_id = stored_cluster(other.get("cluster_id") or other["_fp"])
+                stored.add(cluster_id)
+                clusters.union(cluster_id, fp)
+
+        # Records of this run that share a band
+        seen = set()
+        for key in keys:
+            for other_fp in local.get(key, ()):
+                if other_fp in seen:
+                    continue
+                seen.add(other_fp)
+                stats["candidates"] += 1
+                if similarity(signature, signatures[other_fp]) >= threshold:
+                    clusters.union(other_fp, fp)
+            local.setdefault(key, []).append(fp)
+
+    for fp, signature, keys in pending:
+        cluster_id = clusters.find(fp)
+        duplicate = cluster_id != fp
+        stats["duplicates"] += duplicate
+        if duplicate and fp in roots and fp not in stored:
+            # Rewritten into another cluster; its old members matched nothing this run, so they
+            # are not folded along below and would point at a duplicate
+            left.append(fp)
+        writer.put(UNIFIED_COLLECTION, UpdateOne(
+            {"_fp": fp},
+            {"$set": {"_lsh": keys, "_minhash": signature, "cluster_id": cluster_id, "duplicate": duplicate}},
+        ))
+
+    # A new record can bridge two stored clusters: fold the younger one into the older
+    for cluster_id in stored:
+        root = clusters.find(cluster_id)
+        if root != cluster_id:
+            stats["merged"] += 1
+            writer.put(UNIFIED_COLLECTION, UpdateMany(
+                {"cluster_id": cluster_id}, {"$set": {"cluster_id": root, "duplicate": True}}
+            ))
+
+    # Re-rooting reads the clusters back: this run's assignments must be in Mongo first
+    writer.flush(UNIFIED_COLLECTION)
+
+    # A root that left its cluster or was removed since would still hide its live copies
+    for old_root in left:
+        stats["rerooted"] += reroot(collection, writer, old_root)
+    removed_roots = collection.find({"removed": True, "duplicate": False, "cluster_id": {"$ne": None}}, {"_fp": 1})
+    for doc in removed_roots.hint("removed_roots"):
+        stats["rerooted"] += reroot(collection, writer, doc["_fp"])
+    writer.flush(UNIFIED_COLLECTION)
+
+    stats["seconds"] = time.perf_counter() - start
+    return stats
+
+def report(stats):
+    per_record = stats["candidates"] / stats["records"] if stats["records"] else 0
+    print(
+        f"dedup: {stats['records']} new tenders, {stats['duplicates']} duplicates, {stats['merged']} clusters merged, "
+        f"{stats['rerooted']} re-rooted, "
+        f"{per_record:.1f} candidates/record, {stats['empty']} without text in {stats['seconds']:.2f}s"
+    )
+
+def rebuild(collection=None):
+    collection = collection or get_collection(UNIFIED_COLLECTION)
+    collection.update_many({}, {"$unset": {"_lsh": "", "_minhash": "", "cluster_id": "", "duplicate": ""}})
+    return dedup(collection)
+
+def show(collection=None, top=10):
+    collection = collection or get_collection(UNIFIED_COLLECTION)
+    pipeline = [
+        {"$match": {"cluster_id": {"$ne": None}}},
+        {"$group": {"_id": "$cluster_id", "size": {"$sum": 1}, "sources": {"$addToSet": "$source"},
+                    "titles": {"$push": "$title"}}},
+        {"$match": {"size": {"$gt": 1}}},
+        {"$sort": {"size": -1}},
+        {"$limit": top},
+    ]
+    for cluster in collection.aggregate(pipeline):
+        print(f"{cluster['size']:>4} copies in {', '.join(sorted(cluster['sources']))}")
+        for title in cluster["titles"][:3]:
+            print(f"       {(title or '')[:100]}")
+
+# ---------------- Benchmark ----------------
+def bench(n):
+    # Synthetic titles with ~10% near-duplicates (reworded, corrigendum prefix, dropped words)
+    rnd = random.Random(1)
+    vocab = [f"w{i}" for i in range(5000)]
+    titles, truth = [], []
+    for i in range(n):
+        if titles and rnd.random() < 0.1:
+            j = rnd.randrange(len(titles))
+            words = titles[j].split()
+            words = rnd.choice((["corrigendum"] + words, words[:-1], words + ["extended"]))
+            titles.append(" ".join(words))
+            truth.append((j, i))
+        else:
+            titles.append(" ".join(rnd.sample(vocab, rnd.randint(8, 14))))
+
+    start = time.perf_counter()
+    sigs = [minhash(shingles(t)) for t in titles]
+    hashing = time.perf_counter() - start
+
+    start = time.perf_counter()
+    index, found, compared = {}, set(), 0
+    for i, sig in enumerate(sigs):
+        seen = set()
+        for key in bands(sig):
+            for j in index.get(key, ()):
+                if j not in seen:
+                    seen.add(j)
+                    compared += 1
+                    if similarity(sig, sigs[j]) >= THRESHOLD:
+                        found.add((j, i))
+            index.setdefault(key, []).append(i)
+    lsh = time.perf_counter() - start
+
+    # All-pairs on a sample, extrapolated: n(n-1)/2 comparisons
+    sample = sigs[:min(n, 2000)]
+    start = time.perf_counter()
+    for i in range(len(sample)):
+        for j in range(i):
+            similarity(sample[i], sample[j])
+    pairs = len(sample) * (len(sample) - 1) / 2
+    brute = (time.perf_counter() - start) / pairs * n * (n - 1) / 2 if pairs else 0.0
+
+    recall = len(found & set(truth)) / len(truth) if truth else 1.0
+    print(f"{n} titles, {len(truth)} near-duplicates planted")
+    print(f"minhash      {hashing:8.2f}s  ({n / hashing:,.0f} titles/s)")
+    print(f"lsh lookup   {lsh:8.2f}s  ({compared / n:.2f} comparisons/record, recall {recall:.1%})")
+    print(f"all pairs   ~{brute:8.2f}s  ({(n - 1) / 2:,.0f} comparisons/record, extrapolated)")
+
+# ---------------- MAIN ----------------
+def main():
+    parser = argparse.ArgumentParser(description="Cluster near-duplicate tenders in the unified collection")
+    parser.add_argument("--rebuild", action="store_true", help="forget all clusters and start over")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="estimated Jaccard for a match")
+    parser.add_argument("--show", type=int, metavar="N", help="print the N largest clusters")
+    parser.add_argument("--bench", action="store_true", help="LSH vs. all-pairs on synthetic titles")
+    parser.add_argument("--n", type=int, default=100000, help="titles used by --bench")
+    args = parser.parse_args()
+
+    if args.bench:
+        bench(args.n)
+        return 0
+    if args.show:
+        show(top=args.show)
+        return 0
+    report(rebuild() if args.rebuild else dedup(threshold=args.threshold))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
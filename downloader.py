@@ -0,0 +1,286 @@
+#Tender document downloader: fetches the PDFs linked from stored tenders
+#Concurrent with a per-host cap, streamed to disk, resumed with Range requests,
+#stored once per content hash (blobs/ab/<sha256>.pdf) with a URL -> hash index
+#usage-python downloader.py [--only CMRF HAFED] [--workers 8] [--refresh]
+#Sources opt in with DOCUMENT_FIELDS, e.g. ("pdf_link",) or ("documents.pdf_url",)
+import argparse
+import hashlib
+import json
+import mimetypes
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urljoin, urlsplit
+
+from dotenv import load_dotenv
+
+import host_health
+import metrics
+from http_client import DEFAULT_TIMEOUT, get_session
+from mongo_store import get_collection
+
+load_dotenv()
+# ---------------- Download Config ----------------
+DOCS_DIR = os.getenv("DOCS_DIR", "documents")
+DOWNLOAD_WORKERS = int(os.getenv("DOWNLOAD_WORKERS", "8"))
+PER_HOST = int(os.getenv("DOWNLOAD_PER_HOST", "2"))                        # polite to small portals
+MAX_BYTES = int(os.getenv("DOWNLOAD_MAX_BYTES", str(200 * 1024 * 1024)))  # skip anything larger
+CHUNK = 64 * 1024
+
+_host_slots = {}
+_host_lock = threading.Lock()
+_index_lock = threading.Lock()
+
+class DownloadError(Exception):
+    pass
+
+# ---------------- URLs from records ----------------
+def _values(record, path):
+    # Dotted path that also walks lists: "documents.pdf_url" over [{"pdf_url": ...}, ...]
+    values = [record]
+    for part in path.split("."):
+        next_values = []
+        for value in values:
+            if isinstance(value, list):
+                next_values.extend(v.get(part) for v in value if isinstance(v, dict))
+            elif isinstance(value, dict):
+                next_values.append(value.get(part))
+        values = next_values
+    for value in values:
+        if isinstance(value, list):
+            yield from value
+        else:
+            yield value
+
+def record_urls(record, fields, base):
+    urls = []
+    for field in fields:
+        for value in _values(record, field):
+            if isinstance(value, str) and value.strip():
+                url = urljoin(base, value.strip())
+                if url.startswith(("http://", "https://")) and url not in urls:
+                    urls.append(url)
+    return urls
+
+def document_urls(module):
+    fields = getattr(module, "DOCUMENT_FIELDS", ())
+    base = getattr(module, "BASE_URL", None) or module.URL
+    urls = set()
+    projection = {f.split(".")[0]: 1 for f in fields}
+    for record in get_collection(module.MONGO_DB_COLLECTION).find({"removed": {"$ne": True}}, projection):
+        urls.update(record_urls(record, fields, base))
+    return sorted(urls)
+
+# ---------------- Storage ----------------
+def url_key(url):
+    return hashlib.sha1(url.encode("utf-8")).hexdigest()
+
+def index_path():
+    return os.path.join(DOCS_DIR, "index.jsonl")
+
+def load_index():
+    # Append-only: the last line for a URL wins
+    index = {}
+    try:
+        with open(index_path(), encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    index[entry["url"]] = entry
+    except OSError:
+        pass
+    return index
+
+def append_index(entry):
+    with _index_lock:
+        os.makedirs(DOCS_DIR, exist_ok=True)
+        with open(index_path(), "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+
+def blob_path(sha256, ext):
+    return os.path.join(DOCS_DIR, "blobs", sha256[:2], sha256 + ext)
+
+def extension(url, content_type):
+    ext = os.path.splitext(urlsplit(url).path)[1].lower()
+    if ext and len(ext) <= 5:
+        return ext
+    content_type = (content_type or "").split(";")[0].strip()
+    return mimetypes.guess_extension(content_type) or ".bin"
+
+def host_slot(host):
+    with _host_lock:
+        slot = _host_slots.get(host)
+        if slot is None:
+            slot = _host_slots[host] = threading.Semaphore(PER_HOST)
+    return slot
+
+# ---------------- Download ----------------
+def _hash_file(path):
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK), b""):
+            sha.update(chunk)
+    return sha
+
+def download(url):
+    host = urlsplit(url).netloc
+    part = os.path.join(DOCS_DIR, "partial", url_key(url) + ".part")
+    part_meta = part + ".json"
+    os.makedirs(os.path.dirname(part), exist_ok=True)
+
+    # Resume: ask for the rest, but only if it is still the same file (If-Range)
+    headers = {}
+    offset = os.path.getsize(part) if os.path.exists(part) else 0
+    if offset:
+        try:
+            with open(part_meta, encoding="utf-8") as f:
+                validator = json.load(f).get("validator")
+        except (OSError, ValueError):
+            validator = None
+        if validator:
+            headers = {"Range": f"bytes={offset}-", "If-Range": validator}
+        else:
+            offset = 0
+
+    with host_slot(host):
+        timeout = host_health.before_request(host, DEFAULT_TIMEOUT)
+        start = time.perf_counter()
+        try:
+            response = get_session().get(url, headers=headers, timeout=timeout, stream=True)
+            # Recorded before any branch below can raise: the host answered
+            if response.status_code >= 500:
+                host_health.record_failure(host, f"HTTP {response.status_code}")
+            else:
+                host_health.record_success(host, response.elapsed.total_seconds())
+        except Exception as e:
+            host_health.record_failure(host, f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            host_health.release(host)
+
+        with response:
+            if response.status_code == 416:
+                # Partial file no longer matches the remote one: start over next time
+                os.remove(part)
+                raise DownloadError(f"{url}: range not satisfiable, partial file dropped")
+            response.raise_for_status()
+
+            resumed = response.status_code == 206
+            if resumed:
+                sha = _hash_file(part)
+                mode = "ab"
+            else:
+                sha = hashlib.sha256()
+                offset = 0
+                mode = "wb"
+
+            length = response.headers.get("Content-Length")
+            if length and offset + int(length) > MAX_BYTES:
+                if os.path.exists(part):
+                    os.remove(part)
+                raise DownloadError(f"{url}: {offset + int(length)} bytes is over DOWNLOAD_MAX_BYTES")
+
+            validator = response.headers.get("ETag") or response.headers.get("Last-Modified")
+            with open(part_meta, "w", encoding="utf-8") as f:
+                json.dump({"url": url, "validator": validator}, f)
+
+            size = offset
+            with open(part, mode) as f:
+                for chunk in response.iter_content(CHUNK):
+                    f.write(chunk)
+                    sha.update(chunk)
+                    size += len(chunk)
+                    if size > MAX_BYTES:
+                        f.close()
+                        os.remove(part)
+                        raise DownloadError(f"{url}: over DOWNLOAD_MAX_BYTES")
+            content_type = response.headers.get("Content-Type")
+
+    metrics.observe("tender_download_seconds", time.perf_counter() - start, host=host)
+    metrics.inc("tender_download_bytes_total", size - offset, host=host)
+
+    digest = sha.hexdigest()
+    path = blob_path(digest, extension(url, content_type))
+    duplicate = os.path.exists(path)
+    if duplicate:
+        os.remove(part)  # same content already stored for another URL
+    else:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(part, path)
+    if os.path.exists(part_meta):
+        os.remove(part_meta)
+
+    entry = {
+        "url": url,
+        "sha256": digest,
+        "path": os.path.relpath(path, DOCS_DIR),
+        "bytes": size,
+        "content_type": content_type,
+        "fetched_at": time.time(),
+    }
+    append_index(entry)
+    return entry, resumed, duplicate
+
+def download_all(urls, workers=DOWNLOAD_WORKERS, refresh=False):
+    index = {} if refresh else load_index()
+    todo = [u for u in urls if u not in index]
+    stats = {"urls": len(urls), "known": len(urls) - len(todo), "downloaded": 0,
+             "resumed": 0, "duplicates": 0, "failed": 0, "bytes": 0}
+    if not todo:
+        return stats
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="download") as pool:
+        futures = {pool.submit(download, url): url for url in todo}
+        for future in as_completed(futures):
+            url = futures[future]
+            try:
+                entry, resumed, duplicate = future.result()
+            except Exception as e:
+                stats["failed"] += 1
+                print(f"download failed {url}: {e}")
+                continue
+            stats["downloaded"] += 1
+            stats["bytes"] += entry["bytes"]
+            stats["resumed"] += resumed
+            stats["duplicates"] += duplicate
+    return stats
+
+def download_sources(sources, workers=DOWNLOAD_WORKERS, refresh=False):
+    # Every source's URLs go into one pool: per-host slots keep each portal's share small
+    urls = []
+    for name, module, _ in sources:
+        if getattr(module, "DOCUMENT_FIELDS", None):
+            found = document_urls(module)
+            print(f"{name}: {len(found)} document links")
+            urls.extend(found)
+
+    stats = download_all(sorted(set(urls)), workers, refresh)
+    print(
+        f"documents: {stats['urls']} links, {stats['known']} already stored, {stats['downloaded']} downloaded "
+        f"({stats['resumed']} resumed, {stats['duplicates']} duplicate content), {stats['failed']} failed, "
+        f"{stats['bytes'] / 2 ** 20:.1f} MiB"
+    )
+    return stats
+
+# ---------------- MAIN ----------------
+def main():
+    from run_all import discover_sources
+
+    parser = argparse.ArgumentParser(description="Download the documents linked from stored tenders")
+    parser.add_argument("--only", nargs="*", help="module names, e.g. CMRF HAFED")
+    parser.add_argument("--workers", type=int, default=DOWNLOAD_WORKERS)
+    parser.add_argument("--refresh", action="store_true", help="download again even if already indexed")
+    args = parser.parse_args()
+
+    sources = discover_sources()
+    if args.only:
+        wanted = {name.lower() for name in args.only}
+        sources = [s for s in sources if s[0].lower() in wanted]
+
+    stats = download_sources(sources, args.workers, args.refresh)
+    return 0 if not stats["failed"] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
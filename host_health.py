@@ -0,0 +1,248 @@
+#Per-host health registry used by http_client.fetch
+#Rolling latency and error history per host -> adaptive (connect, read) timeouts and a circuit breaker
+#State is kept in a JSON file between runs, so a portal known to be down is skipped in milliseconds
+#usage-python host_health.py            (show every host)
+#      python host_health.py --reset 164.100.229.64
+import argparse
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+import requests
+from dotenv import load_dotenv
+
+import metrics
+
+load_dotenv()
+# ---------------- Health Config ----------------
+STATE_FILE = os.getenv("HOST_HEALTH_FILE", ".host_health.json")
+
+WINDOW = 50                 # latency samples and outcomes kept per host
+MIN_SAMPLES = 5             # below this the caller's timeout is used as is
+READ_FACTOR = 4.0           # read timeout = p95 latency x factor
+CONNECT_FACTOR = 2.0
+MIN_READ = 5.0
+MIN_CONNECT = 3.0
+
+FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURES", "3"))       # consecutive failures that open it
+ERROR_RATE = 0.5                                                 # or this share of the last outcomes
+COOLDOWN = float(os.getenv("CIRCUIT_COOLDOWN", "300"))           # seconds before the first probe
+MAX_COOLDOWN = float(os.getenv("CIRCUIT_MAX_COOLDOWN", "21600"))  # doubles per failed probe, capped
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+class HostUnavailable(requests.ConnectionError):
+    # Raised instead of connecting while a host's circuit is open
+    pass
+
+# ---------------- Host ----------------
+def _percentile(values, q):
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+def _split(timeout):
+    if timeout is None:
+        return None, None
+    if isinstance(timeout, (tuple, list)):
+        return timeout[0], timeout[1]
+    return timeout, timeout
+
+class HostHealth:
+    def __init__(self, host, state=None):
+        state = state or {}
+        self.host = host
+        self.latencies = deque(state.get("latencies", ()), maxlen=WINDOW)
+        self.outcomes = deque(state.get("outcomes", ()), maxlen=WINDOW)
+        self.failures = state.get("failures", 0)
+        self.state = state.get("state", CLOSED)
+        self.opened_at = state.get("opened_at", 0.0)
+        self.cooldown = state.get("cooldown", COOLDOWN)
+        self.last_error = state.get("last_error")
+        self.probing = False
+        if self.state == HALF_OPEN:  # a probe cut short by the last run's exit
+            self.state = OPEN
+
+    def to_state(self):
+        return {
+            "latencies": [round(x, 4) for x in self.latencies],
+            "outcomes": list(self.outcomes),
+            "failures": self.failures,
+            "state": self.state,
+            "opened_at": self.opened_at,
+            "cooldown": self.cooldown,
+            "last_error": self.last_error,
+        }
+
+    # ---- breaker ----
+    def allow(self, now):
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and now - self.opened_at >= self.cooldown and not self.probing:
+            # Cool-down over: let exactly one request through as a probe
+            self.state = HALF_OPEN
+            self.probing = True
+            return True
+        return False
+
+    def success(self, latency):
+        self.latencies.append(latency)
+        self.outcomes.append(1)
+        self.failures = 0
+        if self.state != CLOSED:
+            print(f"{self.host}: probe succeeded, circuit closed")
+        self.state = CLOSED
+        self.cooldown = COOLDOWN
+        self.probing = False
+
+    def failure(self, error, now):
+        self.outcomes.append(0)
+        self.failures += 1
+        self.last_error = error
+
+        if self.state == HALF_OPEN:
+            self.cooldown = min(self.cooldown * 2, MAX_COOLDOWN)
+            self._open(now)
+        elif self.state == CLOSED and self._failing():
+            self.cooldown = COOLDOWN
+            self._open(now)
+        self.probing = False
+
+    def _failing(self):
+        if self.failures >= FAILURE_THRESHOLD:
+            return True
+        recent = list(self.outcomes)[-10:]
+        return len(recent) >= 10 and recent.count(0) / len(recent) >= ERROR_RATE
+
+    def _open(self, now):
+        self.state = OPEN
+        self.opened_at = now
+        print(f"{self.host}: circuit open for {self.cooldown:.0f}s after {self.failures} failures ({self.last_error})")
+
+    # ---- timeouts ----
+    def timeout(self, requested):
+        connect, read = _split(requested)
+        if len(self.latencies) < MIN_SAMPLES:
+            return requested
+        p95 = _percentile(self.latencies, 0.95)
+        adaptive_connect = max(MIN_CONNECT, p95 * CONNECT_FACTOR)
+        adaptive_read = max(MIN_READ, p95 * READ_FACTOR)
+        # The caller's timeout stays the upper bound
+        if connect is not None:
+            adaptive_connect = min(adaptive_connect, connect)
+        if read is not None:
+            adaptive_read = min(adaptive_read, read)
+        return (round(adaptive_connect, 2), round(adaptive_read, 2))
+
+    def summary(self, now):
+        p50 = _percentile(self.latencies, 0.5) if self.latencies else None
+        p95 = _percentile(self.latencies, 0.95) if self.latencies else None
+        errors = self.outcomes.count(0) / len(self.outcomes) if self.outcomes else 0.0
+        retry_in = max(0.0, self.opened_at + self.cooldown - now) if self.state != CLOSED else 0.0
+        return p50, p95, errors, retry_in
+
+# ---------------- Registry ----------------
+_hosts = None
+_lock = threading.Lock()
+
+def _load():
+    global _hosts
+    if _hosts is None:
+        try:
+            with open(STATE_FILE, encoding="utf-8") as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            saved = {}
+        _hosts = {host: HostHealth(host, state) for host, state in saved.items()}
+    return _hosts
+
+def _get(host):
+    hosts = _load()
+    health = hosts.get(host)
+    if health is None:
+        health = hosts[host] = HostHealth(host)
+    return health
+
+def before_request(host, timeout):
+    # Returns the timeout to use, or raises HostUnavailable while the circuit is open
+    with _lock:
+        health = _get(host)
+        if not health.allow(time.time()):
+            metrics.inc("tender_http_rejected_total", host=host)
+            retry_in = health.opened_at + health.cooldown - time.time()
+            raise HostUnavailable(f"{host} circuit open ({health.last_error}), next probe in {max(0, retry_in):.0f}s")
+        return health.timeout(timeout)
+
+def record_success(host, latency):
+    with _lock:
+        _get(host).success(latency)
+
+def record_failure(host, error):
+    with _lock:
+        _get(host).failure(str(error)[:200], time.time())
+
+def release(host):
+    # Called in a finally after every request: a probe that ended without record_success /
+    # record_failure (a caller raising on its own) would otherwise hold the circuit half-open for good
+    with _lock:
+        health = _load().get(host)
+        if health is not None and health.probing:
+            health.probing = False
+            health.state = OPEN  # cool-down already over: the next request probes again
+
+def retry_in(host):
+    # Seconds until the circuit lets a request through (0 when closed); scheduler.py waits this long
+    with _lock:
+        health = _load().get(host)
+        if health is None or health.state == CLOSED:
+            return 0.0
+        return max(0.0, health.opened_at + health.cooldown - time.time())
+
+def reset(host=None):
+    with _lock:
+        hosts = _load()
+        if host is None:
+            hosts.clear()
+        else:
+            hosts.pop(host, None)
+
+def save():
+    with _lock:
+        if _hosts is None:
+            return
+        data = json.dumps({host: h.to_state() for host, h in _hosts.items()}, indent=1)
+    tmp = f"{STATE_FILE}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(data)
+    os.replace(tmp, STATE_FILE)
+
+atexit.register(save)
+
+# ---------------- MAIN ----------------
+def main():
+    parser = argparse.ArgumentParser(description="Show or reset per-host health state")
+    parser.add_argument("--reset", nargs="*", help="hosts to reset (none = all)")
+    args = parser.parse_args()
+
+    if args.reset is not None:
+        for host in args.reset or [None]:
+            reset(host)
+        save()
+        print("reset " + (", ".join(args.reset) if args.reset else "all hosts"))
+        return 0
+
+    now = time.time()
+    print(f"{'host':<36}{'state':<11}{'p50 s':>7}{'p95 s':>7}{'errors':>8}{'retry in':>10}  last error")
+    print("-" * 100)
+    for host, health in sorted(_load().items()):
+        p50, p95, errors, retry_in = health.summary(now)
+        p50 = f"{p50:.2f}" if p50 is not None else "-"
+        p95 = f"{p95:.2f}" if p95 is not None else "-"
+        print(f"{host:<36}{health.state:<11}{p50:>7}{p95:>7}{errors:>8.0%}{retry_in:>9.0f}s  {health.last_error or ''}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
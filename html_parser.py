@@ -0,0 +1,274 @@
+#Pluggable HTML parser backend shared by all tender scrapers
+#backends: html.parser | lxml (BeautifulSoup) | lxml-native | selectolax
+#All backends are wrapped in the same small Node API (select / select_one / text / get / children / link)
+#Scrapers pass their CONTAINERS so only the tender table (not nav/footer/scripts) is parsed
+import os
+import re
+
+from dotenv import load_dotenv
+
+import metrics
+
+load_dotenv()
+# ---------------- Backend Config ----------------
+BACKENDS = ("html.parser", "lxml", "lxml-native", "selectolax")
+
+def _default_backend():
+    try:
+        import lxml  # noqa: F401
+        return "lxml"
+    except ImportError:
+        return "html.parser"
+
+_backend = os.getenv("HTML_PARSER") or _default_backend()
+
+def set_backend(name):
+    global _backend
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown parser backend {name!r}, expected one of {BACKENDS}")
+    _backend = name
+
+def get_backend():
+    return _backend
+
+# ---------------- BeautifulSoup ----------------
+class SoupNode:
+    __slots__ = ("el",)
+
+    def __init__(self, el):
+        self.el = el
+
+    def select(self, css):
+        return [SoupNode(e) for e in self.el.select(css)]
+
+    def select_one(self, css):
+        e = self.el.select_one(css)
+        return SoupNode(e) if e is not None else None
+
+    def text(self, sep="", strip=True):
+        return SoupNode.raw_text(self.el, sep, strip)
+
+    def get(self, attr, default=None):
+        value = self.el.get(attr, default)
+        if isinstance(value, list):  # class / rel come back as lists
+            return " ".join(value)
+        return value
+
+    def children(self, tags):
+        return [SoupNode(e) for e in SoupNode.raw_children(self.el, tags)]
+
+    def link(self):
+        return SoupNode.raw_link(self.el)
+
+    # Raw-element versions, used by compiled column plans (columns.py) to skip the wrappers
+    @staticmethod
+    def raw_text(el, sep="", strip=True):
+        if strip:
+            return el.get_text(sep, strip=True)
+        return el.get_text(sep).strip()
+
+    @staticmethod
+    def raw_children(el, tags):
+        return el.find_all(list(tags), recursive=False)
+
+    @staticmethod
+    def raw_link(el):
+        a = el.find("a", href=True)
+        return a.get("href") if a is not None else None
+
+# ---------------- lxml native ----------------
+_selectors = {}
+
+def _css(css):
+    # Translating CSS to XPath costs more than running it, so each selector is compiled once
+    selector = _selectors.get(css)
+    if selector is None:
+        from lxml.cssselect import CSSSelector
+        selector = _selectors[css] = CSSSelector(css, translator="html")
+    return selector
+
+class LxmlNode:
+    __slots__ = ("el",)
+
+    def __init__(self, el):
+        self.el = el
+
+    def select(self, css):
+        return [LxmlNode(e) for e in _css(css)(self.el)]
+
+    def select_one(self, css):
+        found = _css(css)(self.el)
+        return LxmlNode(found[0]) if found else None
+
+    def text(self, sep="", strip=True):
+        return LxmlNode.raw_text(self.el, sep, strip)
+
+    def get(self, attr, default=None):
+        return self.el.get(attr, default)
+
+    def children(self, tags):
+        return [LxmlNode(e) for e in LxmlNode.raw_children(self.el, tags)]
+
+    def link(self):
+        return LxmlNode.raw_link(self.el)
+
+    @staticmethod
+    def raw_text(el, sep="", strip=True):
+        # itertext() skips comment text but keeps tails, same strings as bs4
+        if strip:
+            return sep.join(filter(None, map(str.strip, el.itertext())))
+        return sep.join(el.itertext()).strip()
+
+    @staticmethod
+    def raw_children(el, tags):
+        return [e for e in el if e.tag in tags]
+
+    @staticmethod
+    def raw_link(el):
+        for a in el.iter("a"):
+            href = a.get("href")
+            if href is not None:
+                return href
+        return None
+
+# ---------------- selectolax ----------------
+def _selectolax_strings(node):
+    for child in node.iter(include_text=True):
+        if child.tag == "-text":
+            yield child.text(deep=False)
+        elif not child.tag.startswith(("-", "_")):  # skip comments / doctype
+            yield from _selectolax_strings(child)
+
+class SelectolaxNode:
+    __slots__ = ("el",)
+
+    def __init__(self, el):
+        self.el = el
+
+    def select(self, css):
+        return [SelectolaxNode(e) for e in self.el.css(css)]
+
+    def select_one(self, css):
+        e = self.el.css_first(css)
+        return SelectolaxNode(e) if e is not None else None
+
+    def text(self, sep="", strip=True):
+        return SelectolaxNode.raw_text(self.el, sep, strip)
+
+    def get(self, attr, default=None):
+        value = self.el.attributes.get(attr, default)
+        return default if value is None else value
+
+    def children(self, tags):
+        return [SelectolaxNode(e) for e in SelectolaxNode.raw_children(self.el, tags)]
+
+    def link(self):
+        return SelectolaxNode.raw_link(self.el)
+
+    @staticmethod
+    def raw_text(el, sep="", strip=True):
+        strings = _selectolax_strings(el)
+        if strip:
+            return sep.join(filter(None, map(str.strip, strings)))
+        return sep.join(strings).strip()
+
+    @staticmethod
+    def raw_children(el, tags):
+        return [e for e in el.iter() if e.tag in tags]
+
+    @staticmethod
+    def raw_link(el):
+        a = el.css_first("a[href]")
+        return a.attributes.get("href") if a is not None else None
+
+# ---------------- Container Pre-filter ----------------
+# Containers are "tag", "tag.class" or "tag#id". Every matching element is cut
+# out of the raw HTML with a tag-balance scan and only those slices are parsed.
+ATTR_RE = re.compile(r"""([\w:-]+)\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))""")
+NON_MARKUP_RE = re.compile(r"<script\b.*?</script\s*>|<style\b.*?</style\s*>|<!--.*?-->", re.I | re.S)
+_container_cache = {}
+
+def _compile_container(container):
+    compiled = _container_cache.get(container)
+    if compiled is None:
+        tag, attr, value = re.match(r"^(\w+)(?:([.#])([\w-]+))?$", container).groups()
+        open_re = re.compile(rf"<{tag}(?=[\s>/])[^>]*>", re.I)
+        balance_re = re.compile(rf"<(/?){tag}(?=[\s>/])[^>]*>", re.I)
+        attr = {".": "class", "#": "id"}.get(attr)
+        compiled = (open_re, balance_re, attr, value)
+        _container_cache[container] = compiled
+    return compiled
+
+def _attr_matches(open_tag, attr, value):
+    if attr is None:
+        return True
+    for name, dq, sq, bare in ATTR_RE.findall(open_tag):
+        if name.lower() == attr:
+            found = dq or sq or bare
+            return value in found.split() if attr == "class" else found == value
+    return False
+
+def _slices(html, container):
+    open_re, balance_re, attr, value = _compile_container(container)
+    pos = 0
+    while True:
+        m = open_re.search(html, pos)
+        if not m:
+            return
+        if not _attr_matches(m.group(0), attr, value):
+            pos = m.end()
+            continue
+
+        depth = 1
+        end = len(html)  # unclosed: keep the rest of the page
+        for t in balance_re.finditer(html, m.end()):
+            depth += -1 if t.group(1) else 1
+            if depth == 0:
+                end = t.end()
+                break
+        yield m.start(), end
+        pos = end
+
+def prefilter(html, containers):
+    # Scripts and comments can hold tag-like strings ("<table>") that would confuse the scan
+    html = NON_MARKUP_RE.sub("", html)
+    spans = sorted(span for c in containers for span in _slices(html, c))
+
+    parts = []
+    last_end = -1
+    for start, end in spans:
+        if start < last_end:  # nested inside a slice we already kept
+            continue
+        parts.append(html[start:end])
+        last_end = end
+
+    if not parts:
+        return None
+    return "<html><body>" + "".join(parts) + "</body></html>"
+
+# ---------------- Parse ----------------
+def parse(html, containers=None, backend=None):
+    with metrics.timer("parse"):
+        return _parse(html, containers, backend or _backend)
+
+def _parse(html, containers, backend):
+
+    if containers:
+        if isinstance(html, bytes):
+            html = html.decode("utf-8", "replace")
+        # Nothing matched: markup changed, fall back to the whole page
+        html = prefilter(html, containers) or html
+
+    if backend == "selectolax":
+        from selectolax.lexbor import LexborHTMLParser
+        return SelectolaxNode(LexborHTMLParser(html).root)
+
+    if backend == "lxml-native":
+        import lxml.html
+        if isinstance(html, str):
+            html = html.encode("utf-8")
+        parser = lxml.html.HTMLParser(encoding="utf-8")
+        return LxmlNode(lxml.html.document_fromstring(html, parser=parser))
+
+    from bs4 import BeautifulSoup
+    return SoupNode(BeautifulSoup(html, backend))
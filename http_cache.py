@@ -0,0 +1,177 @@
+#Persistent conditional-GET cache used by http_client.fetch
+#Stores ETag / Last-Modified validators, a normalized-body fingerprint and the last body for every URL on disk
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+# ---------------- Cache Config ----------------
+CACHE_DIR = os.getenv("HTTP_CACHE_DIR", ".http_cache")
+
+# Servers that send no validators are treated as fresh for this long
+FALLBACK_TTL = int(os.getenv("HTTP_CACHE_FALLBACK_TTL", "900"))
+
+MAX_AGE_RE = re.compile(r"max-age\s*=\s*(\d+)", re.I)
+
+# Parts of a page that change on every request without the tenders changing:
+# scripts/styles/comments, Drupal form tokens and ASP.NET view state
+VOLATILE_RES = [
+    re.compile(rb"<script\b.*?</script\s*>", re.I | re.S),
+    re.compile(rb"<style\b.*?</style\s*>", re.I | re.S),
+    re.compile(rb"<!--.*?-->", re.S),
+    re.compile(
+        rb"<input\b[^>]*name=[\"']?(?:form_build_id|form_token|__VIEWSTATE\w*|__EVENTVALIDATION|"
+        rb"__REQUESTDIGEST|_token|csrf\w*)[^>]*>",
+        re.I,
+    ),
+]
+WHITESPACE_RE = re.compile(rb"\s+")
+
+_pending = {}
+_lock = threading.Lock()
+
+# ---------------- Paths ----------------
+def cache_key(url):
+    return hashlib.sha1(url.encode("utf-8")).hexdigest()
+
+def _path(key, suffix):
+    return os.path.join(CACHE_DIR, key[:2], key + suffix)
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+# ---------------- Fingerprint ----------------
+def fingerprint(body):
+    for pattern in VOLATILE_RES:
+        body = pattern.sub(b"", body)
+    body = WHITESPACE_RE.sub(b" ", body).strip()
+    return hashlib.sha256(body).hexdigest()
+
+# ---------------- Lookup ----------------
+def load(url):
+    key = cache_key(url)
+    try:
+        with open(_path(key, ".json"), encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    meta["has_body"] = os.path.exists(_path(key, ".body"))
+    return meta
+
+def load_body(url):
+    with open(_path(cache_key(url), ".body"), "rb") as f:
+        return f.read()
+
+def load_last(url):
+    # Body and meta of this process's latest fetch of url (pending if not yet committed)
+    key = cache_key(url)
+    with _lock:
+        pending = _pending.get(url) == key
+    for suffix in ((".pending",) if pending else ()) + ("",):
+        try:
+            with open(_path(key, ".json" + suffix), encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(_path(key, ".body" + suffix), "rb") as f:
+                return f.read(), meta
+        except (OSError, ValueError):
+            continue
+    return None, None
+
+def is_fresh(meta, now=None):
+    if not meta.get("has_body"):
+        return False
+    now = now or time.time()
+    max_age = meta.get("max_age")
+    if max_age is None and not (meta.get("etag") or meta.get("last_modified")):
+        max_age = FALLBACK_TTL
+    return max_age is not None and now - meta["fetched_at"] < max_age
+
+def conditional_headers(meta):
+    headers = {}
+    if not meta.get("has_body"):
+        return headers
+    if meta.get("etag"):
+        headers["If-None-Match"] = meta["etag"]
+    if meta.get("last_modified"):
+        headers["If-Modified-Since"] = meta["last_modified"]
+    return headers
+
+# ---------------- Store ----------------
+def _max_age(response):
+    cache_control = response.headers.get("Cache-Control", "")
+    if "no-store" in cache_control or "no-cache" in cache_control:
+        return 0
+    match = MAX_AGE_RE.search(cache_control)
+    return int(match.group(1)) if match else None
+
+def remember(url, response, body_fingerprint):
+    # Written as .pending and only promoted by commit(), so a run that fails
+    # before reaching MongoDB does not mark the page as already seen
+    key = cache_key(url)
+    meta = {
+        "url": url,
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+        "max_age": _max_age(response),
+        "encoding": response.encoding,
+        "fingerprint": body_fingerprint,
+        "fetched_at": time.time(),
+    }
+
+    # no-store: keep only the fingerprint, never the body or its validators
+    if "no-store" in response.headers.get("Cache-Control", ""):
+        meta.update(etag=None, last_modified=None, max_age=0)
+    else:
+        _write_atomic(_path(key, ".body.pending"), response.content)
+    _write_atomic(_path(key, ".json.pending"), json.dumps(meta).encode("utf-8"))
+
+    with _lock:
+        _pending[url] = key
+
+def touch(url, meta):
+    # 304 revalidation: keep the body, restart the freshness clock
+    key = cache_key(url)
+    meta = dict(meta, fetched_at=time.time())
+    meta.pop("has_body", None)
+    stale_body = _path(key, ".body.pending")
+    if os.path.exists(stale_body):
+        os.remove(stale_body)
+    _write_atomic(_path(key, ".json.pending"), json.dumps(meta).encode("utf-8"))
+    with _lock:
+        _pending[url] = key
+
+# ---------------- Page Count ----------------
+def page_count(url):
+    # Pages the listing at url had on the last stored run (None: not known yet)
+    meta = load(url + "#pages")
+    return meta.get("pages") if meta else None
+
+def remember_page_count(url, count):
+    # Pending until commit(), like the pages themselves
+    key = cache_key(url + "#pages")
+    _write_atomic(_path(key, ".json.pending"), json.dumps({"url": url, "pages": count}).encode("utf-8"))
+    with _lock:
+        _pending[url + "#pages"] = key
+
+def commit(url_prefix):
+    with _lock:
+        urls = [u for u in _pending if u.startswith(url_prefix)]
+        keys = [_pending.pop(u) for u in urls]
+
+    for key in keys:
+        body = _path(key, ".body.pending")
+        if os.path.exists(body):
+            os.replace(body, _path(key, ".body"))
+        meta = _path(key, ".json.pending")
+        if os.path.exists(meta):
+            os.replace(meta, _path(key, ".json"))
+    return len(keys)
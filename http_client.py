@@ -0,0 +1,227 @@
+#Shared HTTP transport for all tender scrapers
+#One process-wide session: keep-alive pools per host, legacy SSL, retry and timeout policy
+import os
+import ssl
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.poolmanager import PoolManager
+from urllib3.util.retry import Retry
+
+import host_health
+import http_cache
+import metrics
+
+load_dotenv()
+# ---------------- Transport Config ----------------
+POOL_HOSTS = int(os.getenv("HTTP_POOL_HOSTS", "32"))      # per-host pools kept alive
+POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "8"))   # keep-alive connections per host
+
+DEFAULT_TIMEOUT = (10, 30)  # (connect, read); host_health shortens it for hosts it knows
+
+# Few, quick retries: hosts that keep failing are handled by the host_health circuit breaker
+RETRIES = int(os.getenv("HTTP_RETRIES", "2"))
+BACKOFF = float(os.getenv("HTTP_BACKOFF", "0.5"))
+
+# FORCE_REFRESH=1 ignores the cache and fingerprints and always does a full refresh
+_force = os.getenv("FORCE_REFRESH", "0") == "1"
+
+# REPLAY_SERVER=http://127.0.0.1:8800 sends every request to the offline replay
+# server (bench_replay.py) instead of the live host; the original URL goes in a header
+_replay_server = os.getenv("REPLAY_SERVER") or None
+REPLAY_HEADER = "X-Replay-Url"
+
+# Called as recorder(url, response) for every page fetched from the network
+_recorder = None
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0",
+    "Accept-Language": "en-US,en;q=0.9",
+}
+
+# ---------------- Legacy SSL Adapter ----------------
+class LegacySSLAdapter(HTTPAdapter):
+    def __init__(self, timeout=DEFAULT_TIMEOUT, **kwargs):
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        ctx = ssl.create_default_context()
+        ctx.options |= 0x4  # OP_LEGACY_SERVER_CONNECT
+        self.poolmanager = PoolManager(
+            num_pools=connections,
+            maxsize=maxsize,
+            block=block,
+            ssl_context=ctx,
+            **pool_kwargs
+        )
+
+    def send(self, request, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        if _replay_server:
+            # Rewritten here so URLs, cache keys and records all keep the live URL
+            request.headers[REPLAY_HEADER] = request.url
+            request.url = _replay_server.rstrip("/") + "/replay"
+        return super().send(request, **kwargs)
+
+# ---------------- Session with Retry ----------------
+_session = None
+_session_lock = threading.Lock()
+
+def get_retry():
+    return Retry(
+        total=RETRIES,
+        connect=1,  # a host that refuses or times out once is unlikely to answer a second later
+        backoff_factor=BACKOFF,
+        status_forcelist=[500, 502, 503, 504],
+        allowed_methods=["GET", "HEAD"],
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+
+def build_session():
+    session = requests.Session()
+
+    adapter = LegacySSLAdapter(
+        pool_connections=POOL_HOSTS,
+        pool_maxsize=POOL_MAXSIZE,
+        max_retries=get_retry(),
+    )
+
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    session.headers.update(DEFAULT_HEADERS)
+    return session
+
+def get_session():
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = build_session()
+    return _session
+
+def close_session():
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+# ---------------- Fetch ----------------
+def set_force(force):
+    global _force
+    _force = bool(force)
+
+def set_replay_server(url):
+    global _replay_server
+    _replay_server = url or None
+
+def set_recorder(recorder):
+    global _recorder
+    _recorder = recorder
+
+class NotModified(Exception):
+    # Raised when a source's page is unchanged since the last stored run
+    pass
+
+def cached_response(url, meta):
+    response = requests.Response()
+    response._content = http_cache.load_body(url)
+    response.status_code = 200
+    response.url = url
+    response.encoding = meta.get("encoding")
+    response.fingerprint = meta.get("fingerprint")
+    response.not_modified = True
+    return response
+
+def record_response(host, response, elapsed):
+    metrics.stage("fetch", elapsed)
+    metrics.observe("tender_http_request_seconds", elapsed, host=host)
+    metrics.inc("tender_http_responses_total", host=host, status=str(response.status_code))
+    metrics.inc("tender_http_bytes_total", len(response.content), source=metrics.current_source(), host=host)
+    retries = getattr(response.raw, "retries", None)
+    if retries is not None and retries.history:
+        metrics.inc("tender_http_retries_total", len(retries.history), host=host)
+
+def fetch(url, timeout=None, headers=None, cache=True):
+    meta = http_cache.load(url) if cache and not _force else None
+    if meta and http_cache.is_fresh(meta):
+        return cached_response(url, meta)
+
+    request_headers = dict(headers or {})
+    if meta:
+        request_headers.update(http_cache.conditional_headers(meta))
+
+    host = urlsplit(url).netloc
+    timeout = host_health.before_request(host, timeout or DEFAULT_TIMEOUT)
+    start = time.perf_counter()
+    try:
+        response = get_session().get(url, timeout=timeout, headers=request_headers)
+        elapsed = time.perf_counter() - start
+        record_response(host, response, elapsed)
+
+        if response.status_code >= 500:
+            host_health.record_failure(host, f"HTTP {response.status_code}")
+        else:
+            # Time to response headers: what the read timeout actually guards
+            host_health.record_success(host, response.elapsed.total_seconds())
+    except requests.RequestException as e:
+        metrics.inc("tender_http_errors_total", host=host)
+        host_health.record_failure(host, f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        host_health.release(host)  # a probe that ended in any other exception
+
+    if meta and response.status_code == 304:
+        http_cache.touch(url, meta)
+        return cached_response(url, meta)
+
+    response.raise_for_status()
+
+    # Charset sniffing is the costly part of decoding; done once here so .text is a plain decode
+    with metrics.timer("decode"):
+        if response.encoding is None:
+            response.encoding = response.apparent_encoding
+    if _recorder:
+        _recorder(url, response)
+
+    # Most of these hosts send no validators, so also compare the normalized body
+    response.fingerprint = http_cache.fingerprint(response.content)
+    response.not_modified = bool(meta) and meta.get("fingerprint") == response.fingerprint
+    if cache:
+        http_cache.remember(url, response, response.fingerprint)
+    return response
+
+def fetch_if_modified(url, timeout=None, headers=None):
+    response = fetch(url, timeout=timeout, headers=headers)
+    if response.not_modified:
+        raise NotModified(url)
+    return response
+
+def cached_text(url, timeout=None, headers=None):
+    # Re-read a page fetched earlier in this run without going back to the host
+    body, meta = http_cache.load_last(url)
+    if body is None:
+        return fetch(url, timeout=timeout, headers=headers).text
+    response = requests.Response()
+    response._content = body
+    response.encoding = meta.get("encoding")
+    return response.text
+
+def pages_changed(url, count):
+    # A listing whose pages all came back unchanged can still have lost a trailing page: the
+    # tenders on it were withdrawn, so a page count unlike the last stored run's is a change
+    previous = http_cache.page_count(url)
+    http_cache.remember_page_count(url, count)
+    return previous is not None and previous != count
+
+def commit(url_prefix):
+    # Call once the source has been stored; marks its pages as seen
+    return http_cache.commit(url_prefix)
@@ -0,0 +1,208 @@
+#Per-stage metrics for the tender scrapers: counters and latency histograms
+#Stages (fetch / decode / parse / extract / store) are labelled with the source being run,
+#which run_all sets per scraper through a context variable
+#Export: Prometheus text format (node_exporter textfile collector) or JSON
+import contextvars
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# ---------------- Metrics Config ----------------
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+HELP = {
+    "tender_stage_seconds": "Time spent per scraper stage",
+    "tender_http_request_seconds": "Network time per HTTP request",
+    "tender_http_bytes_total": "Response body bytes downloaded",
+    "tender_http_responses_total": "HTTP responses by status",
+    "tender_http_retries_total": "Retries done by the urllib3 Retry policy",
+    "tender_http_errors_total": "Requests that failed after retries",
+    "tender_http_rejected_total": "Requests skipped because the host's circuit is open",
+    "tender_rows_parsed_total": "Table rows turned into records",
+    "tender_rows_skipped_total": "Table rows skipped as too short or empty",
+    "tender_records_total": "Stored records by upsert result",
+    "tender_mongo_write_seconds": "Latency of one MongoDB bulk write",
+    "tender_mongo_ops_total": "Operations sent to MongoDB",
+    "tender_source_runs_total": "Scraper runs by final status",
+    "tender_download_seconds": "Time to download one document",
+    "tender_download_bytes_total": "Document bytes downloaded",
+    "tender_schedule_interval_seconds": "Current poll interval chosen by scheduler.py",
+    "tender_schedule_next_run_timestamp": "Unix time of the next scheduled poll",
+    "tender_schedule_changes_per_day": "Estimated change rate of the source",
+}
+
+_source = contextvars.ContextVar("metrics_source", default="unknown")
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+_gauges = {}
+
+# ---------------- Labels ----------------
+def current_source():
+    return _source.get()
+
+@contextmanager
+def source(name):
+    token = _source.set(name)
+    try:
+        yield
+    finally:
+        _source.reset(token)
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+# ---------------- Record ----------------
+def inc(name, value=1, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+def observe(name, seconds, **labels):
+    key = _key(name, labels)
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = {"buckets": [0] * len(BUCKETS), "sum": 0.0, "count": 0}
+        i = bisect_left(BUCKETS, seconds)
+        if i < len(BUCKETS):
+            hist["buckets"][i] += 1
+        hist["sum"] += seconds
+        hist["count"] += 1
+
+def set_gauge(name, value, **labels):
+    with _lock:
+        _gauges[_key(name, labels)] = value
+
+def stage(name, seconds):
+    observe("tender_stage_seconds", seconds, source=_source.get(), stage=name)
+
+@contextmanager
+def timer(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage(name, time.perf_counter() - start)
+
+def count_rows(parsed, skipped=0):
+    src = _source.get()
+    if parsed:
+        inc("tender_rows_parsed_total", parsed, source=src)
+    if skipped:
+        inc("tender_rows_skipped_total", skipped, source=src)
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+        _gauges.clear()
+
+# ---------------- Export ----------------
+def _snapshot():
+    with _lock:
+        counters = dict(_counters)
+        histograms = {k: {"buckets": list(v["buckets"]), "sum": v["sum"], "count": v["count"]}
+                      for k, v in _histograms.items()}
+        gauges = dict(_gauges)
+    return counters, histograms, gauges
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _label_text(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+def _format(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def to_prometheus():
+    counters, histograms, gauges = _snapshot()
+    lines = []
+
+    for name in sorted({n for n, _ in counters}):
+        lines.append(f"# HELP {name} {HELP.get(name, name)}")
+        lines.append(f"# TYPE {name} counter")
+        for (n, labels), value in sorted(counters.items()):
+            if n == name:
+                lines.append(f"{name}{_label_text(labels)} {_format(value)}")
+
+    for name in sorted({n for n, _ in gauges}):
+        lines.append(f"# HELP {name} {HELP.get(name, name)}")
+        lines.append(f"# TYPE {name} gauge")
+        for (n, labels), value in sorted(gauges.items()):
+            if n == name:
+                lines.append(f"{name}{_label_text(labels)} {_format(value)}")
+
+    for name in sorted({n for n, _ in histograms}):
+        lines.append(f"# HELP {name} {HELP.get(name, name)}")
+        lines.append(f"# TYPE {name} histogram")
+        for (n, labels), hist in sorted(histograms.items()):
+            if n != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(BUCKETS, hist["buckets"]):
+                cumulative += count
+                lines.append(f"{name}_bucket{_label_text(labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{name}_bucket{_label_text(labels, [('le', '+Inf')])} {hist['count']}")
+            lines.append(f"{name}_sum{_label_text(labels)} {_format(hist['sum'])}")
+            lines.append(f"{name}_count{_label_text(labels)} {hist['count']}")
+
+    return "\n".join(lines) + "\n"
+
+def _quantile(hist, q):
+    # Upper bound of the bucket holding the q-th observation
+    rank = q * hist["count"]
+    cumulative = 0
+    for bound, count in zip(BUCKETS, hist["buckets"]):
+        cumulative += count
+        if cumulative >= rank:
+            return bound
+    return None
+
+def to_json():
+    counters, histograms, gauges = _snapshot()
+    return {
+        "generated_at": time.time(),
+        "counters": [
+            {"name": name, "labels": dict(labels), "value": value}
+            for (name, labels), value in sorted(counters.items())
+        ],
+        "gauges": [
+            {"name": name, "labels": dict(labels), "value": value}
+            for (name, labels), value in sorted(gauges.items())
+        ],
+        "histograms": [
+            {
+                "name": name,
+                "labels": dict(labels),
+                "count": hist["count"],
+                "sum": round(hist["sum"], 6),
+                "avg": round(hist["sum"] / hist["count"], 6) if hist["count"] else 0.0,
+                "p50_le": _quantile(hist, 0.5),
+                "p95_le": _quantile(hist, 0.95),
+                "buckets": dict(zip(map(str, BUCKETS), hist["buckets"])),
+            }
+            for (name, labels), hist in sorted(histograms.items())
+        ],
+    }
+
+def write(path):
+    # .json -> JSON, anything else -> Prometheus text; written atomically for the textfile collector
+    if path.endswith(".json"):
+        data = json.dumps(to_json(), indent=2)
+    else:
+        data = to_prometheus()
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(data)
+    os.replace(tmp, path)
+    return path
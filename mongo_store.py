@@ -0,0 +1,393 @@
+#Incremental MongoDB store shared by all tender scrapers
+#Upserts by a stable per-tender key and only writes tenders that changed
+#One pooled MongoClient per process; writes go through a batched background writer
+import atexit
+import hashlib
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+import change_feed
+import dates
+import metrics
+
+load_dotenv()
+# ---------------- MongoDB Config ----------------
+MONGO_DB_URI = os.getenv("MONGO_DB_URI")
+MONGO_DB = os.getenv("MONGO_DB")
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "20"))
+
+# ---------------- Writer Config ----------------
+BATCH_SIZE = int(os.getenv("MONGO_BATCH_SIZE", "500"))            # ops per bulk_write
+FLUSH_INTERVAL = float(os.getenv("MONGO_FLUSH_INTERVAL", "2.0"))   # seconds
+QUEUE_SIZE = int(os.getenv("MONGO_QUEUE_SIZE", "10000"))           # producers block when full
+
+# One canonical collection for all sources (see unified.py)
+UNIFIED_COLLECTION = os.getenv("MONGO_UNIFIED_COLLECTION", "tenders")
+
+# Fields that change on every run without the tender changing
+VOLATILE_FIELDS = ("scraped_at",)
+
+# ---------------- Shared Client ----------------
+_client = None
+_client_lock = threading.Lock()
+_collections = {}  # name -> Collection, only once its _fp index exists
+_collections_lock = threading.Lock()
+
+def get_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                # pymongo is imported on first use: --no-store runs and read-only tools never load it
+                from pymongo import MongoClient
+
+                _client = MongoClient(MONGO_DB_URI, maxPoolSize=MONGO_MAX_POOL_SIZE)
+    return _client
+
+def get_collection(collection_name):
+    # Hot path is one dict lookup: create_index runs once per collection per process
+    collection = _collections.get(collection_name)
+    if collection is None:
+        with _collections_lock:
+            collection = _collections.get(collection_name)
+            if collection is None:
+                collection = get_client()[MONGO_DB][collection_name]
+                _ensure_fp_index(collection)
+                _collections[collection_name] = collection
+    return collection
+
+def _ensure_fp_index(collection):
+    from pymongo.errors import OperationFailure
+
+    if "_fp_1" in collection.index_information():
+        return
+    # First store since the switch to keyed upserts: documents written by the old
+    # delete_many/insert_many path have no key, so they go once, before the index is built.
+    # Sparse: a legacy writer still running elsewhere cannot fail the build on null keys
+    collection.delete_many({"_fp": {"$exists": False}})
+    try:
+        collection.create_index("_fp", unique=True, sparse=True)
+    except OperationFailure as e:
+        if e.code not in (85, 86):  # a full unique _fp index built earlier: serves the same lookups
+            raise
+
+# ---------------- Batched Writer ----------------
+_FLUSH = object()
+
+class BatchWriter:
+    def __init__(self, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL, queue_size=QUEUE_SIZE):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.pending = {}
+        self.errors = {}
+        self.latencies = deque(maxlen=1000)
+        self.batch_sizes = deque(maxlen=1000)
+        self.totals = {"batches": 0, "ops": 0, "errors": 0}
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self._run, name="mongo-writer", daemon=True)
+        self.thread.start()
+
+    def put(self, collection_name, op, owner=None):
+        # owner: who gets this op's write error on flush (default the collection). Sources writing
+        # to the shared unified collection pass their own name, so one source never gets another's
+        self.queue.put((collection_name, op, owner or collection_name))
+
+    def flush(self, owner=None):
+        # Blocks until everything queued so far is written, then reports the owner's errors
+        done = threading.Event()
+        self.queue.put((_FLUSH, done, None))
+        done.wait()
+
+        with self.lock:
+            if owner is None:
+                errors = [e for errs in self.errors.values() for e in errs]
+                self.errors.clear()
+            else:
+                errors = self.errors.pop(owner, [])
+        if errors:
+            raise errors[0]
+
+    def close(self):
+        self.queue.put((_FLUSH, None, None))
+        self.thread.join()
+
+    def _run(self):
+        last_flush = time.monotonic()
+        while True:
+            wait = max(0.0, self.flush_interval - (time.monotonic() - last_flush))
+            try:
+                name, op, owner = self.queue.get(timeout=wait)
+            except queue.Empty:
+                name, op, owner = None, None, None
+
+            if name is _FLUSH:
+                self._flush_all()
+                last_flush = time.monotonic()
+                if op is None:
+                    return
+                op.set()
+                continue
+
+            if name is not None:
+                batch = self.pending.setdefault(name, [])
+                batch.append((op, owner))
+                if len(batch) >= self.batch_size:
+                    self._flush(name)
+
+            if time.monotonic() - last_flush >= self.flush_interval:
+                self._flush_all()
+                last_flush = time.monotonic()
+
+    def _flush_all(self):
+        for name in list(self.pending):
+            self._flush(name)
+
+    def _flush(self, name):
+        entries = self.pending.pop(name, [])
+        if not entries:
+            return
+
+        ops = [op for op, _ in entries]
+        start = time.perf_counter()
+        try:
+            get_collection(name).bulk_write(ops, ordered=False)
+        except Exception as e:
+            from pymongo.errors import BulkWriteError
+
+            print(f"{name}: bulk write of {len(ops)} ops failed: {e}")
+            if isinstance(e, BulkWriteError):
+                # Unordered: only the failed ops' owners get the error, the rest were written
+                owners = {entries[err["index"]][1] for err in e.details.get("writeErrors", ())}
+                owners = owners or {owner for _, owner in entries}
+            else:
+                owners = {owner for _, owner in entries}
+            with self.lock:
+                for owner in owners:
+                    self.errors.setdefault(owner, []).append(e)
+                self.totals["errors"] += 1
+        elapsed = time.perf_counter() - start
+        metrics.observe("tender_mongo_write_seconds", elapsed, collection=name)
+        metrics.inc("tender_mongo_ops_total", len(ops), collection=name)
+
+        with self.lock:
+            self.latencies.append(elapsed)
+            self.batch_sizes.append(len(ops))
+            self.totals["batches"] += 1
+            self.totals["ops"] += len(ops)
+
+    def stats(self):
+        with self.lock:
+            latencies = sorted(self.latencies)
+            sizes = list(self.batch_sizes)
+            totals = dict(self.totals)
+
+        if latencies:
+            totals["flush_avg_ms"] = round(1000 * sum(latencies) / len(latencies), 2)
+            totals["flush_p95_ms"] = round(1000 * latencies[int(0.95 * (len(latencies) - 1))], 2)
+            totals["flush_max_ms"] = round(1000 * latencies[-1], 2)
+        if sizes:
+            totals["batch_avg"] = round(sum(sizes) / len(sizes), 1)
+            totals["batch_max"] = max(sizes)
+        totals["queued"] = self.queue.qsize()
+        return totals
+
+_writer = None
+_writer_lock = threading.Lock()
+
+def get_writer():
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = BatchWriter()
+    return _writer
+
+def writer_stats():
+    return _writer.stats() if _writer else {}
+
+def close():
+    global _writer, _client
+    with _writer_lock:
+        if _writer is not None:
+            _writer.close()
+            _writer = None
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+atexit.register(close)
+
+# ---------------- Fingerprints ----------------
+def _get_path(record, path):
+    value = record
+    for part in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+def content_hash(record):
+    payload = {k: v for k, v in record.items() if k not in VOLATILE_FIELDS and not k.startswith("_")}
+    raw = json.dumps(payload, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+def tender_key(record, key_fields):
+    parts = [str(_get_path(record, f) or "").strip() for f in key_fields]
+    if not any(parts):
+        # No usable key on this row: fall back to its content
+        return "c:" + content_hash(record)
+    raw = "\x1f".join(parts)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+# ---------------- Upsert ----------------
+def iter_ops(records, key_fields, existing, clock, stats, date_fields=(), deadline_field=None, source=None, unified=None,
+             feed=None, complete=None):
+    # Lazily turns a stream of records into (collection, op) pairs; seen keys are kept for the sweep
+    # unified: the source's unified.Mapping, whose canonical document goes to UNIFIED_COLLECTION too
+    # feed: a change_feed.FeedBatch receiving created / updated / removed events
+    # complete: asked once the records are exhausted; False = only part of the listing was read
+    # clock: stamps each op as it is made, not once per run: search_index.sync reads updated_at
+    # with a 10-minute overlap, which a run-start stamp falls behind on a long store
+    from pymongo import UpdateMany, UpdateOne
+
+    seen = set()
+
+    for record in records:
+        stats["records"] += 1
+        fp = tender_key(record, key_fields)
+        # The same key twice on one page (e.g. repeated rows) keeps both rows
+        n = 1
+        base = fp
+        while fp in seen:
+            n += 1
+            fp = f"{base}#{n}"
+        seen.add(fp)
+
+        h = content_hash(record)
+        old = existing.get(fp)
+        if old and old[0] == h and not old[1]:
+            stats["unchanged"] += 1
+            continue
+
+        stats["changed" if old else "new"] += 1
+        now = clock()
+        if feed is not None:
+            if old:
+                # Read before the update is queued: the diff needs the stored version
+                previous = get_collection(source).find_one({"_fp": fp}, {"_id": 0})
+                feed.updated(fp, previous, record, now, VOLATILE_FIELDS)
+            else:
+                feed.created(fp, record, now)
+        doc = dict(record, _fp=fp, _hash=h, removed=False, updated_at=now)
+        if date_fields:
+            # Derived after hashing: a new date parser alone does not make a tender "changed"
+            dates.normalize(doc, source, date_fields, deadline_field)
+        yield source, UpdateOne(
+            {"_fp": fp},
+            {"$set": doc, "$setOnInsert": {"first_seen": now}, "$unset": {"removed_at": ""}},
+            upsert=True,
+        )
+        if unified:
+            yield UNIFIED_COLLECTION, unified.upsert_op(doc, fp, now)
+
+    # An empty listing is more likely a broken page than every tender withdrawn;
+    # a listing read only in part says nothing about the tenders it did not reach
+    if not seen or (complete is not None and not complete()):
+        return
+
+    gone = [fp for fp, (_, removed) in existing.items() if not removed and fp not in seen]
+    if gone:
+        stats["removed"] = len(gone)
+        now = clock()
+        if feed is not None:
+            feed.removed(gone, now)
+        yield source, UpdateMany(
+            {"_fp": {"$in": gone}},
+            {"$set": {"removed": True, "removed_at": now}},
+        )
+        if unified:
+            yield UNIFIED_COLLECTION, unified.remove_op(gone, now)
+
+def upsert_tenders(collection_name, records, key_fields, date_fields=(), deadline_field=None, unified=None,
+                   complete=None):
+    # records may be any iterable (scrapers yield them page by page); ops are
+    # queued to the batched writer as they are produced, so memory stays flat
+    # "store" time counts only our own waits (key load, full queue, final flush),
+    # not the scraper producing the records in between
+    stats = {"records": 0, "new": 0, "changed": 0, "unchanged": 0, "removed": 0}
+
+    # First record before any Mongo work: an unchanged source raises NotModified right here, so it
+    # still costs no index check or key scan; an empty listing writes nothing either way
+    records = iter(records)
+    first = next(records, None)
+    if first is None:
+        print(f"{collection_name}: no data found to insert")
+        return stats
+    records = itertools.chain((first,), records)
+
+    start = time.perf_counter()
+    collection = get_collection(collection_name)
+
+    existing = {
+        d["_fp"]: (d.get("_hash"), d.get("removed", False))
+        for d in collection.find({}, {"_fp": 1, "_hash": 1, "removed": 1, "_id": 0})
+    }
+    waited = time.perf_counter() - start
+
+    writer = get_writer()
+    feed = change_feed.get_feed()
+    batch = feed.batch(collection_name) if feed else None
+    ops = iter_ops(records, key_fields, existing, datetime.utcnow, stats,
+                   date_fields, deadline_field, collection_name, unified, batch, complete)
+
+    def flush():
+        # Drains every queued op, the unified ones too; raises only this source's write errors
+        writer.flush(collection_name)
+        if batch is not None:
+            batch.flush()  # after the writes: events never run ahead of the data
+
+    try:
+        for name, op in ops:
+            start = time.perf_counter()
+            writer.put(name, op, collection_name)
+            if batch is not None and batch.full():
+                flush()
+            waited += time.perf_counter() - start
+    except BaseException:
+        # The records stream raised (a page failed): the ops queued so far land anyway, so their
+        # events are written with them instead of being lost. The run reports the scraper's error;
+        # a write error on this flush is only printed
+        start = time.perf_counter()
+        try:
+            flush()
+        except Exception as e:
+            print(f"{collection_name}: write failed after the scrape failed: {type(e).__name__}: {e}")
+        metrics.stage("store", waited + time.perf_counter() - start)
+        raise
+
+    start = time.perf_counter()
+    try:
+        flush()
+    finally:
+        metrics.stage("store", waited + time.perf_counter() - start)
+
+    source = metrics.current_source()
+    for result in ("new", "changed", "unchanged", "removed"):
+        if stats[result]:
+            metrics.inc("tender_records_total", stats[result], source=source, result=result)
+
+    print(
+        f"{collection_name}: {stats['records']} tenders, {stats['new']} new, {stats['changed']} changed, "
+        f"{stats['removed']} removed, {stats['unchanged']} unchanged"
+    )
+    return stats
@@ -0,0 +1,299 @@
+#Generic scraper for NIC / S3WaaS district portals (https://<district>.<state>.nic.in/notice_category/tenders/)
+#Every district runs the same template, so a district is one line of nic_districts.txt instead of a copied scraper
+#run_all / scheduler / worker / downloader see each district as a source of its own (run_all.discover_sources)
+#usage-python nic_district.py sweep [--only arwal.bih.nic.in CMRF] [--workers 32] [--deadline 900] [--no-store] [--force]
+#      python nic_district.py list
+#      python nic_district.py check gaya.bih.nic.in    (pages and rows of a host not in the list yet, nothing stored)
+import argparse
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import closing
+from urllib.parse import urlsplit
+
+from dotenv import load_dotenv
+
+from columns import Column, Table
+from html_parser import parse
+from http_client import NotModified, cached_text, commit, fetch, pages_changed
+from mongo_store import upsert_tenders
+from pagination import fetch_pages, last_page_from_links
+from unified import Mapping
+
+load_dotenv()
+# ---------------- District Config ----------------
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DISTRICTS_FILE = os.getenv("NIC_DISTRICTS_FILE", os.path.join(BASE_DIR, "nic_districts.txt"))
+LISTING_PATH = "/notice_category/tenders/"
+
+SWEEP_WORKERS = int(os.getenv("NIC_WORKERS", "32"))          # districts crawled at once by 'sweep'
+SWEEP_DEADLINE = float(os.getenv("NIC_SWEEP_DEADLINE", "900"))  # seconds; no district starts after it
+HOST_RATE = float(os.getenv("NIC_HOST_RATE", "1.0"))        # requests per second per host
+PAGE_CONCURRENCY = int(os.getenv("NIC_PAGE_CONCURRENCY", "2"))  # pages of one district in flight
+MAX_PAGES = int(os.getenv("NIC_MAX_PAGES", "50"))           # a runaway pager cannot stall the sweep
+TIMEOUT = (10, 30)
+
+# ---------------- MongoDB Config ----------------
+KEY_FIELDS = ("pdf_link", "title")  # stable per-tender key for upserts
+DOCUMENT_FIELDS = ("pdf_link",)  # document links fetched by downloader.py
+DATE_FIELDS = ("start_date", "end_date")  # parsed into <field>_dt by dates.py
+DEADLINE_FIELD = "end_date"  # copied to deadline_dt
+
+# Tender table, plus the pager links (a.page-numbers sit outside the table)
+CONTAINERS = ("table", "a.page-numbers")  # only these parts of the page are parsed
+
+# ---------------- Columns ----------------
+TABLE = Table([
+    Column("title", 0),
+    Column("description", 1),
+    Column("start_date", 2),
+    Column("end_date", 3),
+    Column("pdf_link", 4, kind="href"),
+])
+
+def extract_tenders(doc):
+    table = doc.select_one("tbody")
+    if not table:
+        print("Table not found")
+        return
+
+    yield from TABLE.extract(table.select("tr"))
+
+# ---------------- Host Rate Limit ----------------
+class HostLimiter:
+    # Spaces request starts on one host 1/rate apart, however many threads share it:
+    # each caller reserves the next free slot under the lock and sleeps outside it
+    def __init__(self, rate=HOST_RATE):
+        self.gap = 1.0 / rate if rate > 0 else 0.0
+        self.next_slot = {}
+        self.lock = threading.Lock()
+
+    def wait(self, host):
+        if not self.gap:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(host, now))
+            self.next_slot[host] = slot + self.gap
+        if slot > now:
+            time.sleep(slot - now)
+
+_limiter = HostLimiter()
+
+def limited_fetch(url, timeout=None, headers=None):
+    _limiter.wait(urlsplit(url).netloc)
+    return fetch(url, timeout=timeout, headers=headers)
+
+# ---------------- District ----------------
+def default_collection(host):
+    # gaya.bih.nic.in -> nic_gaya_bih_tender_data
+    label = re.sub(r"\.(nic|gov)\.in$", "", host)
+    return "nic_" + re.sub(r"\W+", "_", label).lower() + "_tender_data"
+
+class District:
+    # Module-like: carries the attributes run_all / downloader / dates / unified / bench_replay
+    # read from a scraper module, so one template serves any number of district hosts
+    KEY_FIELDS = KEY_FIELDS
+    DOCUMENT_FIELDS = DOCUMENT_FIELDS
+    DATE_FIELDS = DATE_FIELDS
+    DEADLINE_FIELD = DEADLINE_FIELD
+    CONTAINERS = CONTAINERS
+
+    def __init__(self, host, name=None, collection=None):
+        self.host = host
+        self.__name__ = name or host
+        self.URL = f"https://{host}{LISTING_PATH}"
+        self.MONGO_DB_COLLECTION = collection or default_collection(host)
+        self.capped = False  # the last iter_pages stopped at MAX_PAGES, short of the last page
+        # Canonical fields for the shared tenders collection (unified.py)
+        self.UNIFIED = Mapping(self.__name__, title="title", description="description", published="start_date",
+                               documents=DOCUMENT_FIELDS, base=self.URL)
+
+    def __repr__(self):
+        return f"District({self.host!r}, {self.__name__!r}, {self.MONGO_DB_COLLECTION!r})"
+
+    def page_url(self, page):
+        return self.URL if page == 1 else f"{self.URL}page/{page}/"
+
+    def iter_pages(self):
+        # Page 1 alone: its pager gives the last page. The rest are fetched a few at a time
+        # (rate-limited per host) and arrive in order
+        url = self.page_url(1)
+        res = limited_fetch(url, timeout=TIMEOUT)
+        doc = parse(res.text, CONTAINERS)
+        yield 1, url, res, doc
+
+        last_page = last_page_from_links(doc) or 1
+        self.capped = last_page > MAX_PAGES
+        if self.capped:
+            print(f"{self.host}: pager reports {last_page} pages, reading the first {MAX_PAGES}; "
+                  f"nothing is marked removed this run")
+            last_page = MAX_PAGES
+        if last_page == 1:
+            return
+        with closing(fetch_pages(self.page_url, 2, last_page, timeout=TIMEOUT,
+                                 concurrency=PAGE_CONCURRENCY, fetcher=limited_fetch)) as pages:
+            for page, url, res in pages:
+                if isinstance(res, Exception):
+                    # Stored pages minus a missing one would look like removed tenders: fail the run
+                    raise res
+                yield page, url, res, parse(res.text, CONTAINERS)
+
+    def scrape_tenders(self):
+        changed = False
+        deferred = []  # unchanged pages, only extracted if a later page turns out to have changed
+        count = 0
+
+        with closing(self.iter_pages()) as pages:
+            for page, url, res, doc in pages:
+                count += 1
+                if res.not_modified and not changed:
+                    deferred.append(url)
+                    continue
+                if not changed:
+                    changed = True
+                    for deferred_url in deferred:
+                        yield from extract_tenders(parse(cached_text(deferred_url, timeout=TIMEOUT), CONTAINERS))
+                    deferred = []
+                yield from extract_tenders(doc)
+
+        # Every page answered 304 / from cache: nothing new to store, unless a page is gone since
+        if not pages_changed(self.URL, count) and not changed:
+            raise NotModified(self.URL)
+        for deferred_url in deferred:  # only left when nothing changed
+            yield from extract_tenders(parse(cached_text(deferred_url, timeout=TIMEOUT), CONTAINERS))
+
+    def extract_tenders(self, doc):
+        return extract_tenders(doc)
+
+    def store_in_mongo(self, data):
+        # data can be a generator: records are written while the pages are still being parsed.
+        # Tenders past a MAX_PAGES cap were not seen, not withdrawn: the removal sweep is skipped
+        return upsert_tenders(self.MONGO_DB_COLLECTION, data, KEY_FIELDS, DATE_FIELDS, DEADLINE_FIELD, self.UNIFIED,
+                              complete=lambda: not self.capped)
+
+    def main(self):
+        print(f"Scraping {self.__name__} tenders...")
+
+        try:
+            self.store_in_mongo(self.scrape_tenders())
+        except NotModified:
+            print("No changes since last run, skipping")
+            return
+
+        commit(self.URL)
+
+# ---------------- District List ----------------
+def load_districts(path=DISTRICTS_FILE):
+    # One district per line: "host [source name] [collection]"; a full listing URL works as host too
+    districts = []
+    names = set()
+    try:
+        with open(path, encoding="utf-8") as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return districts
+
+    for line in lines:
+        fields = line.split("#", 1)[0].split()
+        if not fields:
+            continue
+        host = urlsplit(fields[0]).netloc or fields[0].strip("/")
+        district = District(host.lower(), *fields[1:3])
+        if district.__name__.lower() in names:
+            print(f"{path}: {district.__name__} listed twice, skipped")
+            continue
+        names.add(district.__name__.lower())
+        districts.append(district)
+    return districts
+
+# Picked up by run_all.discover_sources: one source per district
+SOURCES = load_districts()
+
+def get_district(name):
+    for district in SOURCES:
+        if district.__name__.lower() == name.lower() or district.host == name.lower():
+            return district
+    raise KeyError(f"{name} is not in {DISTRICTS_FILE}")
+
+# ---------------- Sweep ----------------
+def sweep(districts, workers=SWEEP_WORKERS, deadline=SWEEP_DEADLINE, store=True):
+    # Every district in one bounded pass: districts not started before the deadline are skipped,
+    # a started one is bounded by MAX_PAGES and the request timeouts, a host whose circuit is open
+    # (host_health) fails in milliseconds
+    from run_all import run_source, status_of
+
+    stop_at = time.monotonic() + deadline
+
+    def run(district):
+        if time.monotonic() >= stop_at:
+            return {"source": district.__name__, "ok": False, "unchanged": False, "count": 0, "changes": 0,
+                    "seconds": 0.0, "error": "skipped: sweep deadline passed"}
+        return run_source(district.__name__, district, district.scrape_tenders, store)
+
+    results = []
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="district") as pool:
+        for future in as_completed([pool.submit(run, district) for district in districts]):
+            result = future.result()
+            if not (result["error"] or "").startswith("skipped"):
+                print(f"[{result['source']}] {status_of(result)} in {result['seconds']:.2f}s")
+            results.append(result)
+    return results
+
+def check(host):
+    # Dry run of a new host before it goes into the list: pages and rows per page, nothing stored
+    district = District(host)
+    rows = 0
+    for page, url, res, doc in district.iter_pages():
+        count = sum(1 for _ in extract_tenders(doc))
+        rows += count
+        print(f"page {page}: {count} rows  {url}")
+    print(f"{host}: {rows} tenders -> {district.MONGO_DB_COLLECTION}")
+    return rows
+
+# ---------------- MAIN ----------------
+def main():
+    from http_client import set_force
+    from run_all import print_summary
+
+    parser = argparse.ArgumentParser(description="Scrape NIC / S3WaaS district tender listings")
+    parser.add_argument("command", choices=("sweep", "list", "check"))
+    parser.add_argument("hosts", nargs="*", help="'check': district hosts, e.g. gaya.bih.nic.in")
+    parser.add_argument("--only", nargs="*", help="district names or hosts, e.g. CMRF arwal.bih.nic.in")
+    parser.add_argument("--workers", type=int, default=SWEEP_WORKERS)
+    parser.add_argument("--deadline", type=float, default=SWEEP_DEADLINE, help="seconds; later districts are skipped")
+    parser.add_argument("--no-store", action="store_true", help="scrape only, skip MongoDB")
+    parser.add_argument("--force", action="store_true", help="ignore cache and fingerprints, full refresh")
+    args = parser.parse_args()
+
+    if args.command == "check":
+        for host in args.hosts:
+            check(urlsplit(host).netloc or host)
+        return 0
+
+    districts = SOURCES
+    if args.only:
+        districts = [get_district(name) for name in args.only]
+
+    if args.command == "list":
+        for d in districts:
+            print(f"{d.__name__:<28}{d.host:<36}{d.MONGO_DB_COLLECTION}")
+        print(f"{len(districts)} districts in {DISTRICTS_FILE}")
+        return 0
+
+    if args.force:
+        set_force(True)
+    print(f"Sweeping {len(districts)} districts with {args.workers} workers, {HOST_RATE:g} req/s per host...")
+    start = time.perf_counter()
+    results = sweep(districts, args.workers, args.deadline, not args.no_store)
+    print_summary(results, time.perf_counter() - start)
+    skipped = sum(1 for r in results if (r["error"] or "").startswith("skipped"))
+    if skipped:
+        print(f"{skipped} districts skipped at the {args.deadline:.0f}s deadline")
+    return 0 if all(r["ok"] for r in results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
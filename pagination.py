@@ -0,0 +1,83 @@
+#Parallel page fetcher for paginated tender listings
+#Known last page: fetch the rest with a concurrency cap. Unknown: speculative lookahead.
+#Pages are always handed back in page order, so callers keep their sequential stop logic.
+import contextvars
+import os
+import re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+from dotenv import load_dotenv
+
+from http_client import fetch
+
+load_dotenv()
+# ---------------- Pagination Config ----------------
+PAGE_CONCURRENCY = int(os.getenv("PAGE_CONCURRENCY", "4"))   # pages in flight when the last page is known
+PAGE_LOOKAHEAD = int(os.getenv("PAGE_LOOKAHEAD", "2"))       # pages in flight when it is not
+
+# Drupal 7 (li.pager-last) and Drupal 8+ (li.pager__item--last) pagers
+LAST_PAGE_SELECTORS = ("li.pager-last a", "li.pager__item--last a")
+
+# WordPress / S3WaaS pagers: numbered a.page-numbers links to .../page/<n>/
+PAGE_NUMBER_RE = re.compile(r"/page/(\d+)/?(?:[?#]|$)")
+
+# ---------------- Pager Discovery ----------------
+def last_page_from_pager(doc, param="page"):
+    for selector in LAST_PAGE_SELECTORS:
+        link = doc.select_one(selector)
+        if not link or not link.get("href"):
+            continue
+        values = parse_qs(urlsplit(link.get("href")).query).get(param)
+        if values and values[0].isdigit():
+            return int(values[0])
+    return None
+
+def last_page_from_links(doc, selector="a.page-numbers"):
+    # The pager always links the last page (WordPress end_size=1), so the highest number is it
+    pages = []
+    for link in doc.select(selector):
+        m = PAGE_NUMBER_RE.search(link.get("href") or "")
+        if m:
+            pages.append(int(m.group(1)))
+    return max(pages, default=None)
+
+# ---------------- Fetch ----------------
+def _fetch_page(url, timeout, headers, fetcher):
+    try:
+        return (fetcher or fetch)(url, timeout=timeout, headers=headers)
+    except Exception as e:  # handed back in order; the caller decides whether to stop
+        return e
+
+def fetch_pages(page_url, start, last_page=None, timeout=None, headers=None,
+                concurrency=PAGE_CONCURRENCY, lookahead=PAGE_LOOKAHEAD, fetcher=None):
+    # Yields (page, url, response_or_exception) for start, start+1, ... in order.
+    # Stops after last_page if known; otherwise runs until the caller stops iterating.
+    # fetcher: replaces http_client.fetch, e.g. to rate-limit the host (nic_district.py)
+    window = max(1, concurrency if last_page is not None else lookahead)
+    pool = ThreadPoolExecutor(max_workers=window, thread_name_prefix="page")
+    in_flight = deque()
+    next_page = start
+
+    def submit():
+        nonlocal next_page
+        while len(in_flight) < window and (last_page is None or next_page <= last_page):
+            url = page_url(next_page)
+            # copy_context keeps the caller's metrics source label in the worker thread
+            context = contextvars.copy_context()
+            in_flight.append((next_page, url, pool.submit(context.run, _fetch_page, url, timeout, headers, fetcher)))
+            next_page += 1
+
+    try:
+        submit()
+        while in_flight:
+            page, url, future = in_flight.popleft()
+            result = future.result()
+            submit()
+            yield page, url, result
+    finally:
+        # Caller stopped early (end of listing, loop detected): drop speculative pages
+        for _, _, future in in_flight:
+            future.cancel()
+        pool.shutdown(wait=False)
@@ -0,0 +1,194 @@
+#PDF text extraction for downloaded tender documents (downloader.py)
+#Runs in a process pool (pure-Python PDF parsing is CPU-bound, threads would share one core)
+#Results are cached per content hash in documents/text/, so a PDF is only ever extracted once
+#usage-python pdf_extract.py [--only HAFED CUR] [--workers 4]     (needs: pip install pypdf)
+#      python pdf_extract.py --bench [--limit 50]               (docs/s for 1..N workers)
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from dotenv import load_dotenv
+from pymongo import UpdateOne
+
+import downloader
+from mongo_store import get_collection, get_writer
+
+load_dotenv()
+# ---------------- Extract Config ----------------
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", "0")) or os.cpu_count() or 1
+TEXT_LIMIT = int(os.getenv("EXTRACT_TEXT_LIMIT", "200000"))  # chars attached per document (Mongo 16 MB cap)
+
+# ---------------- Cache ----------------
+def text_path(sha256):
+    return os.path.join(downloader.DOCS_DIR, "text", sha256[:2], sha256 + ".json")
+
+def load_text(sha256):
+    try:
+        with open(text_path(sha256), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+# ---------------- Worker ----------------
+def extract_file(path, sha256):
+    # Runs in a worker process: result goes to the cache, only a small summary is sent back
+    start = time.perf_counter()
+    result = {"sha256": sha256, "pages": 0, "text": "", "error": None}
+    try:
+        from pypdf import PdfReader
+
+        reader = PdfReader(path)
+        result["pages"] = len(reader.pages)
+        texts = []
+        for page in reader.pages:
+            try:
+                texts.append(page.extract_text() or "")
+            except Exception as e:  # one broken page should not lose the rest
+                texts.append("")
+                result["error"] = f"page: {type(e).__name__}: {e}"
+        result["text"] = "\n".join(texts).strip()
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["seconds"] = round(time.perf_counter() - start, 3)
+
+    out = text_path(sha256)
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    tmp = f"{out}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False)
+    os.replace(tmp, out)
+    return sha256, result["pages"], len(result["text"]), result["error"]
+
+def _pdf_blobs(index):
+    # One entry per distinct content hash, PDFs only
+    blobs = {}
+    for entry in index.values():
+        if entry["path"].endswith(".pdf") or "pdf" in (entry.get("content_type") or ""):
+            blobs[entry["sha256"]] = os.path.join(downloader.DOCS_DIR, entry["path"])
+    return blobs
+
+def extract_all(blobs, workers=EXTRACT_WORKERS):
+    stats = {"documents": 0, "pages": 0, "errors": 0, "seconds": 0.0}
+    if not blobs:
+        return stats
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max(1, workers)) as pool:
+        shas = list(blobs)
+        paths = [blobs[s] for s in shas]
+        for sha256, pages, chars, error in pool.map(extract_file, paths, shas):
+            stats["documents"] += 1
+            stats["pages"] += pages
+            if error:
+                stats["errors"] += 1
+                print(f"{sha256[:12]}: {error}")
+    stats["seconds"] = time.perf_counter() - start
+    return stats
+
+# ---------------- Attach to tenders ----------------
+def attach(module, index):
+    # documents_text: one entry per linked document, rewritten only when the set of hashes changed
+    fields = getattr(module, "DOCUMENT_FIELDS", ())
+    base = getattr(module, "BASE_URL", None) or module.URL
+    collection = get_collection(module.MONGO_DB_COLLECTION)
+    writer = get_writer()
+    updated = 0
+
+    projection = {f.split(".")[0]: 1 for f in fields}
+    projection["documents_text.sha256"] = 1
+    for record in collection.find({"removed": {"$ne": True}}, projection):
+        entries = []
+        for url in downloader.record_urls(record, fields, base):
+            doc = index.get(url)
+            text = load_text(doc["sha256"]) if doc else None
+            if text is None:
+                continue
+            entries.append({
+                "url": url,
+                "sha256": doc["sha256"],
+                "pages": text["pages"],
+                "text": text["text"][:TEXT_LIMIT],
+                "error": text["error"],
+            })
+
+        before = [d.get("sha256") for d in record.get("documents_text", [])]
+        if not entries or [e["sha256"] for e in entries] == before:
+            continue
+        writer.put(module.MONGO_DB_COLLECTION, UpdateOne({"_id": record["_id"]}, {"$set": {"documents_text": entries}}))
+        updated += 1
+
+    writer.flush(module.MONGO_DB_COLLECTION)
+    return updated
+
+def extract_sources(sources, workers=EXTRACT_WORKERS):
+    index = downloader.load_index()
+    blobs = _pdf_blobs(index)
+    todo = {sha: path for sha, path in blobs.items() if not os.path.exists(text_path(sha))}
+
+    print(f"documents: {len(blobs)} PDFs, {len(blobs) - len(todo)} cached, extracting {len(todo)} with {workers} workers")
+    stats = extract_all(todo, workers)
+    if stats["documents"]:
+        print(
+            f"extracted {stats['documents']} documents, {stats['pages']} pages in {stats['seconds']:.1f}s "
+            f"({stats['pages'] / stats['seconds']:.1f} pages/s), {stats['errors']} errors"
+        )
+
+    for name, module, _ in sources:
+        if getattr(module, "DOCUMENT_FIELDS", None):
+            print(f"{name}: text attached to {attach(module, index)} tenders")
+    return stats
+
+# ---------------- Benchmark ----------------
+def bench(limit, max_workers):
+    # Re-extracts (cache ignored) the same documents with a growing pool
+    blobs = dict(list(_pdf_blobs(downloader.load_index()).items())[:limit])
+    if not blobs:
+        print("No downloaded PDFs, run downloader.py first")
+        return
+
+    print(f"{len(blobs)} documents")
+    print(f"{'workers':>8}{'seconds':>10}{'docs/s':>9}{'pages/s':>10}{'speedup':>9}")
+    baseline = None
+    workers = 1
+    while workers <= max_workers:
+        stats = extract_all(blobs, workers)
+        baseline = baseline or stats["seconds"]
+        print(
+            f"{workers:>8}{stats['seconds']:>10.2f}{stats['documents'] / stats['seconds']:>9.1f}"
+            f"{stats['pages'] / stats['seconds']:>10.1f}{baseline / stats['seconds']:>8.1f}x"
+        )
+        workers *= 2
+
+# ---------------- MAIN ----------------
+def main():
+    from run_all import discover_sources
+
+    parser = argparse.ArgumentParser(description="Extract text from downloaded tender PDFs")
+    parser.add_argument("--only", nargs="*", help="module names to attach text to, e.g. HAFED CUR")
+    parser.add_argument("--workers", type=int, default=EXTRACT_WORKERS)
+    parser.add_argument("--bench", action="store_true", help="measure throughput for 1, 2, 4 ... workers")
+    parser.add_argument("--limit", type=int, default=50, help="documents used by --bench")
+    args = parser.parse_args()
+
+    try:
+        import pypdf  # noqa: F401
+    except ImportError:
+        print("pypdf is not installed: pip install pypdf")
+        return 1
+
+    if args.bench:
+        bench(args.limit, max(1, args.workers))
+        return 0
+
+    sources = discover_sources()
+    if args.only:
+        wanted = {name.lower() for name in args.only}
+        sources = [s for s in sources if s[0].lower() in wanted]
+    stats = extract_sources(sources, max(1, args.workers))
+    return 0 if not stats["errors"] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
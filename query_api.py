@@ -0,0 +1,355 @@
+#Query API over the stored tenders: indexed, cursor-paginated queries on the unified collection
+#"closing within N days", by source, by keyword - one indexed query for every source (unified.py)
+#usage-python query_api.py serve [--port 8080]       GET /tenders?closing_within=7&source=HAFED&q=pump&dedup=1&cursor=...
+#      GET /search?q=sadak+marammat&source=HAFED&open=1&offset=20   (ranked, search_index.py)
+#      python query_api.py query --closing-within 7 [--source HAFED] [--q pump]
+#      python query_api.py indexes                   (create / update indexes and exit)
+#      python query_api.py bench [--n 1000000]       (synthetic tenders in MONGO_BENCH_DB, with vs. without indexes)
+import argparse
+import base64
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from bson import ObjectId
+from dotenv import load_dotenv
+
+import mongo_store
+from dates import portal_now
+
+load_dotenv()
+# ---------------- API Config ----------------
+API_HOST = os.getenv("QUERY_API_HOST", "127.0.0.1")
+API_PORT = int(os.getenv("QUERY_API_PORT", "8080"))
+PAGE_LIMIT = 50
+MAX_LIMIT = 500
+BENCH_DB = os.getenv("MONGO_BENCH_DB", "tenders_bench")
+
+# Every query filters removed=False first (iter_ops always writes it), then source, then ranges/sorts
+INDEXES = {
+    "open_by_deadline": [("removed", 1), ("deadline_dt", 1), ("_id", 1)],
+    "source_by_deadline": [("removed", 1), ("source", 1), ("deadline_dt", 1), ("_id", 1)],
+    "open_by_recent": [("removed", 1), ("_id", -1)],
+    "source_by_recent": [("removed", 1), ("source", 1), ("_id", -1)],
+}
+TEXT_INDEX = "text"
+TEXT_FIELDS = {"title": 5, "reference": 5, "description": 1}  # weights
+
+# ---------------- Indexes ----------------
+def ensure_indexes(collection):
+    # create_index is a no-op when the index already exists; run by 'indexes' and on server start
+    for name, keys in INDEXES.items():
+        collection.create_index(keys, name=name)
+    collection.create_index(
+        [(field, "text") for field in TEXT_FIELDS], name=TEXT_INDEX, weights=TEXT_FIELDS,
+        language_override="_language",
+    )
+
+def drop_indexes(collection):
+    for name in list(INDEXES) + [TEXT_INDEX]:
+        try:
+            collection.drop_index(name)
+        except Exception:
+            pass
+
+def unified_collection():
+    return mongo_store.get_collection(mongo_store.UNIFIED_COLLECTION)
+
+def source_names():
+    from run_all import discover_sources
+
+    return sorted(module.UNIFIED.source for _, module, _ in discover_sources() if getattr(module, "UNIFIED", None))
+
+# ---------------- Cursors ----------------
+def encode_cursor(order, doc):
+    value = doc.get("deadline_dt") if order == "deadline" else None
+    raw = {"o": order, "v": value.isoformat() if value else None, "i": str(doc["_id"])}
+    return base64.urlsafe_b64encode(json.dumps(raw).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if raw.get("v"):
+            raw["v"] = datetime.fromisoformat(raw["v"])
+        raw["i"] = ObjectId(raw["i"])
+        return raw
+    except Exception:
+        raise ValueError("invalid cursor")
+
+def _after(order, cursor):
+    # Keyset condition "strictly after the cursor": an index range, however deep the page
+    if order == "recent":
+        return {"_id": {"$lt": cursor["i"]}}
+    return {"$or": [
+        {"deadline_dt": {"$gt": cursor["v"]}},
+        {"deadline_dt": cursor["v"], "_id": {"$gt": cursor["i"]}},
+    ]}
+
+# ---------------- Query ----------------
+def build_filter(sources=None, closing_within=None, q=None, now=None, dedup=False):
+    query = {"removed": False}
+    if dedup:
+        query["duplicate"] = {"$ne": True}  # one tender per dedup.py cluster
+    if sources:
+        query["source"] = {"$in": list(sources)}
+    if closing_within is not None:
+        now = now or portal_now()
+        query["deadline_dt"] = {"$gte": now, "$lt": now + timedelta(days=closing_within)}
+    if q:
+        query["$text"] = {"$search": q}
+    return query
+
+def find_tenders(collection, sources=None, closing_within=None, q=None, limit=PAGE_LIMIT, cursor=None, now=None,
+                 dedup=False):
+    # Closing-date queries are ordered by (deadline, _id), everything else newest first
+    limit = max(1, min(int(limit), MAX_LIMIT))
+    order = "deadline" if closing_within is not None else "recent"
+    cursor = decode_cursor(cursor) if cursor else None
+    if cursor and cursor["o"] != order:
+        raise ValueError("cursor belongs to a different query")
+
+    query = build_filter(sources, closing_within, q, now, dedup)
+    if cursor:
+        query = {"$and": [query, _after(order, cursor)]}
+    sort = [("deadline_dt", 1), ("_id", 1)] if order == "deadline" else [("_id", -1)]
+    page = list(collection.find(query).sort(sort).limit(limit))
+    next_cursor = encode_cursor(order, page[-1]) if len(page) == limit else None
+    return page, next_cursor
+
+def source_counts(collection, now=None):
+    now = now or portal_now()
+    pipeline = [
+        {"$match": {"removed": False}},
+        {"$group": {
+            "_id": "$source",
+            "active": {"$sum": 1},
+            "open": {"$sum": {"$cond": [{"$gte": ["$deadline_dt", now]}, 1, 0]}},
+        }},
+        {"$sort": {"_id": 1}},
+    ]
+    return {row["_id"]: {"active": row["active"], "open": row["open"]} for row in collection.aggregate(pipeline)}
+
+def to_json(data):
+    return json.dumps(data, default=lambda v: v.isoformat() if isinstance(v, datetime) else str(v), ensure_ascii=False)
+
+# ---------------- HTTP API ----------------
+class QueryHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        try:
+            if url.path == "/tenders":
+                body = self.tenders(params)
+            elif url.path == "/search":
+                body = self.search(params)
+            elif url.path == "/sources":
+                body = source_counts(self.server.collection)
+            elif url.path == "/health":
+                body = {"ok": True, "sources": len(self.server.sources)}
+            else:
+                return self.reply(404, {"error": f"unknown path {url.path}"})
+        except ValueError as e:
+            return self.reply(400, {"error": str(e)})
+        except Exception as e:
+            return self.reply(500, {"error": f"{type(e).__name__}: {e}"})
+        self.reply(200, body)
+
+    def sources(self, params):
+        if not params.get("source"):
+            return None
+        known = {s.lower(): s for s in self.server.sources}
+        wanted = [s.strip().lower() for s in params["source"].split(",")]
+        unknown = [s for s in wanted if s not in known]
+        if unknown:
+            raise ValueError(f"unknown source {', '.join(unknown)}")
+        return [known[s] for s in wanted]
+
+    def tenders(self, params):
+        sources = self.sources(params)
+        closing = params.get("closing_within")
+        try:
+            closing = float(closing) if closing else None
+            limit = int(params.get("limit", PAGE_LIMIT))
+        except ValueError:
+            raise ValueError("closing_within and limit must be numbers")
+
+        tenders, next_cursor = find_tenders(
+            self.server.collection, sources, closing, params.get("q"), limit, params.get("cursor"),
+            dedup=params.get("dedup") in ("1", "true", "yes"),
+        )
+        return {"count": len(tenders), "next_cursor": next_cursor, "tenders": tenders}
+
+    def search(self, params):
+        # Ranked full-text search: relevance order, so plain offsets instead of keyset cursors
+        from search_index import get_index
+
+        if not params.get("q"):
+            raise ValueError("q is required")
+        try:
+            limit = int(params.get("limit", PAGE_LIMIT))
+            offset = int(params.get("offset", 0))
+        except ValueError:
+            raise ValueError("limit and offset must be numbers")
+        limit = max(1, min(limit, MAX_LIMIT))
+        hits = get_index().search(
+            params["q"], self.sources(params), params.get("open") in ("1", "true", "yes"), limit, offset
+        )
+        return {"count": len(hits), "tenders": hits}
+
+    def reply(self, status, body):
+        data = to_json(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, fmt, *args):
+        print(f"{self.address_string()} {fmt % args}")
+
+class QueryServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, collection, sources, host=API_HOST, port=API_PORT):
+        super().__init__((host, port), QueryHandler)
+        self.collection = collection
+        self.sources = sources
+        ensure_indexes(collection)
+
+# ---------------- Benchmark ----------------
+WORDS = ("supply", "pump", "repair", "road", "construction", "printing", "furniture", "medicines",
+         "computers", "cctv", "canteen", "security", "tractor", "fertilizer", "bitumen", "cleaning")
+
+def _synthetic(n_sources, n, now):
+    # Deadlines spread over +-180 days, 5% removed: roughly what a year of scraping leaves behind
+    rnd = random.Random(1)
+    for i in range(n):
+        yield {
+            "_fp": f"bench_{i % n_sources:02d}:{i}",
+            "source": f"bench_{i % n_sources:02d}",
+            "title": " ".join(rnd.sample(WORDS, 3)) + f" tender no {i}",
+            "deadline_dt": now + timedelta(minutes=rnd.randint(-180 * 1440, 180 * 1440)),
+            "removed": rnd.random() < 0.05,
+            "raw": {"sr_no": str(i)},
+        }
+
+def _load_bench(collection, n, n_sources, now):
+    collection.drop()
+    start = time.perf_counter()
+    batch = []
+    for doc in _synthetic(n_sources, n, now):
+        batch.append(doc)
+        if len(batch) >= 10000:
+            collection.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        collection.insert_many(batch, ordered=False)
+    print(f"loaded {n} tenders from {n_sources} sources in {time.perf_counter() - start:.1f}s")
+
+def _examined(collection, query):
+    try:
+        return collection.find(query).explain().get("executionStats", {}).get("totalDocsExamined")
+    except Exception:
+        return None
+
+def _time(func, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def bench(n, n_sources, reload=True):
+    collection = mongo_store.get_client()[BENCH_DB]["bench_tenders"]
+    now = datetime.now()
+    if reload:
+        _load_bench(collection, n, n_sources, now)
+
+    def pages(k, **kw):
+        cursor = None
+        for _ in range(k):
+            _, cursor = find_tenders(collection, cursor=cursor, now=now, **kw)
+            if cursor is None:
+                return
+
+    one = ["bench_00"]
+    cases = [
+        ("closing in 7 days, page 1", lambda: pages(1, closing_within=7), build_filter(None, 7, now=now)),
+        ("closing in 7 days, page 20", lambda: pages(20, closing_within=7), build_filter(None, 7, now=now)),
+        ("one source, 30 days", lambda: pages(1, sources=one, closing_within=30), build_filter(one, 30, now=now)),
+        ("recent, page 1", lambda: pages(1), build_filter()),
+        ("one source, recent", lambda: pages(1, sources=one), build_filter(one)),
+        ("keyword 'pump', page 1", lambda: pages(1, q="pump"), None),
+    ]
+
+    results = {}
+    for label in ("no index", "indexed"):
+        drop_indexes(collection)
+        if label == "indexed":
+            ensure_indexes(collection)
+        for case, func, query in cases:
+            if query is None and label == "no index":
+                results[(case, label)] = (None, None)  # $text needs the text index
+                continue
+            results[(case, label)] = (_time(func), _examined(collection, query) if query else None)
+
+    print(f"{'query':<30}{'no index ms':>13}{'indexed ms':>12}{'speedup':>9}{'docs examined':>22}")
+    print("-" * 86)
+    for case, _, _ in cases:
+        slow, slow_docs = results[(case, "no index")]
+        fast, fast_docs = results[(case, "indexed")]
+        speedup = f"{slow / fast:.0f}x" if slow else "-"
+        docs = f"{slow_docs if slow_docs is not None else '-'} -> {fast_docs if fast_docs is not None else '-'}"
+        slow = f"{slow * 1000:.1f}" if slow else "-"
+        print(f"{case:<30}{slow:>13}{fast * 1000:>12.1f}{speedup:>9}{docs:>22}")
+
+# ---------------- MAIN ----------------
+def main():
+    parser = argparse.ArgumentParser(description="Indexed query API over the stored tenders")
+    parser.add_argument("command", choices=("serve", "query", "indexes", "bench"))
+    parser.add_argument("--host", default=API_HOST)
+    parser.add_argument("--port", type=int, default=API_PORT)
+    parser.add_argument("--source", nargs="*", help="source names, e.g. HAFED CMRF")
+    parser.add_argument("--closing-within", type=float, help="days from now")
+    parser.add_argument("--q", help="keywords")
+    parser.add_argument("--limit", type=int, default=PAGE_LIMIT)
+    parser.add_argument("--cursor", help="next_cursor of the previous page")
+    parser.add_argument("--dedup", action="store_true", help="skip near-duplicates found by dedup.py")
+    parser.add_argument("--n", type=int, default=1000000, help="synthetic tenders for 'bench'")
+    parser.add_argument("--sources", type=int, default=11, help="sources for 'bench'")
+    parser.add_argument("--no-reload", action="store_true", help="'bench' on the data already loaded")
+    args = parser.parse_args()
+
+    if args.command == "bench":
+        bench(args.n, max(1, args.sources), not args.no_reload)
+        return 0
+
+    collection = unified_collection()
+    if args.command == "indexes":
+        ensure_indexes(collection)
+        print(f"indexes on {collection.name} up to date: {', '.join(sorted(collection.index_information()))}")
+    elif args.command == "query":
+        ensure_indexes(collection)
+        tenders, next_cursor = find_tenders(
+            collection, args.source, args.closing_within, args.q, args.limit, args.cursor, dedup=args.dedup
+        )
+        for t in tenders:
+            print(to_json(t))
+        print(f"{len(tenders)} tenders" + (f", next page: --cursor {next_cursor}" if next_cursor else ""))
+    else:
+        server = QueryServer(collection, source_names(), args.host, args.port)
+        print(f"Serving {len(server.sources)} sources on http://{args.host}:{server.server_address[1]}/tenders")
+        server.serve_forever()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
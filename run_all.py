@@ -0,0 +1,193 @@
+#Runs every tender scraper in this folder concurrently
+#usage-python run_all.py [--workers 8] [--only HAFED CUR] [--no-store] [--force] [--parser lxml]
+#      [--metrics metrics.prom metrics.json] [--download] [--dedup] [--index]
+import argparse
+import glob
+import importlib.util
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from importlib.machinery import SourceFileLoader
+
+from dotenv import load_dotenv
+
+import html_parser
+import metrics
+from http_client import NotModified, commit, set_force
+from mongo_store import writer_stats
+
+load_dotenv()
+# ---------------- Config ----------------
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_WORKERS = int(os.getenv("SCRAPER_WORKERS", "8"))
+METRICS_FILES = os.getenv("METRICS_FILES", "").split()  # e.g. "/var/lib/node_exporter/tenders.prom"
+
+# Entry points used by the scraper modules, in lookup order
+SCRAPER_FUNCTIONS = ("scrape_tenders", "hafed", "BDA", "cur", "igib", "APL", "Ayurved")
+
+# ---------------- Discovery ----------------
+def load_module(path):
+    name = os.path.splitext(os.path.basename(path))[0]
+    if name in sys.modules:
+        return sys.modules[name]
+
+    # SourceFileLoader so that HAFED.PY (upper-case suffix) imports as well
+    loader = SourceFileLoader(name, path)
+    spec = importlib.util.spec_from_file_location(name, path, loader=loader)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    try:
+        loader.exec_module(module)
+    except Exception:
+        del sys.modules[name]
+        raise
+    return module
+
+def discover_sources(base_dir=BASE_DIR):
+    sources = []
+    paths = glob.glob(os.path.join(base_dir, "*.py")) + glob.glob(os.path.join(base_dir, "*.PY"))
+
+    for path in sorted(paths):
+        with open(path, encoding="utf-8", errors="ignore") as f:
+            if "def store_in_mongo" not in f.read():
+                continue
+
+        module = load_module(path)
+        # Template scrapers (nic_district.py) bring one module-like source per site
+        templated = getattr(module, "SOURCES", None)
+        if templated is not None:
+            sources.extend((source.__name__, source, source.scrape_tenders) for source in templated)
+            continue
+        for func_name in SCRAPER_FUNCTIONS:
+            func = getattr(module, func_name, None)
+            if callable(func):
+                sources.append((module.__name__, module, func))
+                break
+
+    return sources
+
+# ---------------- Runner ----------------
+def run_source(name, module, func, store=True):
+    with metrics.source(name):
+        result = _run_source(name, module, func, store)
+        metrics.stage("total", result["seconds"])
+        metrics.inc("tender_source_runs_total", source=name, status=status_of(result))
+    return result
+
+def _run_source(name, module, func, store):
+    result = {"source": name, "ok": False, "unchanged": False, "count": 0, "changes": 0, "seconds": 0.0, "error": None}
+    start = time.perf_counter()
+    try:
+        # Scrapers yield records page by page; storage consumes them as they come
+        if store:
+            stats = module.store_in_mongo(func())
+            result["count"] = stats["records"]
+            result["changes"] = stats["new"] + stats["changed"] + stats["removed"]
+            commit(module.URL)
+        else:
+            result["count"] = sum(1 for _ in func())
+        result["ok"] = True
+    except NotModified:
+        result["ok"] = True
+        result["unchanged"] = True
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+        traceback.print_exc()
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+def status_of(result):
+    if not result["ok"]:
+        return "FAILED"
+    return "unchanged" if result["unchanged"] else "ok"
+
+def run_all(sources, workers=DEFAULT_WORKERS, store=True):
+    results = []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {
+            pool.submit(run_source, name, module, func, store): name
+            for name, module, func in sources
+        }
+        for future in as_completed(futures):
+            result = future.result()
+            status = status_of(result)
+            print(f"[{result['source']}] {status} in {result['seconds']:.2f}s")
+            results.append(result)
+    return results
+
+def print_summary(results, wall_seconds):
+    print()
+    print(f"{'source':<24}{'status':<10}{'tenders':>8}{'seconds':>10}")
+    print("-" * 52)
+    for r in sorted(results, key=lambda r: r["seconds"], reverse=True):
+        print(f"{r['source']:<24}{status_of(r):<10}{r['count']:>8}{r['seconds']:>10.2f}")
+    print("-" * 52)
+
+    slowest = max((r["seconds"] for r in results), default=0.0)
+    total = sum(r["seconds"] for r in results)
+    print(f"wall {wall_seconds:.2f}s | slowest source {slowest:.2f}s | sequential sum {total:.2f}s")
+
+    for r in results:
+        if r["error"]:
+            print(f"  {r['source']}: {r['error']}")
+
+# ---------------- MAIN ----------------
+def main():
+    parser = argparse.ArgumentParser(description="Run all tender scrapers concurrently")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--only", nargs="*", help="module names to run, e.g. HAFED CUR")
+    parser.add_argument("--no-store", action="store_true", help="scrape only, skip MongoDB")
+    parser.add_argument("--force", action="store_true", help="ignore cache and fingerprints, full refresh")
+    parser.add_argument("--parser", choices=html_parser.BACKENDS, help="HTML parser backend")
+    parser.add_argument("--download", action="store_true", help="then fetch the linked documents (downloader.py)")
+    parser.add_argument("--dedup", action="store_true", help="then cluster near-duplicate tenders (dedup.py)")
+    parser.add_argument("--index", action="store_true", help="then update the full-text index (search_index.py)")
+    parser.add_argument("--metrics", nargs="*", default=METRICS_FILES,
+                        help="write metrics files; .json for JSON, anything else Prometheus text")
+    args = parser.parse_args()
+
+    if args.parser:
+        html_parser.set_backend(args.parser)
+    if args.force:
+        set_force(True)
+
+    sources = discover_sources()
+    if args.only:
+        wanted = {name.lower() for name in args.only}
+        sources = [s for s in sources if s[0].lower() in wanted]
+
+    if not sources:
+        print("No scrapers found")
+        return 1
+
+    print(f"Running {len(sources)} scrapers with {args.workers} workers...")
+    start = time.perf_counter()
+    results = run_all(sources, workers=args.workers, store=not args.no_store)
+    print_summary(results, time.perf_counter() - start)
+
+    if args.download and not args.no_store:
+        from downloader import download_sources
+        ok = {r["source"] for r in results if r["ok"]}
+        download_sources([s for s in sources if s[0] in ok])
+
+    if args.dedup and not args.no_store:
+        from dedup import dedup, report
+        report(dedup())
+
+    if args.index and not args.no_store:
+        from search_index import sync
+        sync()
+
+    stats = writer_stats()
+    if stats:
+        print("mongo writer: " + ", ".join(f"{k}={v}" for k, v in stats.items()))
+
+    for path in args.metrics or ():
+        print(f"metrics written to {metrics.write(path)}")
+
+    return 0 if all(r["ok"] for r in results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
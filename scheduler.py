@@ -0,0 +1,426 @@
+#Adaptive polling scheduler: one long-running process instead of cron running every scraper at the same interval
+#Each source's change rate is learned from its own runs (new / changed / removed records, or NotModified)
+#and its next poll is set to match: busy portals every hour or two, quiet ones once a day
+#Polls are jittered; per-host budgets (concurrent runs, gap between starts, starts per hour) and
+#host_health's circuit breaker keep any one server from being hammered
+#usage-python scheduler.py [--workers 4] [--only HAFED CMRF] [--dedup] [--index] [--metrics tenders.prom]
+#      python scheduler.py --show                  (the schedule, from the state file)
+#      python scheduler.py --simulate [--days 30]  (adaptive vs. fixed interval on synthetic sources)
+import argparse
+import json
+import math
+import os
+import random
+import signal
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urlsplit
+
+from dotenv import load_dotenv
+
+import host_health
+import metrics
+
+load_dotenv()
+# ---------------- Schedule Config ----------------
+STATE_FILE = os.getenv("SCHEDULE_FILE", ".schedule.json")
+MIN_INTERVAL = float(os.getenv("SCHEDULE_MIN_INTERVAL", "900"))       # = HTTP cache fallback TTL: sooner reads the cache
+MAX_INTERVAL = float(os.getenv("SCHEDULE_MAX_INTERVAL", "43200"))
+START_INTERVAL = float(os.getenv("SCHEDULE_START_INTERVAL", "3600"))  # until a source has history
+STARTUP_SPREAD = 600.0     # sources without a schedule start spread over this many seconds
+POLLS_PER_CHANGE = 4.0     # polls per expected change: a change waits ~1/8 of the mean gap between changes
+DECAY = 0.95              # weight of older polls: the estimate follows a portal that gets busier or quieter
+GROWTH = 2.0               # an interval at most doubles per poll..
+SHRINK = 4.0               # ..and shrinks at most 4x
+JITTER = 0.1               # +-10% on every interval, so sources with the same rate drift apart
+RETRY_DELAY = 300.0        # after a failed run; doubled per failure, capped at the interval
+
+HOST_CONCURRENCY = int(os.getenv("SCHEDULE_HOST_CONCURRENCY", "1"))
+HOST_MIN_GAP = float(os.getenv("SCHEDULE_HOST_MIN_GAP", "60"))          # seconds between starts on one host
+HOST_RUNS_PER_HOUR = int(os.getenv("SCHEDULE_HOST_RUNS_PER_HOUR", "6"))
+
+def jittered(seconds):
+    return seconds * random.uniform(1 - JITTER, 1 + JITTER)
+
+def next_poll(interval):
+    # Never under MIN_INTERVAL after jitter: a sooner poll is answered by the HTTP cache and
+    # would count as a genuine "unchanged"
+    return max(MIN_INTERVAL, jittered(interval))
+
+# ---------------- Per-source schedule ----------------
+class SourceSchedule:
+    def __init__(self, name, host, state=None):
+        state = state or {}
+        self.name = name
+        self.host = host
+        self.interval = state.get("interval", START_INTERVAL)
+        self.polls = state.get("polls", 0.0)        # decayed count of successful polls
+        self.changes = state.get("changes", 0.0)    # ..of those that found a change
+        self.elapsed = state.get("elapsed", 0.0)    # ..and of the time they covered
+        self.last_run = state.get("last_run")       # last successful poll
+        self.next_run = state.get("next_run")
+        self.last_change = state.get("last_change")
+        self.failures = state.get("failures", 0)
+        self.last_status = state.get("last_status")
+
+    def to_state(self):
+        return {
+            "host": self.host,
+            "interval": round(self.interval, 1),
+            "polls": round(self.polls, 4),
+            "changes": round(self.changes, 4),
+            "elapsed": round(self.elapsed, 1),
+            "last_run": self.last_run,
+            "next_run": self.next_run,
+            "last_change": self.last_change,
+            "failures": self.failures,
+            "last_status": self.last_status,
+        }
+
+    def rate(self):
+        # Changes per second. A poll only tells "changed at least once since the last one", so the
+        # share of polls that saw a change is corrected for the changes it hides (Poisson estimator)
+        if self.polls < 1 or self.elapsed <= 0:
+            return None
+        mean_interval = self.elapsed / self.polls
+        return max(0.0, -math.log((self.polls - self.changes + 0.5) / (self.polls + 0.5))) / mean_interval
+
+    def observe(self, changed, now):
+        if self.last_run is not None:
+            # The first poll only sets the baseline: everything on the page looks new to it
+            self.polls = self.polls * DECAY + 1
+            self.changes = self.changes * DECAY + (1 if changed else 0)
+            self.elapsed = self.elapsed * DECAY + (now - self.last_run)
+            rate = self.rate()
+            target = 1 / (rate * POLLS_PER_CHANGE) if rate else self.interval * GROWTH
+            target = min(max(target, self.interval / SHRINK), self.interval * GROWTH)
+            self.interval = min(max(target, MIN_INTERVAL), MAX_INTERVAL)
+        if changed:
+            self.last_change = now
+        self.last_run = now
+        self.failures = 0
+        self.last_status = "changed" if changed else "unchanged"
+        self.next_run = now + next_poll(self.interval)
+
+    def empty(self, now):
+        # Ran without error but listed nothing: a broken page more likely than a portal with no
+        # tenders, so not an observation either - it would pull the change rate toward zero
+        self.last_status = "empty listing"
+        self.next_run = now + next_poll(self.interval)
+
+    def failed(self, error, now):
+        # Not an observation: the next successful poll still covers the time since the last one
+        self.failures += 1
+        self.last_status = f"FAILED: {error}"[:200]
+        self.next_run = now + jittered(min(RETRY_DELAY * 2 ** (self.failures - 1), self.interval))
+
+    def defer(self, until):
+        self.next_run = until
+
+# ---------------- Politeness ----------------
+class HostBudget:
+    # Start times per host over the last hour; owned by the scheduler loop (one thread)
+    def __init__(self):
+        self.running = {}
+        self.starts = {}
+
+    def wait(self, host, now):
+        # Seconds until a run may start on host; None while the host is busy (re-checked when a run ends)
+        if self.running.get(host, 0) >= HOST_CONCURRENCY:
+            return None
+        starts = self.starts.setdefault(host, deque())
+        while starts and now - starts[0] >= 3600:
+            starts.popleft()
+        delay = 0.0
+        if starts:
+            delay = starts[-1] + HOST_MIN_GAP - now
+        if len(starts) >= HOST_RUNS_PER_HOUR:
+            delay = max(delay, starts[0] + 3600 - now)
+        return max(delay, host_health.retry_in(host))
+
+    def start(self, host, now):
+        self.running[host] = self.running.get(host, 0) + 1
+        self.starts.setdefault(host, deque()).append(now)
+
+    def finish(self, host):
+        self.running[host] -= 1
+
+# ---------------- State ----------------
+def load_state():
+    try:
+        with open(STATE_FILE, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_state(schedules):
+    saved = load_state()  # keep sources not run by this process (--only)
+    saved.update({name: s.to_state() for name, s in schedules.items()})
+    tmp = f"{STATE_FILE}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(saved, f, indent=1, sort_keys=True)
+    os.replace(tmp, STATE_FILE)
+
+# ---------------- Scheduler ----------------
+class Scheduler:
+    def __init__(self, sources, workers=4, dedup=False, index=False, metrics_files=()):
+        saved = load_state()
+        now = time.time()
+        self.sources = {}
+        self.schedules = {}
+        for name, module, func in sources:
+            host = urlsplit(getattr(module, "URL", "")).netloc or name
+            schedule = SourceSchedule(name, host, saved.get(name))
+            if schedule.next_run is None:
+                schedule.next_run = now + random.uniform(0, min(schedule.interval, STARTUP_SPREAD))
+            self.sources[name] = (module, func)
+            self.schedules[name] = schedule
+        self.budget = HostBudget()
+        self.workers = max(1, workers)
+        self.dedup = dedup
+        self.index = index
+        self.metrics_files = list(metrics_files or ())
+        self.stopping = threading.Event()
+        # dedup / index sync run here, one at a time, off the loop thread that starts sources
+        self.post_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="post")
+        self.post_queued = False
+        self.post_lock = threading.Lock()
+
+    def stop(self, *_):
+        self.stopping.set()
+
+    def run(self):
+        from run_all import run_source
+
+        running = {}  # future -> source name
+        pool = ThreadPoolExecutor(max_workers=self.workers)
+        print(f"scheduling {len(self.schedules)} sources with {self.workers} workers")
+        try:
+            while not self.stopping.is_set():
+                now = time.time()
+                busy = set(running.values())
+                for schedule in sorted(self.schedules.values(), key=lambda s: s.next_run):
+                    if schedule.next_run > now or len(running) >= self.workers:
+                        break
+                    if schedule.name in busy:
+                        continue
+                    delay = self.budget.wait(schedule.host, now)
+                    if delay is None:
+                        continue
+                    if delay > 0:
+                        schedule.defer(now + delay)
+                        continue
+                    self.budget.start(schedule.host, now)
+                    module, func = self.sources[schedule.name]
+                    running[pool.submit(run_source, schedule.name, module, func)] = schedule.name
+                    busy.add(schedule.name)
+
+                upcoming = [s.next_run for s in self.schedules.values() if s.name not in busy and s.next_run > now]
+                timeout = min(60.0, max(0.5, min(upcoming, default=now + 60) - now))
+                if running:
+                    done, _ = wait(list(running), timeout=timeout, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        self.finished(running.pop(future), future.result())
+                else:
+                    self.stopping.wait(timeout)
+        finally:
+            print("stopping: waiting for running scrapers")
+            for future in list(running):
+                self.finished(running.pop(future), future.result())
+            pool.shutdown()
+            self.post_pool.shutdown()
+            self.save()
+
+    def finished(self, name, result):
+        schedule = self.schedules[name]
+        self.budget.finish(schedule.host)
+        now = time.time()
+        if result["ok"] and (result["unchanged"] or result["count"]):
+            changed = not result["unchanged"] and result["changes"] > 0
+            schedule.observe(changed, now)
+            rate = schedule.rate()
+            rate = f"{rate * 86400:.1f}/day" if rate is not None else "learning"
+            print(
+                f"[{name}] {schedule.last_status} ({result['changes']} records new/changed/removed) in {result['seconds']:.1f}s, "
+                f"next in {_duration(schedule.next_run - now)} (interval {_duration(schedule.interval)}, changes {rate})"
+            )
+        elif result["ok"]:
+            schedule.empty(now)
+            print(f"[{name}] no records, rate not updated, next in {_duration(schedule.next_run - now)}")
+        else:
+            schedule.failed(result["error"], now)
+            print(f"[{name}] FAILED ({result['error']}), retry in {_duration(schedule.next_run - now)}")
+        self.save()
+
+        if result["ok"] and result["changes"] and (self.dedup or self.index):
+            with self.post_lock:
+                if self.post_queued:
+                    return  # the queued pass has not started yet and will see these changes too
+                self.post_queued = True
+            self.post_pool.submit(self.post_process)
+
+    def post_process(self):
+        with self.post_lock:
+            self.post_queued = False
+        try:
+            if self.dedup:
+                from dedup import dedup, report
+                report(dedup())
+            if self.index:
+                from search_index import sync
+                sync()
+        except Exception:
+            traceback.print_exc()
+
+    def save(self):
+        import dates
+
+        save_state(self.schedules)
+        # Long-running: the other state files would otherwise only be written at exit
+        host_health.save()
+        dates.save()
+        for name, schedule in self.schedules.items():
+            metrics.set_gauge("tender_schedule_interval_seconds", round(schedule.interval, 1), source=name)
+            metrics.set_gauge("tender_schedule_next_run_timestamp", round(schedule.next_run or 0), source=name)
+            rate = schedule.rate()
+            if rate is not None:
+                metrics.set_gauge("tender_schedule_changes_per_day", round(rate * 86400, 3), source=name)
+        for path in self.metrics_files:
+            metrics.write(path)
+
+# ---------------- Show ----------------
+def _duration(seconds):
+    if seconds is None:
+        return "-"
+    seconds = abs(seconds)
+    if seconds < 90:
+        return f"{seconds:.0f}s"
+    if seconds < 5400:
+        return f"{seconds / 60:.0f}m"
+    if seconds < 172800:
+        return f"{seconds / 3600:.1f}h"
+    return f"{seconds / 86400:.1f}d"
+
+def show():
+    now = time.time()
+    saved = load_state()
+    print(f"{'source':<24}{'host':<30}{'interval':>9}{'changes/day':>13}{'last run':>10}{'last change':>13}{'next in':>9}  status")
+    print("-" * 130)
+    for name, state in sorted(saved.items(), key=lambda item: item[1].get("next_run") or 0):
+        schedule = SourceSchedule(name, state.get("host", ""), state)
+        rate = schedule.rate()
+        rate = f"{rate * 86400:.2f}" if rate is not None else "-"
+        ago = lambda t: _duration(now - t) + " ago" if t else "-"
+        next_in = _duration(schedule.next_run - now) if schedule.next_run and schedule.next_run > now else "due"
+        print(
+            f"{name:<24}{schedule.host[:29]:<30}{_duration(schedule.interval):>9}{rate:>13}{ago(schedule.last_run):>10}"
+            f"{ago(schedule.last_change):>13}{next_in:>9}  {schedule.last_status or '-'}"
+        )
+
+# ---------------- Simulation ----------------
+SIMULATED = {  # changes per day
+    "quiet (1/week)": 1 / 7,
+    "ALHW-like (2/week)": 2 / 7,
+    "daily": 1.0,
+    "3/day": 3.0,
+    "HAFED-like (10/day)": 10.0,
+}
+
+def _simulate(changes, horizon, schedule=None, fixed=None):
+    # Polls from t=0 to the horizon; returns polls, polls that found nothing, and per change the
+    # delay until a poll saw it. schedule: the adaptive policy (SourceSchedule on a simulated clock)
+    polls, wasted, delays, i, t = 0, 0, [], 0, 0.0
+    while True:
+        t = schedule.next_run if schedule else t + fixed
+        if t > horizon:
+            return polls, wasted, delays
+        polls += 1
+        seen = i
+        while i < len(changes) and changes[i] <= t:
+            delays.append(t - changes[i])
+            i += 1
+        wasted += i == seen
+        if schedule:
+            schedule.observe(i > seen, t)
+
+def simulate(days, fixed):
+    random.seed(1)
+    rnd = random.Random(2)
+    horizon = days * 86400.0
+    print(f"{days} simulated days, Poisson changes, fixed interval {_duration(fixed)}")
+    print(f"{'source':<22}{'policy':<10}{'polls':>7}{'wasted':>8}{'mean delay':>12}{'p95 delay':>11}{'interval':>10}")
+    totals = {"fixed": [0, 0.0, 0], "adaptive": [0, 0.0, 0]}
+    for label, per_day in SIMULATED.items():
+        changes, t = [], 0.0
+        while True:
+            t += rnd.expovariate(per_day / 86400)
+            if t > horizon:
+                break
+            changes.append(t)
+
+        schedule = SourceSchedule(label, "simulated")
+        schedule.observe(False, 0.0)  # baseline poll at t=0
+        for policy in ("fixed", "adaptive"):
+            if policy == "fixed":
+                polls, wasted, delays = _simulate(changes, horizon, fixed=fixed)
+                interval = fixed
+            else:
+                polls, wasted, delays = _simulate(changes, horizon, schedule=schedule)
+                interval = schedule.interval
+            delays.sort()
+            mean = sum(delays) / len(delays) if delays else 0.0
+            p95 = delays[int(len(delays) * 0.95)] if delays else 0.0
+            totals[policy][0] += polls
+            totals[policy][1] += sum(delays)
+            totals[policy][2] += len(delays)
+            print(f"{label:<22}{policy:<10}{polls:>7}{wasted / polls:>8.0%}{_duration(mean):>12}"
+                  f"{_duration(p95):>11}{_duration(interval):>10}")
+    for policy, (polls, delay, count) in totals.items():
+        print(f"{policy:<10} {polls} polls, mean delay {_duration(delay / count if count else 0)}")
+
+# ---------------- MAIN ----------------
+def main():
+    parser = argparse.ArgumentParser(description="Poll each tender source as often as it changes")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--only", nargs="*", help="module names, e.g. HAFED CMRF")
+    parser.add_argument("--dedup", action="store_true", help="cluster near-duplicates after a run with changes")
+    parser.add_argument("--index", action="store_true", help="update the full-text index after a run with changes")
+    parser.add_argument("--metrics", nargs="*", default=os.getenv("METRICS_FILES", "").split(),
+                        help="metrics files rewritten after every run (.json or Prometheus text)")
+    parser.add_argument("--show", action="store_true", help="print the current schedule and exit")
+    parser.add_argument("--simulate", action="store_true", help="adaptive vs. fixed interval, synthetic sources")
+    parser.add_argument("--days", type=int, default=30, help="simulated days for --simulate")
+    parser.add_argument("--fixed", type=float, default=3600, help="fixed interval (s) compared by --simulate")
+    args = parser.parse_args()
+
+    if args.show:
+        show()
+        return 0
+    if args.simulate:
+        simulate(args.days, args.fixed)
+        return 0
+
+    from run_all import discover_sources
+
+    sources = discover_sources()
+    if args.only:
+        wanted = {name.lower() for name in args.only}
+        sources = [s for s in sources if s[0].lower() in wanted]
+    if not sources:
+        print("No scrapers found")
+        return 1
+
+    scheduler = Scheduler(sources, args.workers, args.dedup, args.index, args.metrics)
+    signal.signal(signal.SIGTERM, scheduler.stop)
+    try:
+        scheduler.run()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,426 @@
+#Local full-text search over every source's tenders (SQLite FTS5 inverted index on disk)
+#Text is tokenized here, not by SQLite: dotted abbreviations (P.W.D.), expansions both ways
+#(PWD <-> public works department), Hindi transliterations (sadak/sarak -> road), reference
+#numbers split into phrases (12/2024-25 -> "12 2024 25"); FTS5 then only splits on spaces
+#Kept in sync incrementally from the unified collection by updated_at (with an overlap window)
+#usage-python search_index.py sync [--full]
+#      python search_index.py search "pwd road repair" [--source HAFED CMRF] [--open] [--limit 20]
+#      python search_index.py bench [--n 1000000]
+import argparse
+import hashlib
+import os
+import random
+import re
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import unicodedata
+from datetime import datetime, timedelta
+
+from dotenv import load_dotenv
+
+from dates import portal_now
+
+load_dotenv()
+# ---------------- Search Config ----------------
+INDEX_FILE = os.getenv("SEARCH_INDEX_FILE", "search_index.sqlite3")
+SYNC_OVERLAP = timedelta(minutes=10)  # re-read recent writes: a slow writer may land behind the watermark
+BATCH = 5000
+WEIGHTS = (10.0, 5.0, 1.0, 0.0)      # bm25 weights: title, reference, body, source
+# bm25 ranks the whole match set by default (0). Broad queries ("road") match a large share of all
+# tenders and every match is scored; a RANK_WINDOW > 0 ranks only the newest that many matches
+# (rowid order = first indexed), which bounds latency but drops an older, better match
+RANK_WINDOW = int(os.getenv("SEARCH_RANK_WINDOW", "0"))
+
+# Expanded both ways at index time, so "pwd" finds "Public Works Department" and the reverse
+ABBREVIATIONS = {
+    "pwd": "public works department",
+    "phed": "public health engineering department",
+    "rwd": "rural works department",
+    "bsnl": "bharat sanchar nigam limited",
+    "nit": "notice inviting tender",
+    "eoi": "expression of interest",
+    "rfp": "request for proposal",
+    "rfq": "request for quotation",
+    "boq": "bill of quantities",
+    "emd": "earnest money deposit",
+    "amc": "annual maintenance contract",
+    "cmc": "comprehensive maintenance contract",
+    "pcc": "plain cement concrete",
+    "rcc": "reinforced cement concrete",
+    "gem": "government e marketplace",
+    "cctv": "closed circuit television",
+    "ups": "uninterruptible power supply",
+    "dg": "diesel generator",
+    "ee": "executive engineer",
+    "sdo": "sub divisional officer",
+    "corri": "corrigendum",
+}
+
+# Common transliterations: spelling variants -> one spelling, plus the English word
+HINDI = {
+    "nivida": ("nivida", "tender"), "niwida": ("nivida", "tender"),
+    "nirman": ("nirman", "construction"), "nirmaan": ("nirman", "construction"),
+    "aapurti": ("aapurti", "supply"), "apurti": ("aapurti", "supply"),
+    "marammat": ("marammat", "repair"), "marammatt": ("marammat", "repair"), "marmat": ("marammat", "repair"),
+    "sadak": ("sadak", "road"), "sarak": ("sadak", "road"), "sadk": ("sadak", "road"),
+    "bhawan": ("bhawan", "building"), "bhavan": ("bhawan", "building"),
+    "kray": ("kray", "purchase"), "kraya": ("kray", "purchase"), "kharid": ("kray", "purchase"),
+    "kharidi": ("kray", "purchase"),
+    "vidyut": ("vidyut", "electrical"), "bijli": ("vidyut", "electrical"),
+    "nali": ("nali", "drain"), "nala": ("nali", "drain"), "naala": ("nali", "drain"),
+    "pul": ("pul", "bridge"), "puliya": ("pul", "bridge"),
+    "shauchalay": ("shauchalay", "toilet"), "shauchalaya": ("shauchalay", "toilet"),
+    "vidyalaya": ("vidyalaya", "school"), "vidyalay": ("vidyalaya", "school"),
+    "chikitsalaya": ("chikitsalaya", "hospital"), "chikitsalay": ("chikitsalaya", "hospital"),
+    "aspatal": ("chikitsalaya", "hospital"),
+    "talab": ("talab", "pond"), "pokhar": ("talab", "pond"),
+    "sinchai": ("sinchai", "irrigation"),
+    "peyjal": ("peyjal", "drinking water"),
+    # Devanagari titles land on the same words
+    "निविदा": ("nivida", "tender"), "निर्माण": ("nirman", "construction"), "आपूर्ति": ("aapurti", "supply"),
+    "मरम्मत": ("marammat", "repair"), "सड़क": ("sadak", "road"), "भवन": ("bhawan", "building"),
+    "क्रय": ("kray", "purchase"), "नाली": ("nali", "drain"), "पुल": ("pul", "bridge"),
+    "विद्यालय": ("vidyalaya", "school"), "शौचालय": ("shauchalay", "toilet"),
+}
+
+_PHRASES = {tuple(v.split()): k for k, v in ABBREVIATIONS.items()}
+_MAX_PHRASE = max(len(p) for p in _PHRASES)
+_DOTTED = re.compile(r"\b(?:[a-z]\.){2,}")
+_TOKEN = re.compile(r"(?:[^\W_]|[ऀ-෿])+")  # letters/digits, Indic scripts with their vowel signs
+_QUERY = re.compile(r'"([^"]+)"|(\S+)')
+
+# ---------------- Tokenizer ----------------
+def tokenize(text):
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    text = _DOTTED.sub(lambda m: m.group(0).replace(".", ""), text)
+    tokens = []
+    for token in _TOKEN.findall(text):
+        if token.isdigit():
+            token = token.lstrip("0") or "0"  # "ward no 05" == "ward no 5"
+        tokens.append(token)
+    return tokens
+
+def expand(tokens):
+    # Extra tokens appended after the text (bm25 still sees the original words first)
+    extra = []
+    for token in tokens:
+        if token in ABBREVIATIONS:
+            extra.extend(ABBREVIATIONS[token].split())
+        if token in HINDI:
+            canonical, english = HINDI[token]
+            extra.append(canonical)
+            extra.extend(english.split())
+    for size in range(2, _MAX_PHRASE + 1):
+        for i in range(len(tokens) - size + 1):
+            abbreviation = _PHRASES.get(tuple(tokens[i:i + size]))
+            if abbreviation:
+                extra.append(abbreviation)
+    return tokens + extra
+
+def index_text(text):
+    return " ".join(expand(tokenize(text)))
+
+def match_expression(query):
+    # User query -> FTS5 MATCH: every term required, multi-token terms (refs) as phrases, "x*" as prefix
+    terms = []
+    for quoted, word in _QUERY.findall(query):
+        raw = quoted or word
+        prefix = bool(word) and word.endswith("*")
+        tokens = [HINDI[t][0] if t in HINDI else t for t in tokenize(raw)]
+        if not tokens:
+            continue
+        if tokens[0] in ("or", "and") and len(tokens) == 1 and not quoted:
+            terms.append(tokens[0].upper())
+            continue
+        terms.append('"' + " ".join(tokens) + '"' + ("*" if prefix else ""))
+    while terms and terms[0] in ("OR", "AND"):
+        terms.pop(0)
+    while terms and terms[-1] in ("OR", "AND"):
+        terms.pop()
+    return " ".join(terms)
+
+# ---------------- Index ----------------
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (
+    id INTEGER PRIMARY KEY,
+    fp TEXT UNIQUE NOT NULL,
+    source TEXT,
+    title TEXT,
+    deadline TEXT,
+    sig TEXT
+);
+CREATE INDEX IF NOT EXISTS docs_source ON docs(source);
+CREATE VIRTUAL TABLE IF NOT EXISTS fts USING fts5(title, reference, body, source, tokenize='ascii', prefix='3');
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+class SearchIndex:
+    def __init__(self, path=INDEX_FILE):
+        self.path = path
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+        self.lock = threading.Lock()
+
+    def close(self):
+        self.db.close()
+
+    # ---- writes ----
+    def upsert(self, docs):
+        # docs: canonical tender dicts (unified.py); unchanged text is skipped by signature
+        stats = {"indexed": 0, "unchanged": 0, "removed": 0}
+        with self.lock, self.db:
+            for doc in docs:
+                row = self.db.execute("SELECT id, sig FROM docs WHERE fp = ?", (doc["_fp"],)).fetchone()
+                if doc.get("removed"):
+                    if row:
+                        self.db.execute("DELETE FROM fts WHERE rowid = ?", (row[0],))
+                        self.db.execute("DELETE FROM docs WHERE id = ?", (row[0],))
+                        stats["removed"] += 1
+                    continue
+
+                title = doc.get("title") or ""
+                reference = doc.get("reference") or ""
+                body = " ".join(filter(None, (doc.get("description"), _raw_text(doc.get("raw")))))
+                deadline = doc["deadline_dt"].isoformat() if doc.get("deadline_dt") else None
+                sig = hashlib.sha1("\x1f".join((title, reference, body, deadline or "")).encode("utf-8")).hexdigest()
+                if row and row[1] == sig:
+                    stats["unchanged"] += 1
+                    continue
+
+                if row:
+                    rowid = row[0]
+                    self.db.execute("UPDATE docs SET source = ?, title = ?, deadline = ?, sig = ? WHERE id = ?",
+                                    (doc.get("source"), title, deadline, sig, rowid))
+                    self.db.execute("DELETE FROM fts WHERE rowid = ?", (rowid,))
+                else:
+                    rowid = self.db.execute(
+                        "INSERT INTO docs (fp, source, title, deadline, sig) VALUES (?, ?, ?, ?, ?)",
+                        (doc["_fp"], doc.get("source"), title, deadline, sig),
+                    ).lastrowid
+                self.db.execute(
+                    "INSERT INTO fts (rowid, title, reference, body, source) VALUES (?, ?, ?, ?, ?)",
+                    (rowid, index_text(title), index_text(reference), index_text(body), source_token(doc.get("source"))),
+                )
+                stats["indexed"] += 1
+        return stats
+
+    def get_meta(self, key, default=None):
+        row = self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key, value):
+        with self.lock, self.db:
+            self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def optimize(self):
+        with self.lock, self.db:
+            self.db.execute("INSERT INTO fts (fts) VALUES ('optimize')")
+
+    # ---- reads ----
+    def search(self, query, sources=None, open_only=False, limit=20, offset=0, now=None, window=None):
+        expression = match_expression(query)
+        if not expression:
+            return []
+        if sources:
+            # Matched inside FTS5, so the source filter narrows the posting lists before ranking
+            expression = f"({expression}) AND (" + " OR ".join(f'source : "{source_token(s)}"' for s in sources) + ")"
+
+        window = RANK_WINDOW if window is None else window
+        with self.lock:
+            floor = 0
+            if window:
+                row = self.db.execute(
+                    "SELECT rowid FROM fts WHERE fts MATCH ? ORDER BY rowid DESC LIMIT 1 OFFSET ?",
+                    (expression, window),
+                ).fetchone()
+                floor = row[0] if row else 0
+            sql = [
+                "SELECT docs.fp, docs.source, docs.title, docs.deadline, bm25(fts, ?, ?, ?, ?) AS score",
+                "FROM fts JOIN docs ON docs.id = fts.rowid WHERE fts MATCH ? AND fts.rowid > ?",
+            ]
+            params = list(WEIGHTS) + [expression, floor]
+            if open_only:
+                sql.append("AND docs.deadline >= ?")
+                params.append((now or portal_now()).isoformat())  # deadlines are IST wall-clock
+            sql.append("ORDER BY score LIMIT ? OFFSET ?")
+            params.extend([limit, offset])
+            rows = self.db.execute(" ".join(sql), params).fetchall()
+        return [
+            {"_fp": fp, "source": source, "title": title, "deadline_dt": deadline, "score": round(-score, 3)}
+            for fp, source, title, deadline, score in rows
+        ]
+
+    def count(self):
+        return self.db.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+def source_token(source):
+    return re.sub(r"[^0-9a-z]", "", (source or "").lower()) or "unknown"
+
+def _raw_text(raw):
+    # Other text the portal gave us (work, tender_name, ...) without URLs and dates
+    if not isinstance(raw, dict):
+        return ""
+    parts = []
+    for value in raw.values():
+        if isinstance(value, str) and not value.startswith(("http://", "https://")) and len(value) > 3:
+            parts.append(value)
+    return " ".join(parts)
+
+# ---------------- Sync ----------------
+_index = None
+_index_lock = threading.Lock()
+
+def get_index():
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = SearchIndex()
+    return _index
+
+def sync(index=None, full=False):
+    # Reads the unified collection from the last watermark (minus an overlap) in updated_at order
+    from mongo_store import UNIFIED_COLLECTION, get_collection
+
+    index = index or get_index()
+    collection = get_collection(UNIFIED_COLLECTION)
+    collection.create_index("updated_at", name="updated_at")
+
+    watermark = None if full else index.get_meta("watermark")
+    query = {}
+    if watermark:
+        query["updated_at"] = {"$gte": datetime.fromisoformat(watermark) - SYNC_OVERLAP}
+
+    start = time.perf_counter()
+    totals = {"indexed": 0, "unchanged": 0, "removed": 0}
+    latest = None
+    projection = {"_fp": 1, "source": 1, "title": 1, "reference": 1, "description": 1, "raw": 1,
+                  "deadline_dt": 1, "removed": 1, "updated_at": 1}
+    batch = []
+    for doc in collection.find(query, projection).sort("updated_at", 1):
+        batch.append(doc)
+        if doc.get("updated_at") and (latest is None or doc["updated_at"] > latest):
+            latest = doc["updated_at"]
+        if len(batch) >= BATCH:
+            for key, value in index.upsert(batch).items():
+                totals[key] += value
+            batch = []
+    if batch:
+        for key, value in index.upsert(batch).items():
+            totals[key] += value
+    if latest:
+        index.set_meta("watermark", latest.isoformat())
+
+    totals["seconds"] = time.perf_counter() - start
+    print(
+        f"search index: {totals['indexed']} indexed, {totals['removed']} removed, {totals['unchanged']} unchanged "
+        f"in {totals['seconds']:.2f}s ({index.count()} tenders in {index.path})"
+    )
+    return totals
+
+# ---------------- Benchmark ----------------
+# Synthetic corpus with a Zipf-like vocabulary (a few words in every other title, most words rare),
+# the way real tender titles are distributed; queries are drawn from the same distribution
+BENCH_WORDS = ("supply", "repair", "construction", "road", "pcc", "drain", "building", "school", "hospital",
+               "pump", "tubewell", "cctv", "camera", "computer", "printer", "furniture", "medicines",
+               "bitumen", "bridge", "culvert", "boundary", "wall", "toilet", "solar", "street", "light",
+               "amc", "ups", "generator", "canteen", "security", "manpower", "vehicle", "hiring", "sadak",
+               "nirman", "marammat", "bhawan", "aapurti", "panchayat", "block", "district")
+BENCH_DEPARTMENTS = ("PWD", "PHED", "RWD", "BSNL", "EE", "SDO", "DRDA", "BDO", "CMO", "DEO")
+
+def _bench_vocabulary(rnd, size=20000):
+    words = list(BENCH_WORDS) + [
+        "".join(rnd.choice("abcdefghijklmnoprstuvy") for _ in range(rnd.randint(4, 9))) for _ in range(size)
+    ]
+    weights, total = [], 0.0
+    for rank in range(1, len(words) + 1):
+        total += 1.0 / rank
+        weights.append(total)
+    return words, weights
+
+def bench(n, queries=200, window=None):
+    rnd = random.Random(1)
+    path = os.path.join(tempfile.mkdtemp(prefix="search_bench_"), "bench.sqlite3")
+    index = SearchIndex(path)
+    sources = [f"source_{i:02d}" for i in range(11)]
+    words, weights = _bench_vocabulary(rnd)
+    draw = lambda k: rnd.choices(words, cum_weights=weights, k=k)
+    now = datetime.now()
+
+    start = time.perf_counter()
+    for offset in range(0, n, BATCH):
+        batch = []
+        for i in range(offset, min(n, offset + BATCH)):
+            batch.append({
+                "_fp": f"bench:{i}",
+                "source": rnd.choice(sources),
+                "title": " ".join(draw(rnd.randint(4, 9))) + f" ward no {rnd.randint(1, 60)}",
+                "reference": f"NIT No. {rnd.randint(1, 400)}/{rnd.choice((2023, 2024, 2025))}-{rnd.randint(24, 26)}"
+                             f"/{rnd.choice(BENCH_DEPARTMENTS)}",
+                "description": " ".join(draw(12)),
+                "deadline_dt": now + timedelta(days=rnd.randint(-200, 200)),
+            })
+        index.upsert(batch)
+    index.optimize()
+    build = time.perf_counter() - start
+    size = os.path.getsize(path) / 2 ** 20
+    print(f"indexed {n} tenders in {build:.1f}s ({n / build:,.0f}/s), {size:.0f} MiB on disk")
+
+    shapes = {
+        "one word": lambda: draw(1)[0],
+        "two words": lambda: " ".join(draw(2)),
+        "abbreviation": lambda: rnd.choice(("public works department", "annual maintenance contract", "PCC")),
+        "transliteration": lambda: rnd.choice(("sarak", "road repair", "bhavan")),
+        "reference no": lambda: f"{rnd.randint(1, 400)}/2024-25",
+        "prefix": lambda: draw(1)[0][:4] + "*",
+    }
+    # Ranking cost grows with the rows a query matches (every match is scored), so print that too
+    print(f"{'query':<18}{'p50 ms':>9}{'p95 ms':>9}{'matches':>10}{'hits@20':>9}")
+    for label, make in shapes.items():
+        times, hits, matches = [], 0, 0
+        for _ in range(queries):
+            q = make()
+            t = time.perf_counter()
+            hits += len(index.search(q, open_only=label == "two words", now=now, window=window))
+            times.append((time.perf_counter() - t) * 1000)
+            expression = match_expression(q)
+            matches += index.db.execute("SELECT COUNT(*) FROM fts WHERE fts MATCH ?", (expression,)).fetchone()[0]
+        times.sort()
+        print(f"{label:<18}{times[len(times) // 2]:>9.2f}{times[int(len(times) * 0.95)]:>9.2f}"
+              f"{matches / queries:>10,.0f}{hits / queries:>9.1f}")
+    index.close()
+
+# ---------------- MAIN ----------------
+def main():
+    parser = argparse.ArgumentParser(description="Full-text search index over the stored tenders")
+    parser.add_argument("command", choices=("sync", "search", "bench"))
+    parser.add_argument("query", nargs="?", help="keywords for 'search'")
+    parser.add_argument("--full", action="store_true", help="'sync' everything, not only recent writes")
+    parser.add_argument("--source", nargs="*", help="source names, e.g. HAFED CMRF")
+    parser.add_argument("--open", action="store_true", help="only tenders whose deadline has not passed")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--n", type=int, default=1000000, help="synthetic tenders for 'bench'")
+    parser.add_argument("--window", type=int, help="rank only the newest N matches (0 = all)")
+    args = parser.parse_args()
+
+    if args.command == "bench":
+        bench(args.n, window=args.window)
+    elif args.command == "sync":
+        sync(full=args.full)
+    else:
+        if not args.query:
+            parser.error("search needs a query")
+        start = time.perf_counter()
+        hits = get_index().search(args.query, args.source, args.open, args.limit, window=args.window)
+        for hit in hits:
+            print(f"{hit['score']:>8.2f}  {hit['source']:<22}{(hit['deadline_dt'] or '-')[:10]:<12}{hit['title'][:90]}")
+        print(f"{len(hits)} hits in {(time.perf_counter() - start) * 1000:.1f} ms  [{match_expression(args.query)}]")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
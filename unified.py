@@ -0,0 +1,119 @@
+#Unified tender collection: every source mapped into one canonical schema
+#Each scraper declares a Mapping (its field names -> canonical ones); mongo_store writes the
+#canonical document next to the per-source one, through the same batched writer
+#Canonical: source, title, description, reference, published_dt, deadline_dt, documents, raw
+#Keyed by _fp = "<source>:<tender fingerprint>" (hashed shard key friendly: no hot spot, upserts hit one shard)
+#usage-python unified.py [--only HAFED CMRF]      (rebuild from the per-source collections)
+import argparse
+import sys
+import time
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+import dates
+from downloader import record_urls
+from mongo_store import UNIFIED_COLLECTION, get_collection, get_writer
+
+load_dotenv()
+# ---------------- Unified Config ----------------
+# Bookkeeping written by mongo_store / dates / pdf_extract, not part of the scraped payload
+STORE_FIELDS = ("removed", "removed_at", "updated_at", "first_seen", "documents_text")
+
+# ---------------- Mapping ----------------
+class Mapping:
+    def __init__(self, source, title, description=None, reference=None, published=None, documents=(), base=None):
+        self.source = source
+        self.title = title
+        self.description = description
+        self.reference = reference
+        self.published = published
+        self.documents = tuple(documents)
+        self.base = base
+
+    def key(self, fp):
+        return f"{self.source}:{fp}"
+
+    def canonical(self, doc):
+        # doc: the per-source document (raw fields plus *_dt / deadline_dt from dates.normalize)
+        raw = {
+            k: v for k, v in doc.items()
+            if not k.startswith("_") and k not in STORE_FIELDS and not k.endswith(dates.SUFFIX)
+        }
+        return {
+            "source": self.source,
+            "title": _text(doc.get(self.title)),
+            "description": _text(doc.get(self.description)) if self.description else None,
+            "reference": _text(doc.get(self.reference)) if self.reference else None,
+            "published_dt": doc.get(self.published + dates.SUFFIX) if self.published else None,
+            "deadline_dt": doc.get(dates.DEADLINE),
+            "documents": record_urls(doc, self.documents, self.base or ""),
+            "raw": raw,
+        }
+
+    def upsert_op(self, doc, fp, now, first_seen=None):
+        from pymongo import UpdateOne  # lazy: scrapers import this module for Mapping alone
+
+        removed = doc.get("removed", False)
+        canonical = dict(self.canonical(doc), _fp=self.key(fp), removed=removed, updated_at=now)
+        # A rewritten tender is clustered again by dedup.py
+        update = {"$set": canonical, "$setOnInsert": {"first_seen": first_seen or now}, "$unset": {"_lsh": ""}}
+        if removed:
+            canonical["removed_at"] = doc.get("removed_at") or now
+        else:
+            update["$unset"]["removed_at"] = ""
+        return UpdateOne({"_fp": canonical["_fp"]}, update, upsert=True)
+
+    def remove_op(self, fps, now):
+        from pymongo import UpdateMany
+
+        return UpdateMany(
+            {"_fp": {"$in": [self.key(fp) for fp in fps]}},
+            {"$set": {"removed": True, "removed_at": now, "updated_at": now}},  # seen by search_index.sync
+        )
+
+def _text(value):
+    if isinstance(value, str):
+        return " ".join(value.split()) or None
+    return value
+
+# ---------------- Rebuild ----------------
+def rebuild(module):
+    # Re-maps every stored document of one source (new mapping, or data written before unified.py)
+    mapping = module.UNIFIED
+    writer = get_writer()
+    now = datetime.utcnow()
+    count = 0
+    for doc in get_collection(module.MONGO_DB_COLLECTION).find({}):
+        op = mapping.upsert_op(doc, doc["_fp"], doc.get("updated_at") or now, doc.get("first_seen"))
+        writer.put(UNIFIED_COLLECTION, op, module.MONGO_DB_COLLECTION)
+        count += 1
+    writer.flush(module.MONGO_DB_COLLECTION)
+    return count
+
+def rebuild_sources(sources):
+    for name, module, _ in sources:
+        if getattr(module, "UNIFIED", None) is None:
+            print(f"{name}: no UNIFIED mapping, skipped")
+            continue
+        start = time.perf_counter()
+        count = rebuild(module)
+        print(f"{name}: {count} tenders mapped into {UNIFIED_COLLECTION} in {time.perf_counter() - start:.2f}s")
+
+# ---------------- MAIN ----------------
+def main():
+    from run_all import discover_sources
+
+    parser = argparse.ArgumentParser(description="Rebuild the unified tender collection from the per-source ones")
+    parser.add_argument("--only", nargs="*", help="module names, e.g. HAFED CMRF")
+    args = parser.parse_args()
+
+    sources = discover_sources()
+    if args.only:
+        wanted = {name.lower() for name in args.only}
+        sources = [s for s in sources if s[0].lower() in wanted]
+    rebuild_sources(sources)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,287 @@
+#Long-lived scraper worker: every scraper module is imported once, the HTTP session and Mongo client stay warm
+#A run request then costs the scrape itself instead of interpreter startup + imports + new connections
+#Protocol: one JSON request per line over a local socket (127.0.0.1 TCP, or a unix socket), one JSON reply per line
+#usage-python worker.py serve [--port 8766 | --unix /run/tenders.sock] [--workers 8]
+#      python worker.py run HAFED CMRF [--no-store] [--force]     (client; no names = every source)
+#      python worker.py sources | stats | ping | stop
+#      python worker.py bench [--only HAFED] [--n 5] [--no-store]  (fresh process per run vs. warm worker)
+import argparse
+import json
+import os
+import socket
+import socketserver
+import subprocess
+import sys
+import threading
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+# ---------------- Worker Config ----------------
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+HOST = "127.0.0.1"  # never exposed beyond the machine
+PORT = int(os.getenv("WORKER_PORT", "8766"))
+SOCKET_PATH = os.getenv("WORKER_SOCKET")   # unix socket instead of TCP (POSIX only)
+TOKEN = os.getenv("WORKER_TOKEN")          # optional shared secret for requests
+WORKERS = int(os.getenv("SCRAPER_WORKERS", "8"))
+
+def to_json(data):
+    return json.dumps(data, default=str, ensure_ascii=False)
+
+# ---------------- Worker ----------------
+class Worker:
+    def __init__(self, workers=WORKERS):
+        start = time.perf_counter()
+        # The imports the worker exists to pay once; kept out of module level so the client stays light
+        import run_all
+
+        self.sources = {name.lower(): (name, module, func) for name, module, func in run_all.discover_sources()}
+        self.workers = workers
+        self.run_lock = threading.Lock()  # one request at a time: --force is process-wide in http_client
+        self.timings = {}                 # source -> {"cold": first run in this process, "warm": [later runs]}
+        self.requests = 0
+        self.started = time.time()
+        self.warm_up()
+        self.startup = time.perf_counter() - start
+        print(f"worker ready: {len(self.sources)} sources in {self.startup:.2f}s")
+
+    def warm_up(self):
+        from http_client import get_session
+        from mongo_store import MONGO_DB_URI, get_client
+
+        get_session()
+        if MONGO_DB_URI:
+            try:
+                get_client().admin.command("ping")  # imports pymongo, opens the pool
+            except Exception as e:
+                print(f"mongo not reachable yet ({type(e).__name__}: {e}); connecting on first store")
+
+    def handle(self, request):
+        command = request.get("command")
+        if command == "ping":
+            return {"ok": True, "pid": os.getpid(), "uptime": round(time.time() - self.started, 1),
+                    "startup": round(self.startup, 3)}
+        if command == "sources":
+            return {"ok": True, "sources": sorted(name for name, _, _ in self.sources.values())}
+        if command == "stats":
+            return self.stats()
+        if command == "run":
+            return self.run(request)
+        raise ValueError(f"unknown command {command!r}")
+
+    def run(self, request):
+        import dates
+        import host_health
+        from http_client import set_force
+        from run_all import run_all
+
+        wanted = request.get("sources") or ()
+        unknown = [name for name in wanted if name.lower() not in self.sources]
+        if unknown:
+            raise ValueError(f"unknown source {', '.join(unknown)}")
+        selected = [self.sources[name.lower()] for name in wanted] if wanted else list(self.sources.values())
+
+        with self.run_lock:
+            set_force(bool(request.get("force")))
+            start = time.perf_counter()
+            try:
+                results = run_all(selected, workers=request.get("workers") or self.workers,
+                                  store=request.get("store", True))
+            finally:
+                set_force(False)
+                # Long-lived: write the state files now instead of at exit
+                host_health.save()
+                dates.save()
+            seconds = time.perf_counter() - start
+            self.requests += 1
+
+        for result in results:
+            timing = self.timings.setdefault(result["source"], {"cold": None, "warm": []})
+            if timing["cold"] is None:
+                timing["cold"] = result["seconds"]
+            else:
+                timing["warm"].append(result["seconds"])
+        return {"ok": all(r["ok"] for r in results), "seconds": round(seconds, 3), "results": results}
+
+    def stats(self):
+        from mongo_store import writer_stats
+
+        sources = {}
+        for name, timing in sorted(self.timings.items()):
+            warm = sorted(timing["warm"])
+            sources[name] = {
+                "cold_seconds": round(timing["cold"], 3),
+                "warm_runs": len(warm),
+                "warm_p50_seconds": round(warm[len(warm) // 2], 3) if warm else None,
+            }
+        return {"ok": True, "requests": self.requests, "startup": round(self.startup, 3),
+                "sources": sources, "mongo_writer": writer_stats()}
+
+# ---------------- Server ----------------
+class WorkerHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            stop = False
+            try:
+                request = json.loads(line)
+                if TOKEN and request.get("token") != TOKEN:
+                    raise PermissionError("bad token")
+                if request.get("command") == "stop":
+                    reply, stop = {"ok": True, "stopping": True}, True
+                else:
+                    reply = self.server.worker.handle(request)
+            except Exception as e:
+                reply = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+            self.wfile.write((to_json(reply) + "\n").encode("utf-8"))
+            self.wfile.flush()
+            if stop:
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+                return
+
+class WorkerServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, worker, port=PORT):
+        super().__init__((HOST, port), WorkerHandler)
+        self.worker = worker
+
+if hasattr(socketserver, "UnixStreamServer"):
+    class UnixWorkerServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+        def __init__(self, worker, path):
+            if os.path.exists(path):
+                os.remove(path)  # left over from a worker that was killed
+            super().__init__(path, WorkerHandler)
+            self.worker = worker
+
+def serve(port=PORT, unix=SOCKET_PATH, workers=WORKERS):
+    worker = Worker(workers)
+    server = UnixWorkerServer(worker, unix) if unix else WorkerServer(worker, port)
+    print(f"listening on {unix or f'{HOST}:{port}'}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if unix and os.path.exists(unix):
+            os.remove(unix)
+
+# ---------------- Client ----------------
+def request(payload, port=PORT, unix=SOCKET_PATH, timeout=None):
+    if TOKEN:
+        payload = dict(payload, token=TOKEN)
+    if unix:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(unix)
+    else:
+        sock = socket.create_connection((HOST, port), timeout=5)
+    sock.settimeout(timeout)  # a run can take minutes
+    with sock, sock.makefile("rwb") as f:
+        f.write((to_json(payload) + "\n").encode("utf-8"))
+        f.flush()
+        line = f.readline()
+    if not line:
+        raise ConnectionError("worker closed the connection")
+    return json.loads(line)
+
+def wait_ready(port=PORT, unix=SOCKET_PATH, timeout=60):
+    deadline = time.time() + timeout
+    while True:
+        try:
+            return request({"command": "ping"}, port, unix, timeout=5)
+        except OSError:
+            if time.time() > deadline:
+                raise
+            time.sleep(0.1)
+
+# ---------------- Benchmark ----------------
+def _free_port():
+    with socket.socket() as s:
+        s.bind((HOST, 0))
+        return s.getsockname()[1]
+
+def bench(names, n, store):
+    # Cold: a fresh interpreter per run (what cron + "python HAFED.PY" pays). Warm: the same run
+    # requested from a worker. Both with --force, so every run fetches and parses for real
+    cold_cmd = [sys.executable, os.path.join(BASE_DIR, "run_all.py"), "--force", "--metrics"]  # bare --metrics: no files
+    if names:
+        cold_cmd += ["--only"] + names
+    if not store:
+        cold_cmd.append("--no-store")
+
+    cold = []
+    for _ in range(n):
+        start = time.perf_counter()
+        subprocess.run(cold_cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        cold.append(time.perf_counter() - start)
+
+    port = _free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen([sys.executable, os.path.abspath(__file__), "serve", "--port", str(port)],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        info = wait_ready(port, unix=None)
+        ready = time.perf_counter() - start
+        warm, ok = [], True
+        for _ in range(n + 1):  # the first request opens connections: reported on its own
+            start = time.perf_counter()
+            reply = request({"command": "run", "sources": names, "store": store, "force": True},
+                            port, unix=None)
+            warm.append(time.perf_counter() - start)
+            ok = ok and reply.get("ok", False)
+        request({"command": "stop"}, port, unix=None)
+    finally:
+        server.wait(timeout=30)
+
+    first, warm = warm[0], sorted(warm[1:])
+    cold.sort()
+    p50 = lambda values: values[len(values) // 2]
+    print(f"sources: {', '.join(names) if names else 'all'}, {n} runs each, store={store}"
+          + ("" if ok else "  (some runs failed: timings include the failure)"))
+    print(f"cold   fresh process per run      p50 {p50(cold):7.3f}s  min {cold[0]:7.3f}s")
+    print(f"worker startup (imports + warm-up) {ready:7.3f}s  (inside worker: {info['startup']:.3f}s)")
+    print(f"warm   first request               {first:7.3f}s")
+    print(f"warm   later requests          p50 {p50(warm):7.3f}s  min {warm[0]:7.3f}s  ({p50(cold) / p50(warm):.1f}x faster)")
+
+# ---------------- MAIN ----------------
+def main():
+    parser = argparse.ArgumentParser(description="Long-lived scraper worker and its client")
+    parser.add_argument("command", choices=("serve", "run", "sources", "stats", "ping", "stop", "bench"))
+    parser.add_argument("names", nargs="*", help="sources for 'run', e.g. HAFED CMRF")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--unix", default=SOCKET_PATH, help="unix socket path instead of TCP")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="'serve': scraper threads per request")
+    parser.add_argument("--no-store", action="store_true", help="scrape only, skip MongoDB")
+    parser.add_argument("--force", action="store_true", help="ignore cache and fingerprints, full refresh")
+    parser.add_argument("--only", nargs="*", default=[], help="'bench': sources to time")
+    parser.add_argument("--n", type=int, default=5, help="'bench': runs per mode")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        serve(args.port, args.unix, args.workers)
+        return 0
+    if args.command == "bench":
+        bench(args.only, args.n, not args.no_store)
+        return 0
+
+    payload = {"command": args.command}
+    if args.command == "run":
+        payload.update(sources=args.names, store=not args.no_store, force=args.force)
+    reply = request(payload, args.port, args.unix)
+    if args.command == "run" and "results" in reply:
+        for r in sorted(reply["results"], key=lambda r: r["seconds"], reverse=True):
+            status = "FAILED" if not r["ok"] else "unchanged" if r["unchanged"] else "ok"
+            print(f"{r['source']:<24}{status:<10}{r['count']:>8}{r['seconds']:>10.2f}  {r['error'] or ''}")
+        print(f"{reply['seconds']:.2f}s")
+    else:
+        print(json.dumps(reply, indent=2, default=str))
+    return 0 if reply.get("ok") else 1
+
+if __name__ == "__main__":
+    sys.exit(main())